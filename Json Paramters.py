@@ -1,11 +1,10 @@
 """This file acts as the main module for this script."""
 
+import time
+load_start = time.perf_counter()
+
 import traceback
 import adsk.core
-import adsk.fusion
-# import adsk.cam
-import json
-import os 
 
 # Initialize the global variables for the Application and UserInterface objects.
 app = adsk.core.Application.get()
@@ -13,380 +12,85 @@ ui  = app.userInterface
 
 handlers = []
 
-palette_import_id = 'ParamImportPalette'
-palette_export_id = 'ParamExportPalette'
-temp_params = []  # Holds parsed JSON parameters
-html_ready_flags = {
-    'import': False,
-    'export': False
-}
-
-def export_user_parameters():
-    try:
-        design = adsk.fusion.Design.cast(app.activeProduct)
-        if not design:
-            ui.messageBox('No active Fusion 360 design', 'Error')
-            return
-
-        userParams = design.userParameters
-        param_list = []
-
-        for param in userParams:
-            param_list.append({
-                'name': param.name,
-                'value': param.value,
-                'expression': param.expression,
-                'units': param.unit,
-                'comment': param.comment
-            })
-
-        # Show file dialog
-        fileDlg = ui.createFileDialog()
-        fileDlg.title = "Save Parameters as JSON"
-        fileDlg.filter = 'JSON files (*.json)'
-        fileDlg.filterIndex = 0
-        dialogResult = fileDlg.showSave()
-        if dialogResult != adsk.core.DialogResults.DialogOK:
-            return
-
-        filePath = fileDlg.filename
-        with open(filePath, 'w') as f:
-            json.dump(param_list, f, indent=4)
-
-        ui.messageBox(f'Exported {len(param_list)} user parameters to:\n{filePath}')
-    except:
-        ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
-
-def show_import_palette(params_json):
-    try:
-        palette = ui.palettes.itemById(palette_import_id)
-        if palette:
-            palette.deleteMe()
-
-        html_path = os.path.join(os.path.dirname(__file__), 'resources', 'param_ui.html')
-        palette = ui.palettes.add(
-            palette_import_id,
-            'Import User Parameters',
-            html_path,
-            True, True, True, 400, 400
-        )
-
-        # Dock the palette to the right side of Fusion window.
-        palette.dockingState = adsk.core.PaletteDockingStates.PaletteDockStateRight
-
-        on_close = PaletteClosedHandler()
-        palette.closed.add(on_close)
-        handlers.append(on_close)
-
-        on_incoming = ImportHTMLMessageHandler()
-        palette.incomingFromHTML.add(on_incoming)
-        handlers.append(on_incoming)
-
-        global temp_params
-        temp_params = params_json
-        
-        #html_ready = False
-        html_ready_flags['import'] = False
-        
-        #json_str = json.dumps(params_json)
-        #ui.messageBox(json_str)
-        # Send data to HTML
-        # retVal = palette.sendInfoToHTML('loadParams', json_str)
-        #ui.messageBox(f"Value returned {retVal}")
-
-    except:
-        ui.messageBox('Failed to show import palette:\n{}'.format(traceback.format_exc()))
-
-
-
-def import_user_parameters():
-    try:
-        design = adsk.fusion.Design.cast(app.activeProduct)
-        if not design:
-            ui.messageBox('No active design.')
-            return
-
-        fileDlg = ui.createFileDialog()
-        fileDlg.title = "Open JSON Parameters"
-        fileDlg.filter = 'JSON files (*.json)'
-        fileDlg.filterIndex = 0
-        if fileDlg.showOpen() != adsk.core.DialogResults.DialogOK:
-            return
-
-        with open(fileDlg.filename, 'r') as f:
-            params = json.load(f)
-
-        show_import_palette(params)
-        
-    except:
-        ui.messageBox('Import failed:\n{}'.format(traceback.format_exc()))
-
-
-class ImportHTMLMessageHandler(adsk.core.HTMLEventHandler):
-    def notify(self, args):
-        try:
-
-            #ui.messageBox(args.data)
-
-            if 'action' not in args.data:
-                return
-
-            msg = json.loads(args.data)
-            
-            is_msg_dict = isinstance(json.loads(args.data), dict)
-
-            if not is_msg_dict:
-                # Hack: Work around to handle the fact that when the html sends the data json.loads does not parse it right away into a dict. 
-                msg = json.loads(f"{msg}")
-
-            #ui.messageBox(f"{msg} - {len(msg)}")
-
-            
-            if msg['action'] == 'htmlReady':
-                html_ready_flags['import'] = True
-                palette = ui.palettes.itemById(palette_import_id)
-                if palette and palette.isVisible:
-                    # Now it's safe to send the parameters
-                    palette.sendInfoToHTML('loadParams', json.dumps(temp_params))
-
-
-            if msg['action'] == 'import':
-                selected_names = set(msg['selected'])
-                design = adsk.fusion.Design.cast(app.activeProduct)
-                userParams = design.userParameters
-                existing = {p.name for p in userParams}
-                added = 0
-
-                lst_failed_parameters = []
-                for p in temp_params:
-                    if p['name'] not in selected_names:
-                        continue
-                    if p['name'] in existing:
-                        continue
-                    expr = p.get('expression', str(p.get('value', 1)))
-                    
-                    name = p['name']
-                    units = p.get('units', '')
-                    comment = p.get('comment', '')
-                    try:
-                        userParams.add(
-                            name,
-                            adsk.core.ValueInput.createByString(expr),
-                            units,
-                            comment
-                        )
-                        added += 1
-                    except:
-                        # Track paramter that fialed. 
-                        failed_tuple = (name, expr, units, comment)
-                        lst_failed_parameters.append(failed_tuple)
-                        pass    
-
-                for failed_tuple in lst_failed_parameters:
-                    name, expr, units, comment = failed_tuple
-                    userParams.add(
-                            name,
-                            adsk.core.ValueInput.createByString(expr),
-                            units,
-                            comment
-                        )
-                    added += 1
-
-                ui.messageBox(f'Imported {added} parameters.')
-                palette = ui.palettes.itemById(palette_import_id)
-                if palette:
-                    palette.isVisible = False
-
-        except:
-            ui.messageBox('Import HTML Message Error:\n{}'.format(traceback.format_exc()))
-
-class ExportHTMLMessageHandler(adsk.core.HTMLEventHandler):
-    def notify(self, args):
-
-        #ui.messageBox(args.data)
-
-        if 'action' not in args.data:
-            return
+# The add-in runs on startup, which must stay quick. Only the buttons are added here, the
+# commands module with the palettes, events and parameter code is imported on first use.
+startup_budget = 0.05  # Seconds run() may take before a warning is logged
+commands_module = None
+
+# (command id, name, tooltip, function of the commands module run on execute), in panel order
+addin_commands = [
+    ('ExportUserParams', 'Export User Parameters', 'Exports user parameters to a JSON file.', 'show_export_palette'),
+    ('ImportUserParams', 'Import User Parameters', 'Imports user parameters from a JSON file.', 'import_user_parameters'),
+    ('ExportSavedSelection', 'Export Saved Selection', 'Exports the user parameters of a saved selection to a file.', 'export_saved_selection'),
+    ('ParamLibrary', 'Parameter Library', 'Searches the parameter files of the library folders and imports from them.', 'show_library'),
+    ('WatchParamFile', 'Watch Parameter File', 'Applies changes to a parameter file to the design as the file is saved. Run again to stop.', 'toggle_watch')
+]
+
+def commands():
+    """The commands module, imported and started the first time a command runs."""
+    global commands_module
+    if commands_module is None:
+        start = time.perf_counter()
+        from . import commands as module
+        module.start([cmdId for cmdId, _, _, _ in addin_commands])
+        commands_module = module
+        app.log(f'Json Parameters: commands loaded in {(time.perf_counter() - start) * 1000:.1f} ms')
+    return commands_module
+
+class CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
+    def __init__(self, entry):
+        super().__init__()
+        # Shared by every run of the command, adding a new handler each time would leak them.
+        self.onExecute = CommandExecuteHandler(entry)
 
-        msg = json.loads(args.data)
-            
-        is_msg_dict = isinstance(json.loads(args.data), dict)
-
-        if not is_msg_dict:
-            # Hack: Work around to handle the fact that when the html sends the data json.loads does not parse it right away into a dict. 
-            msg = json.loads(f"{msg}")
-
-        if msg['action'] == 'htmlReady':
-            html_ready_flags['export'] = True
-            palette = ui.palettes.itemById(palette_export_id)
-            if palette and palette.isVisible:
-                palette.sendInfoToHTML('loadExportParams', json.dumps(temp_params))
-
-
-        elif msg['action'] == 'export':
-            selected_names = set(msg['selected'])
-            export_data = [p for p in temp_params if p['name'] in selected_names]
-
-            # Ask user where to save
-            fileDlg = ui.createFileDialog()
-            fileDlg.title = "Save Exported Parameters"
-            fileDlg.filter = 'JSON files (*.json)'
-            if fileDlg.showSave() != adsk.core.DialogResults.DialogOK:
-                return
-            with open(fileDlg.filename, 'w') as f:
-                json.dump(export_data, f, indent=4)
-
-            ui.messageBox(f'Exported {len(export_data)} parameters.')
-            palette = ui.palettes.itemById(palette_export_id)
-            if palette:
-                palette.isVisible = False
-        pass
-    pass
-
-class PaletteClosedHandler(adsk.core.UserInterfaceGeneralEventHandler):
     def notify(self, args):
         try:
-            #ui.messageBox('Parameter import canceled.')
-            # Do nothing.
-            pass
+            args.command.execute.add(self.onExecute)
         except:
-            pass
+            ui.messageBox('CommandCreated Failed:\n{}'.format(traceback.format_exc()))
 
+class CommandExecuteHandler(adsk.core.CommandEventHandler):
+    def __init__(self, entry):
+        super().__init__()
+        self.entry = entry
 
-# Export CommandCreated event handler
-class ExportParamsCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
     def notify(self, args):
         try:
-            cmd = args.command
-            onExecute = ExportParamsCommandExecuteHandler()
-            cmd.execute.add(onExecute)
-            handlers.append(onExecute)
+            getattr(commands(), self.entry)()
         except:
-            ui.messageBox('ExportCommandCreated Failed:\n{}'.format(traceback.format_exc()))
-
-# Export Command execution
-class ExportParamsCommandExecuteHandler(adsk.core.CommandEventHandler):
-    def notify(self, args):
-        #export_user_parameters()
-        try:  
-            design = adsk.fusion.Design.cast(app.activeProduct)
-            if not design:
-                ui.messageBox('No active design.')
-                return
-
-            userParams = design.userParameters
-            global temp_params, html_ready_flags
-            temp_params = [{
-                'name': p.name,
-                'value': p.value,
-                'expression': p.expression,
-                'units': p.unit,
-                'comment': p.comment
-            } for p in userParams]
-
-            html_ready_flags['export'] = False
-            palette = ui.palettes.itemById(palette_export_id)
-            if palette:
-                palette.deleteMe()
-
-            
-            html_path = os.path.join(os.path.dirname(__file__), 'resources', 'param_ui.html')
-            palette = ui.palettes.add(
-                palette_export_id,
-                'Export Parameters',
-                html_path,
-                True, True, True, 400, 400
-            )
-
-            # Dock the palette to the right side of Fusion window.
-            palette.dockingState = adsk.core.PaletteDockingStates.PaletteDockStateRight
-
-            on_close = PaletteClosedHandler()
-            palette.closed.add(on_close)
-            handlers.append(on_close)
-
-            on_incoming = ExportHTMLMessageHandler()
-            palette.incomingFromHTML.add(on_incoming)
-            handlers.append(on_incoming)
-
-        except:
-            ui.messageBox('Export command failed:\n{}'.format(traceback.format_exc()))
-        pass
-
-class ImportParamsCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
-    def notify(self, args):
-        try:
-            cmd = args.command
-            onExecute = ImportParamsCommandExecuteHandler()
-            cmd.execute.add(onExecute)
-            handlers.append(onExecute)
-        except:
-            ui.messageBox('ImportCommandCreated Failed:\n{}'.format(traceback.format_exc()))
-
-class ImportParamsCommandExecuteHandler(adsk.core.CommandEventHandler):
-    def notify(self, eventArgs):
-        import_user_parameters()
-    
+            ui.messageBox('Command failed:\n{}'.format(traceback.format_exc()))
 
 def run(_context: str):
     """This function is called by Fusion when the script is run."""
 
     try:
-        exportCmdId = 'ExportUserParams'
-        exportCmdDef = ui.commandDefinitions.itemById(exportCmdId)
-        if not exportCmdDef:
-            exportCmdDef = ui.commandDefinitions.addButtonDefinition(
-                exportCmdId,
-                'Export User Parameters',
-                'Exports user parameters to a JSON file.',
-                ''  # Resource folder
-            )
-            #ui.messageBox("Added export command")
-
-        onCommandCreated = ExportParamsCommandCreatedHandler()
-        exportCmdDef.commandCreated.add(onCommandCreated)
-        handlers.append(onCommandCreated)
-
-        # Add to UI
+        start = time.perf_counter()
         solidPanel = ui.allToolbarPanels.itemById('SolidModifyPanel')
-        exportControl = solidPanel.controls.itemById(exportCmdId)
-
         referenceControl = solidPanel.controls.itemById('FusionChangeParametersCmd')
         insertIndex = referenceControl.index + 1 if referenceControl else -1
-        
-        if not exportControl:
-            exportControl = solidPanel.controls.addCommand(exportCmdDef)
-            if insertIndex > 0:
-                solidPanel.controls.move(exportControl.index, insertIndex)
-            #ui.messageBox("Added control") 
 
+        for offset, (cmdId, name, tooltip, entry) in enumerate(addin_commands):
+            cmdDef = ui.commandDefinitions.itemById(cmdId)
+            if not cmdDef:
+                cmdDef = ui.commandDefinitions.addButtonDefinition(cmdId, name, tooltip, '')  # Resource folder
+
+            onCommandCreated = CommandCreatedHandler(entry)
+            cmdDef.commandCreated.add(onCommandCreated)
+            handlers.append(onCommandCreated)
+
+            # A control left by an earlier run of the add-in is reused.
+            if not solidPanel.controls.itemById(cmdId):
+                control = solidPanel.controls.addCommand(cmdDef)
+                if insertIndex > 0:
+                    solidPanel.controls.move(control.index, insertIndex + offset)
+
+        end = time.perf_counter()
+        message = (f'Json Parameters: started in {(end - start) * 1000:.1f} ms, '
+                   f'{(start - load_start) * 1000:.1f} ms loading the module')
+        if end - load_start > startup_budget:
+            app.log(f'{message}, over the {startup_budget * 1000:.0f} ms budget', adsk.core.LogLevels.WarningLogLevel)
         else:
-            ui.messageBox("Unable to add export control")    
-
-        # Add import command
-        importCmdId = 'ImportUserParams'
-        importCmdDef = ui.commandDefinitions.itemById(importCmdId)
-        if not importCmdDef:
-            # Add the command 
-            importCmdDef =  ui.commandDefinitions.addButtonDefinition(
-                importCmdId,
-                'Import User Parameters',
-                'Imports user parameters from a JSON file.',
-                ''  # Resource folder
-            )
-
-        onImportCommandCreated = ImportParamsCommandCreatedHandler()
-        importCmdDef.commandCreated.add(onImportCommandCreated)
-        handlers.append(onImportCommandCreated)
-
-        importControl = solidPanel.controls.itemById(importCmdId)
-        if not importControl:
-            # Add import control
-            importControl = solidPanel.controls.addCommand(importCmdDef)
-            if insertIndex > 0:
-                solidPanel.controls.move(importControl.index, insertIndex + 1)
-       
-        #ui.messageBox(f'"{app.activeDocument.name}" is the active Document.')
+            app.log(message)
 
     except:
         ui.messageBox('Add-in failed:\n{}'.format(traceback.format_exc()))
@@ -394,13 +98,17 @@ def run(_context: str):
 
 def stop(context):
     try:
-        for cmdId in ['ExportUserParams', 'ImportUserParams']:
+        if commands_module:
+            commands_module.stop()
+
+        panel = ui.allToolbarPanels.itemById('SolidModifyPanel')
+        for cmdId, _, _, _ in addin_commands:
             cmdDef = ui.commandDefinitions.itemById(cmdId)
             if cmdDef: cmdDef.deleteMe()
 
-            panel = ui.allToolbarPanels.itemById('SolidModifyPanel')
             ctrl = panel.controls.itemById(cmdId)
             if ctrl: ctrl.deleteMe()
+        handlers.clear()
     except:
         ui.messageBox('Stop failed:\n{}'.format(traceback.format_exc()))
 
@@ -0,0 +1,198 @@
+"""
+Benchmarks for the export, import, validation and palette payload paths, run against
+paramlib.fakefusion.
+
+    python benchmarks/bench_params.py [--quick] [--out bench_results.json]
+
+Fusion API latency is modelled, not slept: each fake call adds its LATENCY entry to the
+reported api_seconds, so the estimated time in Fusion is wall_seconds + api_seconds.
+Results are written as JSON so runs of different versions can be compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from paramlib import ParameterPager, ParameterSnapshotCache, ParamTable, import_parameters, param_to_record, validate_parameters
+from paramlib import expressions
+from paramlib.fakefusion import FakeDesign, FakeFusion, LatencyModel
+
+SIZES = [10, 100, 1000, 10000, 100000]
+DEPTHS = [0, 1, 10, 50]
+QUICK_SIZES = [10, 100, 1000]
+QUICK_DEPTHS = [0, 10]
+
+# Seconds per call, rough figures for a mid sized design on a desktop machine.
+LATENCY = LatencyModel(default=0.00005, calls={
+    'UserParameters.add': 0.002,
+    'ValueInput.createByString': 0.0001,
+    'UserParameters.iterate': 0.0005,
+})
+
+def make_records(count, depth):
+    """
+    Builds count records in chains of depth + 1 where each parameter references the previous one.
+    Chains are listed dependents first so the import has to reorder them.
+    """
+    records = []
+    chain = depth + 1
+    for start in range(0, count, chain):
+        links = []
+        for i in range(start, min(start + chain, count)):
+            expression = f'p{i - 1} + 1 mm' if i > start else f'{i % 100 + 1} mm'
+            links.append({
+                'name': f'p{i}',
+                'value': 0.0,
+                'expression': expression,
+                'units': 'mm',
+                'comment': f'Parameter {i}'
+            })
+        records.extend(reversed(links))
+    return records
+
+def measure(fn, fusion=None):
+    """
+    Runs fn twice, once for wall time and once under tracemalloc for peak memory.
+    The fake API counters are reset before each run, so they describe a single run.
+    """
+    if fusion:
+        fusion.reset()
+    start = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - start
+
+    if fusion:
+        fusion.reset()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return wall, peak
+
+def bench_export(count):
+    # The export command reads five properties per parameter, then reuses the snapshot.
+    design = FakeDesign.from_records(make_records(count, 0), FakeFusion(LATENCY, sleep=False))
+    fusion = design.fusion
+    results = []
+
+    def read_all():
+        return [param_to_record(p) for p in design.userParameters]
+
+    wall, peak = measure(read_all, fusion)
+    results.append(result('export', count, 0, wall, peak, fusion))
+
+    cache = ParameterSnapshotCache()
+    cache.get('doc', design.userParameters)
+    wall, peak = measure(lambda: cache.get('doc', design.userParameters), fusion)
+    results.append(result('export-cached', count, 0, wall, peak, fusion))
+    return results
+
+def bench_import(count, depth):
+    records = make_records(count, depth)
+    fusion = FakeFusion(LATENCY, sleep=False)
+    state = {}
+
+    def run_import():
+        design = FakeDesign(fusion)
+        state['result'] = import_parameters(design, records, fusion.createByString)
+
+    wall, peak = measure(run_import, fusion)
+    imported = state['result']
+    extra = {'added': len(imported.added), 'failed': len(imported.failed)}
+    return [result('import', count, depth, wall, peak, fusion, **extra)]
+
+def bench_validate(count, depth):
+    table = ParamTable(make_records(count, depth))
+    state = {}
+
+    def run_validate():
+        expressions._parse_cache.clear()  # Every expression is parsed, as on the first import of a file
+        state['report'] = validate_parameters(table.rows)
+
+    wall, peak = measure(run_validate)
+    return [result('validate', count, depth, wall, peak, errors=len(state['report'].errors))]
+
+def bench_payload(count):
+    records = make_records(count, 0)
+    results = []
+
+    def full():
+        return json.dumps(records)
+
+    wall, peak = measure(full)
+    results.append(result('payload-full', count, 0, wall, peak, payload_bytes=len(full())))
+
+    pager = ParameterPager()
+
+    def first_page():
+        pager.reset(records)
+        meta = json.dumps({'total': len(records), 'pageSize': 200, 'complete': True})
+        return meta + json.dumps(pager.page(0, 200, 'name'))
+
+    wall, peak = measure(first_page)
+    results.append(result('payload-paged', count, 0, wall, peak, payload_bytes=len(first_page())))
+    return results
+
+def result(case, count, depth, wall, peak, fusion=None, **extra):
+    entry = {
+        'case': case,
+        'parameters': count,
+        'depth': depth,
+        'wall_seconds': round(wall, 6),
+        'peak_bytes': peak,
+    }
+    if fusion is not None:
+        entry['api_calls'] = fusion.total_calls
+        entry['api_seconds'] = round(fusion.api_seconds, 6)
+    entry.update(extra)
+    return entry
+
+def version():
+    manifest = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Json Paramters.manifest')
+    with open(manifest, 'r') as f:
+        return json.load(f).get('version')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Json Parameters add-in against a fake Fusion API.')
+    parser.add_argument('--quick', action='store_true', help='Only run the small sizes.')
+    parser.add_argument('--sizes', type=int, nargs='+')
+    parser.add_argument('--depths', type=int, nargs='+')
+    parser.add_argument('--out', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    depths = args.depths or (QUICK_DEPTHS if args.quick else DEPTHS)
+
+    results = []
+    for count in sizes:
+        entries = bench_export(count) + bench_payload(count)
+        for depth in depths:
+            if depth < count:
+                entries.extend(bench_import(count, depth))
+                entries.extend(bench_validate(count, depth))
+        for entry in entries:
+            print(' '.join(f'{key}={value}' for key, value in entry.items()))
+        results.extend(entries)
+
+    report = {
+        'version': version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'latency': {'default': LATENCY.default, 'calls': LATENCY.calls},
+        'results': results
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f'Wrote {len(results)} results to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1175 @@
+"""
+The commands of the add-in. The main module imports this the first time a command runs, so
+none of it, nor paramlib, is loaded while Fusion starts.
+"""
+
+import collections
+import traceback
+import adsk.core
+import adsk.fusion
+# import adsk.cam
+import json
+import os 
+import threading
+import time
+
+from .paramlib import CheckpointJournal, ImportJob, ParamTable, ParameterLibrary, ParameterPager, apply_update, deferred_compute, diff_parameters, ParameterSnapshotCache, import_parameters, known_parameters, param_to_record, validate_parameters
+from .paramlib.jobs import DONE
+from .paramlib.merge import FIRST, MergeError, merge_records
+from .paramlib.messages import MessageError, MessageRouter
+from .paramlib.scope import EXPORT_FIELDS, SCOPE_USER, ScopeError, ScopedParameters, check_fields, scope_parameters
+from .paramlib.selection import SelectionError, SelectionIndex, SelectionStore
+from .paramlib.tracing import tracer
+from .paramlib.watch import FileWatcher
+from .paramlib.canonical import write_canonical_file
+from .paramlib.checkpoints import CheckpointError, journal_path
+from .paramlib.importer import delete_parameters
+from .paramlib.formats import EXTENSIONS, FORMAT_BINARY, FORMAT_GZIP, FORMAT_JSON, FORMAT_JSON_COMPACT, format_for_path, read_parameter_file, write_parameter_file
+
+# Initialize the global variables for the Application and UserInterface objects.
+app = adsk.core.Application.get()
+ui  = app.userInterface
+
+handlers = []
+addin_command_ids = ()  # Commands of the add-in, set by start
+
+apply_cmd_id = 'ApplyUserParams'  # Hidden command imports run in, so they are a single undo step
+pending_apply = collections.deque()  # Work waiting for the apply command, oldest first
+apply_requested = False  # Whether the apply command was executed and has not run its work yet
+apply_event_id = 'JsonParamsApplyNext'  # Custom event executing the apply command for the next pending work
+
+import_event_id = 'JsonParamsImportStep'  # Custom event running background import steps on the main thread
+import_job = None  # The background import in progress, if any
+background_import_threshold = 1000  # Imports of more parameters than this run in the background
+import_step_budget = 0.1  # Seconds of API calls per step before Fusion gets control back
+
+palette_import_id = 'ParamImportPalette'
+palette_export_id = 'ParamExportPalette'
+temp_params = ParamTable()  # Parameters of the import file or the design being exported
+import_file_path = None  # File being streamed into the import palette
+import_stream_done = True
+merge_result = None  # MergeResult shown in the import palette when several files were picked
+merge_policy = FIRST  # How names defined differently by the merged files are settled
+palette_batch_size = 500  # Records sent to the palette per message while streaming
+palette_page_size = 200  # Default rows per page for palettes using the paged protocol
+# File dialog filters for export, the selected filter index picks the format.
+export_formats = [
+    ('JSON files (*.json)', FORMAT_JSON),
+    ('Compact JSON files (*.json)', FORMAT_JSON_COMPACT),
+    ('Compressed JSON files (*.json.gz)', FORMAT_GZIP),
+    ('Binary parameter files (*.jparams)', FORMAT_BINARY)
+]
+import_filter = 'Parameter files (*.json *.json.gz *.jparams);;All files (*.*)'
+
+html_ready_flags = {
+    'import': False,
+    'export': False
+}
+# Whether each palette's page asked for the paged protocol in its htmlReady message.
+palette_paging = {
+    'import': False,
+    'export': False
+}
+
+# Files the add-in keeps between sessions, such as the trace log.
+addin_data_dir = os.path.join(os.path.expanduser('~'), '.json_parameters')
+tracer.trace_path = os.path.join(addin_data_dir, 'trace.jsonl')
+selection_store = SelectionStore(os.path.join(addin_data_dir, 'selections.json'))
+selection_index = None  # SelectionIndex of the table selections were last evaluated against
+checkpoint_dir = os.path.join(addin_data_dir, 'checkpoints')
+checkpoint_journals = {}  # Document key -> CheckpointJournal, opened on first use
+
+library_event_id = 'JsonParamsLibraryStatus'  # Custom event the indexing thread reports through
+parameter_library = None  # Opened on first use
+library_thread = None  # Indexing in progress, if any
+library_progress_interval = 0.5  # Seconds between progress reports while indexing
+
+watch_event_id = 'JsonParamsWatchSync'  # Custom event the file watcher thread reports changes through
+file_watcher = None  # FileWatcher of the file the design is bound to, if any
+watch_document_key = None  # Document the watched file syncs into
+
+def active_design():
+    """The active design, timed through the tracer when tracing is on."""
+    return tracer.wrap(adsk.fusion.Design.cast(app.activeProduct), 'Design')
+
+def value_input_factory():
+    return tracer.wrap_function(adsk.core.ValueInput.createByString, 'ValueInput.createByString')
+
+def get_palette(palette_id):
+    return tracer.wrap(ui.palettes.itemById(palette_id), 'Palette')
+
+def user_command_active():
+    """Whether the user is in a command, such as a sketch or dialog, that executing the apply command would end."""
+    return ui.activeCommand not in ('SelectCommand', apply_cmd_id)
+
+def run_bulk(work, transaction=True):
+    """
+    Runs work, a function returning True on success. In a transaction it runs inside the
+    apply command, so all its changes form one undo step and a failure discards them. Work
+    queued while earlier work waits runs after it, each in an apply command of its own.
+    Returns False, after telling the user, when the work was not queued.
+    """
+    if not transaction:
+        work()
+        return True
+    if user_command_active():
+        ui.messageBox('Finish or cancel the active command first, applying parameters would end it.')
+        return False
+    pending_apply.append(work)
+    execute_pending_apply()
+    return True
+
+def execute_pending_apply():
+    """Executes the apply command for the oldest pending work, one at a time."""
+    global apply_requested
+    if not pending_apply or apply_requested or user_command_active():
+        # A user command is left alone, the work runs once it ends.
+        return
+    apply_requested = True
+    if not apply_command_definition().execute():
+        apply_requested = False
+        ui.messageBox(f'Applying parameters failed to start, {len(pending_apply)} pending changes were dropped.')
+        pending_apply.clear()
+
+def apply_command_definition():
+    """The hidden apply command, added the first time something is applied."""
+    applyCmdDef = ui.commandDefinitions.itemById(apply_cmd_id)
+    if not applyCmdDef:
+        # Not added to any panel, imports execute it to group their changes.
+        applyCmdDef = ui.commandDefinitions.addButtonDefinition(
+            apply_cmd_id,
+            'Apply User Parameters',
+            'Applies imported user parameters in one step.',
+            ''  # Resource folder
+        )
+        onApplyCommandCreated = ApplyParamsCommandCreatedHandler()
+        applyCmdDef.commandCreated.add(onApplyCommandCreated)
+        handlers.append(onApplyCommandCreated)
+    return applyCmdDef
+
+def send_trace_summary(palette):
+    if tracer.enabled and palette and tracer.last_summary:
+        palette.sendInfoToHTML('traceSummary', json.dumps(tracer.last_summary))
+
+def document_key(design):
+    return design.parentDocument.creationId
+
+snapshot_cache = ParameterSnapshotCache()
+# Fusion commands that can change user parameters, the end of any other one keeps snapshots.
+# Parameters added or deleted some other way change the count, which every lookup checks.
+parameter_command_ids = ('FusionChangeParametersCmd', 'UndoCommand', 'RedoCommand')
+
+def get_journal(key):
+    journal = checkpoint_journals.get(key)
+    if not journal:
+        journal = checkpoint_journals[key] = CheckpointJournal(journal_path(checkpoint_dir, key))
+    return journal
+
+def take_checkpoint(design, label):
+    """Records the design's user parameters in its journal, from the snapshot so nothing is re-read."""
+    key = document_key(design)
+    with tracer.span('checkpoint'):
+        return get_journal(key).add(snapshot_cache.get(key, design.userParameters), label)
+
+palette_pagers = {
+    'import': ParameterPager(),
+    'export': ParameterPager()
+}
+
+def send_params_meta(palette, kind, complete=True):
+    palette.sendInfoToHTML('paramsMeta', json.dumps({
+        'total': len(palette_pagers[kind].records),
+        'pageSize': palette_page_size,
+        'complete': complete
+    }))
+
+def send_params_page(palette, kind, msg):
+    page = palette_pagers[kind].page(
+        msg.get('offset', 0),
+        msg.get('limit'),
+        msg.get('sort'),
+        msg.get('descending', False),
+        msg.get('filter', '')
+    )
+    page['requestId'] = msg.get('requestId')
+    palette.sendInfoToHTML('paramsPage', json.dumps(page))
+
+def stream_import_file_to_palette(palette, paged=False):
+    """
+    Reads the import file record by record, sending a batch to the palette as soon as it is ready.
+    A paged palette only gets the running total and asks for the rows it shows with getPage.
+    """
+    global temp_params, import_stream_done
+    temp_params = ParamTable()
+    palette_pagers['import'].reset(temp_params)
+    batch = []
+    action = 'loadParams'
+    for record in read_parameter_file(import_file_path):
+        temp_params.append(record)
+        batch.append(record)
+        if len(batch) >= palette_batch_size:
+            if paged:
+                send_params_meta(palette, 'import', complete=False)
+            else:
+                palette.sendInfoToHTML(action, json.dumps(batch))
+            action = 'appendParams'
+            batch = []
+    import_stream_done = True
+    if paged:
+        send_params_meta(palette, 'import')
+    elif batch or action == 'loadParams':
+        palette.sendInfoToHTML(action, json.dumps(batch))
+
+def show_export_file_dialog(title, compact=False):
+    """Asks where to save an export. Returns (path, format), path is None when canceled."""
+    fileDlg = ui.createFileDialog()
+    fileDlg.title = title
+    fileDlg.filter = ';;'.join(label for label, _ in export_formats)
+    fileDlg.filterIndex = 1 if compact else 0
+    if fileDlg.showSave() != adsk.core.DialogResults.DialogOK:
+        return None, None
+
+    filePath = fileDlg.filename
+    if 0 <= fileDlg.filterIndex < len(export_formats):
+        fmt = export_formats[fileDlg.filterIndex][1]
+    else:
+        fmt = format_for_path(filePath)
+    if not filePath.lower().endswith(EXTENSIONS[fmt]):
+        filePath += EXTENSIONS[fmt]
+    return filePath, fmt
+
+def export_user_parameters():
+    try:
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if not design:
+            ui.messageBox('No active Fusion 360 design', 'Error')
+            return
+
+        userParams = design.userParameters
+
+        # Show file dialog
+        filePath, fmt = show_export_file_dialog("Save Parameters as JSON")
+        if not filePath:
+            return
+
+        count = write_parameter_file(filePath, (param_to_record(p) for p in userParams), fmt)
+
+        ui.messageBox(f'Exported {count} user parameters to:\n{filePath}')
+    except:
+        ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+def get_selection_index(table):
+    global selection_index
+    if not selection_index or not selection_index.is_current(table):
+        selection_index = SelectionIndex(table)
+    return selection_index
+
+def message_selection(msg, required=False):
+    """
+    The set of names a message selects by list, rules or saved selection. None means all
+    parameters, unless required.
+    """
+    if 'selected' in msg:
+        return set(msg['selected'])
+    if 'rules' in msg:
+        return get_selection_index(temp_params).select(msg['rules'])
+    if 'selectionSet' in msg:
+        return get_selection_index(temp_params).select(selection_store.get(msg['selectionSet']))
+    if required:
+        raise MessageError(f'"{msg["action"]}" message needs selected, rules or selectionSet')
+    return None
+
+def export_saved_selection():
+    """Exports the parameters of a saved selection straight to a file, without the palette."""
+    try:
+        names = selection_store.names()
+        if not names:
+            ui.messageBox('There are no saved selections, save one from the export palette first.')
+            return
+        name, cancelled = ui.inputBox('Saved selection to export:\n' + '\n'.join(names), 'Export Saved Selection', names[0])
+        if cancelled:
+            return
+
+        design = active_design()
+        if not design:
+            ui.messageBox('No active design.')
+            return
+        rules = selection_store.get(name.strip())
+        with tracer.operation('read design parameters'):
+            table = snapshot_cache.get(document_key(design), design.userParameters)
+
+        filePath, fmt = show_export_file_dialog(f'Export "{name.strip()}"')
+        if not filePath:
+            return
+        with tracer.operation('export'):
+            # Repeat exports are canonical, so an unchanged selection leaves the file untouched.
+            message = export_records(filePath, table.select(get_selection_index(table).select(rules)), fmt, True)
+        ui.messageBox(f'{message}\n{filePath}')
+    except SelectionError as e:
+        ui.messageBox(str(e))
+    except:
+        ui.messageBox('Export failed:\n{}'.format(traceback.format_exc()))
+
+def show_palette(palette_id, kind, title, incoming_handler_class):
+    """
+    Shows a palette, creating it the first time. Palettes are hidden rather than deleted
+    between uses, so the page stays loaded and its event handlers are added only once.
+    """
+    palette = ui.palettes.itemById(palette_id)
+    if palette:
+        palette.isVisible = True
+        return palette
+
+    html_path = os.path.join(os.path.dirname(__file__), 'resources', 'param_ui.html')
+    html_ready_flags[kind] = False
+    palette = ui.palettes.add(
+        palette_id,
+        title,
+        html_path,
+        True, True, True, 400, 400
+    )
+
+    # Dock the palette to the right side of Fusion window.
+    palette.dockingState = adsk.core.PaletteDockingStates.PaletteDockStateRight
+
+    on_close = PaletteClosedHandler()
+    palette.closed.add(on_close)
+    handlers.append(on_close)
+
+    on_incoming = incoming_handler_class()
+    palette.incomingFromHTML.add(on_incoming)
+    handlers.append(on_incoming)
+    return palette
+
+def show_export_palette():
+    try:
+        design = active_design()
+        if not design:
+            ui.messageBox('No active design.')
+            return
+
+        global temp_params
+        with tracer.operation('read design parameters'):
+            temp_params = snapshot_cache.get(document_key(design), design.userParameters)
+
+        palette = show_palette(palette_export_id, 'export', 'Export Parameters', ExportHTMLMessageHandler)
+        # A palette kept from an earlier export is ready already and gets the new parameters right away.
+        if html_ready_flags['export']:
+            load_export_palette(tracer.wrap(palette, 'Palette'))
+
+    except:
+        ui.messageBox('Export command failed:\n{}'.format(traceback.format_exc()))
+
+def show_import_palette(file_path, merge=None):
+    """
+    Shows the import palette for a file, for the merged parameters of several files, or empty
+    for picking from the library when there is neither.
+    """
+    try:
+        # Records are streamed from the file once the palette reports it is ready.
+        global temp_params, import_file_path, import_stream_done, merge_result
+        merge_result = merge
+        temp_params = merge.table if merge else ParamTable()
+        import_file_path = file_path
+        import_stream_done = file_path is None
+
+        palette = show_palette(palette_import_id, 'import', 'Import User Parameters', ImportHTMLMessageHandler)
+        # A palette kept from an earlier import is ready already and gets the new file right away.
+        if html_ready_flags['import']:
+            load_import_palette(tracer.wrap(palette, 'Palette'))
+
+    except:
+        ui.messageBox('Failed to show import palette:\n{}'.format(traceback.format_exc()))
+
+
+def import_user_parameters():
+    try:
+        design = adsk.fusion.Design.cast(app.activeProduct)
+        if not design:
+            ui.messageBox('No active design.')
+            return
+
+        fileDlg = ui.createFileDialog()
+        fileDlg.title = "Open JSON Parameters"
+        fileDlg.filter = import_filter
+        fileDlg.filterIndex = 0
+        fileDlg.isMultiSelectEnabled = True
+        if fileDlg.showOpen() != adsk.core.DialogResults.DialogOK:
+            return
+
+        paths = list(fileDlg.filenames)
+        if len(paths) > 1:
+            # Several files are merged up front and imported together in one pass.
+            with tracer.operation('merge import files'):
+                merge = merge_records([(path, read_parameter_file(path)) for path in paths], merge_policy)
+            show_import_palette(None, merge)
+        else:
+            show_import_palette(fileDlg.filename)
+        
+    except:
+        ui.messageBox('Import failed:\n{}'.format(traceback.format_exc()))
+
+
+def load_import_palette(palette):
+    """Sends the import records to a palette that has reported it is ready."""
+    paged = palette_paging['import']
+    if not import_stream_done:
+        with tracer.operation('read import file'):
+            stream_import_file_to_palette(palette, paged)
+        send_trace_summary(palette)
+    elif paged:
+        palette_pagers['import'].reset(temp_params)
+        send_params_meta(palette, 'import')
+    else:
+        palette.sendInfoToHTML('loadParams', json.dumps(temp_params.to_dicts()))
+    if merge_result:
+        palette.sendInfoToHTML('mergeReport', json.dumps(merge_result.to_dict()))
+
+def merge_resolved(selected_names, action):
+    """False, after telling the user, while selected names of a merge still wait for a choice of file."""
+    if not merge_result:
+        return True
+    names = {c.name for c in merge_result.unresolved}
+    if selected_names is not None:
+        names &= selected_names
+    if not names:
+        return True
+    ui.messageBox(f'{action} stopped, choose which file to take these parameters from first:\n' + '\n'.join(sorted(names)[:20]))
+    return False
+
+def on_merge_resolve(msg):
+    global merge_policy
+    if not merge_result:
+        raise MessageError('The import palette is not showing merged files')
+    if 'policy' in msg:
+        merge_result.apply_policy(msg['policy'])
+        # Later merges start from the policy last chosen.
+        merge_policy = msg['policy']
+    merge_result.resolve(msg.get('choices', {}))
+    palette = get_palette(palette_import_id)
+    if palette:
+        load_import_palette(palette)
+
+def on_import_html_ready(msg):
+    html_ready_flags['import'] = True
+    palette_paging['import'] = msg.get('paging', False)
+    palette = get_palette(palette_import_id)
+    if palette and palette.isVisible:
+        # Now it's safe to send the parameters
+        load_import_palette(palette)
+
+def on_import_get_page(msg):
+    palette = get_palette(palette_import_id)
+    if palette:
+        send_params_page(palette, 'import', msg)
+
+def design_parameters(design):
+    """
+    (snapshot, known) of the design: the snapshot of its user parameters and known_parameters,
+    name -> (value, units) of every parameter, model parameters included.
+    """
+    current = snapshot_cache.get(document_key(design), design.userParameters)
+    return current, known_parameters(design, current)
+
+def validate_import(design, selected_names=None, known=None):
+    """Checks the records to import offline against the design's parameters, before any API call."""
+    if known is None:
+        # Expressions may reference model parameters too, like import_parameters resolves them.
+        known = design_parameters(design)[1]
+    records = temp_params if selected_names is None else temp_params.select(selected_names)
+    with tracer.span('validate'):
+        return validate_parameters(records, known)
+
+def validation_passed(msg, selected_names, action, known=None):
+    """Validates unless the message opts out, a failure is reported and nothing is written."""
+    if not msg.get('validate', True):
+        return True
+    report = validate_import(active_design(), selected_names, known)
+    if report.ok:
+        return True
+    ui.messageBox(f'{action} aborted, no parameters were changed.\n\n' + report.summary())
+    palette = get_palette(palette_import_id)
+    if palette:
+        palette.sendInfoToHTML('validationReport', json.dumps(report.to_dict()))
+    return False
+
+def on_validate(msg):
+    selected_names = message_selection(msg)
+    with tracer.operation('validate'):
+        report = validate_import(active_design(), selected_names)
+    palette = get_palette(palette_import_id)
+    send_trace_summary(palette)
+    if palette:
+        palette.sendInfoToHTML('validationReport', json.dumps(report.to_dict()))
+
+def send_import_progress():
+    palette = get_palette(palette_import_id)
+    if palette and import_job:
+        palette.sendInfoToHTML('importProgress', json.dumps(import_job.progress()))
+
+def start_import_job(selected_names, validate):
+    """
+    Validates and orders the records on a worker thread, then adds them in short steps on the
+    main thread through import_event_id, so Fusion stays responsive. The steps are separate
+    changes rather than one undo step, a failure or cancel deletes what was added.
+    """
+    global import_job
+    if import_job and not import_job.finished:
+        ui.messageBox('An import is already running.')
+        return
+    design = active_design()
+    take_checkpoint(design, f'Before importing {len(selected_names)} parameters')
+    current = snapshot_cache.get(document_key(design), design.userParameters)
+    # Every name is read here, the job can not touch the API from its worker thread.
+    known = known_parameters(design, current)
+    import_job = ImportJob(design, temp_params.select(selected_names), current, validate=validate, known=known)
+    send_import_progress()
+    import_job.start(lambda: app.fireCustomEvent(import_event_id, ''))
+
+def run_import_step():
+    job = import_job
+    if not job:
+        return
+    if job.step(value_input_factory(), import_step_budget):
+        send_import_progress()
+        # Queued behind the events already waiting, so the UI gets its turn between steps.
+        app.fireCustomEvent(import_event_id, '')
+        return
+
+    snapshot_cache.add_parameters(document_key(job.design), job.result.added)
+    send_import_progress()
+    palette = get_palette(palette_import_id)
+    if palette and job.validation and not job.validation.ok:
+        palette.sendInfoToHTML('validationReport', json.dumps(job.validation.to_dict()))
+    ui.messageBox(job.summary())
+    if job.state == DONE and job.result.ok and palette:
+        palette.isVisible = False
+
+def on_cancel_import(msg):
+    if import_job and not import_job.finished:
+        import_job.cancel()
+
+def on_import(msg):
+    selected_names = message_selection(msg, required=True)
+    if not merge_resolved(selected_names, 'Import'):
+        return
+    if msg.get('background', len(selected_names) > background_import_threshold):
+        start_import_job(selected_names, msg.get('validate', True))
+        return
+    # Read once, for validating and for ordering the import.
+    known = design_parameters(active_design())[1]
+    if not validation_passed(msg, selected_names, 'Import', known):
+        return
+
+    def apply():
+        # Compute is deferred so the design recomputes once, a failure removes what was added.
+        with tracer.operation('import'):
+            design = active_design()
+            take_checkpoint(design, f'Before importing {len(selected_names)} parameters')
+            # The snapshot is current, work applied since validating has kept it so.
+            current = snapshot_cache.get(document_key(design), design.userParameters)
+            with deferred_compute(design):
+                result = import_parameters(design, temp_params.select(selected_names), value_input_factory(), atomic=True,
+                                           existing=current.names, known_names=set(known) | set(current.names))
+            snapshot_cache.add_parameters(document_key(design), result.added)
+
+        palette = get_palette(palette_import_id)
+        send_trace_summary(palette)
+        ui.messageBox(result.summary())
+        if result.ok and palette:
+            palette.isVisible = False
+        return result.ok
+
+    run_bulk(apply, msg.get('transaction', True))
+
+def on_update(msg):
+    # Compare by name with the design's current parameters, the snapshot avoids re-reading them.
+    selected_names = message_selection(msg)
+    if msg['action'] == 'previewUpdate':
+        with tracer.operation('previewUpdate'):
+            design = active_design()
+            diff = diff_parameters(temp_params, snapshot_cache.get(document_key(design), design.userParameters), selected_names)
+        palette = get_palette(palette_import_id)
+        send_trace_summary(palette)
+        if palette:
+            palette.sendInfoToHTML('updatePreview', json.dumps(diff.to_dict()))
+        return
+    if not merge_resolved(selected_names, 'Update'):
+        return
+    known = design_parameters(active_design())[1]
+    if not validation_passed(msg, selected_names, 'Update', known):
+        return
+
+    def apply():
+        with tracer.operation('update'):
+            design = active_design()
+            take_checkpoint(design, 'Before update')
+            key = document_key(design)
+            current = snapshot_cache.get(key, design.userParameters)
+            diff = diff_parameters(temp_params, current, selected_names)
+            with deferred_compute(design):
+                result = apply_update(design, diff, value_input_factory(), atomic=True,
+                                      known_names=set(known) | set(current.names))
+            snapshot_cache.add_parameters(key, result.added)
+            snapshot_cache.replace_parameters(key, result.updated)
+
+        palette = get_palette(palette_import_id)
+        send_trace_summary(palette)
+        ui.messageBox(result.summary())
+        if result.ok and palette:
+            palette.isVisible = False
+        return result.ok
+
+    run_bulk(apply, msg.get('transaction', True))
+
+def load_export_palette(palette):
+    """Sends the design's parameters to a palette that has reported it is ready."""
+    if palette_paging['export']:
+        palette_pagers['export'].reset(temp_params)
+        send_params_meta(palette, 'export')
+    else:
+        palette.sendInfoToHTML('loadExportParams', json.dumps(temp_params.to_dicts()))
+    palette.sendInfoToHTML('cacheStats', json.dumps(snapshot_cache.stats()))
+    send_trace_summary(palette)
+
+def on_export_html_ready(msg):
+    html_ready_flags['export'] = True
+    palette_paging['export'] = msg.get('paging', False)
+    palette = get_palette(palette_export_id)
+    if palette and palette.isVisible:
+        load_export_palette(palette)
+
+def on_export_get_page(msg):
+    palette = get_palette(palette_export_id)
+    if palette:
+        send_params_page(palette, 'export', msg)
+
+def export_records(filePath, records, fmt, canonical):
+    """Writes an export, a canonical one is skipped when the file already has the same content."""
+    if not canonical:
+        return f'Exported {write_parameter_file(filePath, records, fmt)} parameters.'
+    count, digest, written = write_canonical_file(filePath, records, fmt)
+    if not written:
+        return f'{count} parameters unchanged, the file was not rewritten.\n{digest}'
+    return f'Exported {count} parameters.\n{digest}'
+
+def on_export(msg):
+    export_data = temp_params.select(message_selection(msg, required=True))
+    if isinstance(temp_params, ScopedParameters):
+        # Only the projected fields are written, the lazy ones are read now for the selected rows.
+        export_data = temp_params.projected(export_data)
+
+    # Ask user where to save
+    filePath, fmt = show_export_file_dialog("Save Exported Parameters", msg.get('compact', False))
+    if not filePath:
+        return
+    with tracer.operation('export'):
+        with tracer.span('write file'):
+            message = export_records(filePath, export_data, fmt, msg.get('canonical', False))
+
+    palette = get_palette(palette_export_id)
+    send_trace_summary(palette)
+    ui.messageBox(message)
+    if palette:
+        palette.isVisible = False
+
+def on_set_export_scope(msg):
+    """Shows the parameters of another scope in the export palette, reading only the fields asked for."""
+    global temp_params
+    design = active_design()
+    fields = check_fields(msg.get('fields'))
+    with tracer.operation('read scope parameters'):
+        if msg['scope'] == SCOPE_USER and fields == EXPORT_FIELDS:
+            # All of the user parameters is what the snapshot holds already.
+            temp_params = snapshot_cache.get(document_key(design), design.userParameters)
+        else:
+            temp_params = ScopedParameters(scope_parameters(design, msg['scope'], msg.get('components')), fields)
+    palette = get_palette(palette_export_id)
+    if palette:
+        load_export_palette(palette)
+
+def on_list_components(msg):
+    design = active_design()
+    palette = get_palette(palette_export_id)
+    if palette:
+        palette.sendInfoToHTML('components', json.dumps([
+            {'name': component.name, 'modelParameters': component.modelParameters.count}
+            for component in design.allComponents
+        ]))
+
+def get_library():
+    global parameter_library
+    if not parameter_library:
+        parameter_library = ParameterLibrary(os.path.join(addin_data_dir, 'library.sqlite3'))
+    return parameter_library
+
+def send_library_status(data):
+    palette = get_palette(palette_import_id)
+    if palette:
+        palette.sendInfoToHTML('libraryStatus', json.dumps(data))
+
+def start_library_ingest():
+    """
+    Indexes the library folders on a worker thread, which reports progress and the result
+    through library_event_id since only the main thread may talk to the palette. Files are
+    parsed by threads, worker processes can not be started from inside Fusion.
+    """
+    global library_thread
+    if library_thread and library_thread.is_alive():
+        return
+    library = get_library()
+    last_report = [0.0]
+
+    def progress(done, total):
+        now = time.perf_counter()
+        if now - last_report[0] >= library_progress_interval:
+            last_report[0] = now
+            app.fireCustomEvent(library_event_id, json.dumps({'state': 'indexing', 'done': done, 'total': total}))
+
+    def work():
+        try:
+            stats = library.ingest(workers=min(8, os.cpu_count() or 4), progress=progress)
+            data = {'state': 'done', **stats.to_dict(), **library.stats()}
+        except Exception:
+            data = {'state': 'failed', 'error': traceback.format_exc()}
+        app.fireCustomEvent(library_event_id, json.dumps(data))
+
+    library_thread = threading.Thread(target=work, name='paramlib-library', daemon=True)
+    library_thread.start()
+    send_library_status({'state': 'indexing', 'done': 0, 'total': None})
+
+def on_library_search(msg):
+    found = get_library().search(msg.get('query', ''), msg.get('units'), msg.get('file'),
+                                 msg.get('limit', palette_page_size), msg.get('offset', 0))
+    found['requestId'] = msg.get('requestId')
+    palette = get_palette(palette_import_id)
+    if palette:
+        palette.sendInfoToHTML('libraryResults', json.dumps(found))
+
+def on_library_import(msg):
+    """Makes the chosen library parameters the import records, imported like those of a file."""
+    global temp_params, import_file_path, import_stream_done, merge_result
+    temp_params = ParamTable(get_library().records(msg['ids']))
+    merge_result = None
+    import_file_path = None
+    import_stream_done = True
+    palette = get_palette(palette_import_id)
+    if palette:
+        load_import_palette(palette)
+
+def on_library_add_folder(msg):
+    folderDlg = ui.createFolderDialog()
+    folderDlg.title = 'Add Folder to Parameter Library'
+    if folderDlg.showDialog() != adsk.core.DialogResults.DialogOK:
+        return
+    get_library().add_root(folderDlg.folder)
+    start_library_ingest()
+
+def on_library_reindex(msg):
+    start_library_ingest()
+
+def on_library_status(msg):
+    indexing = library_thread is not None and library_thread.is_alive()
+    send_library_status({'state': 'indexing' if indexing else 'idle', **get_library().stats()})
+
+def show_library():
+    """Opens the import palette without a file, to search the library and import from it."""
+    if not adsk.fusion.Design.cast(app.activeProduct):
+        ui.messageBox('No active design.')
+        return
+    show_import_palette(None)
+    if html_ready_flags['import']:
+        on_library_status({})
+
+def toggle_watch():
+    """Binds the active design to a parameter file kept in sync with it, or ends the binding."""
+    global file_watcher, watch_document_key
+    if file_watcher:
+        answer = ui.messageBox(f'Stop syncing parameters from\n{file_watcher.path}?', 'Watch Parameter File',
+                               adsk.core.MessageBoxButtonTypes.YesNoButtonType)
+        if answer == adsk.core.DialogResults.DialogYes:
+            stop_watch()
+        return
+
+    design = active_design()
+    if not design:
+        ui.messageBox('No active design.')
+        return
+    fileDlg = ui.createFileDialog()
+    fileDlg.title = 'Watch Parameter File'
+    fileDlg.filter = import_filter
+    fileDlg.filterIndex = 0
+    if fileDlg.showOpen() != adsk.core.DialogResults.DialogOK:
+        return
+
+    watch_document_key = document_key(design)
+    file_watcher = FileWatcher(fileDlg.filename, lambda: app.fireCustomEvent(watch_event_id, ''))
+    file_watcher.start()
+    app.log(f'Syncing parameters from {file_watcher.path}')
+
+def stop_watch():
+    global file_watcher, watch_document_key
+    if file_watcher:
+        file_watcher.stop()
+        app.log(f'Stopped syncing parameters from {file_watcher.path}')
+    file_watcher = None
+    watch_document_key = None
+
+def run_watch_sync():
+    """Applies the parameters the watched file changed, as one undo step."""
+    watcher = file_watcher
+    change = watcher.take() if watcher else None
+    if not change:
+        return
+    design = active_design()
+    if not design or document_key(design) != watch_document_key or pending_apply or user_command_active():
+        # Kept until the bound design is active again and the user is not in a command or
+        # waiting for their own changes, the watcher keeps asking meanwhile.
+        watcher.put_back(change)
+        return
+    name = os.path.basename(watcher.path)
+    if change.removed:
+        app.log(f'{name}: {len(change.removed)} parameters left the file, they stay in the design.')
+    if not change.records:
+        return
+
+    def write():
+        with tracer.operation('watch sync'):
+            key = document_key(design)
+            diff = diff_parameters(change.records, snapshot_cache.get(key, design.userParameters))
+            # The change is only part of the file, the rest of the design is not "removed".
+            diff.removed = []
+            if not diff.write_count:
+                return True
+            with deferred_compute(design):
+                result = apply_update(design, diff, value_input_factory(), atomic=True)
+            snapshot_cache.add_parameters(key, result.added)
+            snapshot_cache.replace_parameters(key, result.updated)
+        app.log(f'{name}: {result.summary()}')
+        return result.ok
+
+    def apply():
+        ok = False
+        try:
+            ok = write()
+            return ok
+        finally:
+            if not ok:
+                # Rolled back, the watcher offers these records again when the file is next saved.
+                watcher.forget(change)
+                app.log(f'{name}: the change was not applied, it is tried again when the file is saved.',
+                        adsk.core.LogLevels.WarningLogLevel)
+
+    run_bulk(apply)
+
+def restore_checkpoint(checkpoint_id, transaction=True):
+    """
+    Brings the user parameters back to a checkpoint, writing only those that differ and
+    deleting those added since. The state before is checkpointed first.
+    """
+    design = active_design()
+    key = document_key(design)
+    journal = get_journal(key)
+    if checkpoint_id not in {c['id'] for c in journal.checkpoints()}:
+        raise CheckpointError(f'No checkpoint {checkpoint_id}')
+
+    def apply():
+        with tracer.operation('restore checkpoint'):
+            current = snapshot_cache.get(key, design.userParameters)
+            diff, removed = journal.restore_plan(checkpoint_id, current)
+            journal.add(current, f'Before restoring checkpoint {checkpoint_id}')
+            with deferred_compute(design):
+                result = apply_update(design, diff, value_input_factory(), atomic=True)
+                if result.ok and removed:
+                    userParams = design.userParameters
+                    delete_parameters([userParams.itemByName(name) for name in removed])
+            if removed:
+                snapshot_cache.discard(key)
+            else:
+                snapshot_cache.add_parameters(key, result.added)
+                snapshot_cache.replace_parameters(key, result.updated)
+
+        message = f'Checkpoint {checkpoint_id}: {result.summary()}'
+        if result.ok and removed:
+            message += f'\nDeleted {len(removed)} parameters added since.'
+        ui.messageBox(message)
+        return result.ok
+
+    run_bulk(apply, transaction)
+
+def checkpoint_handlers(palette_id):
+    """Handlers for listing, taking and restoring checkpoints, the same in both palettes."""
+    def send_checkpoints():
+        design = active_design()
+        palette = get_palette(palette_id)
+        if design and palette:
+            palette.sendInfoToHTML('checkpoints', json.dumps(get_journal(document_key(design)).checkpoints()))
+
+    def on_list_checkpoints(msg):
+        send_checkpoints()
+
+    def on_create_checkpoint(msg):
+        take_checkpoint(active_design(), msg.get('label', 'Checkpoint'))
+        send_checkpoints()
+
+    def on_restore_checkpoint(msg):
+        restore_checkpoint(msg['id'], msg.get('transaction', True))
+        send_checkpoints()
+
+    return {
+        'listCheckpoints': on_list_checkpoints,
+        'createCheckpoint': on_create_checkpoint,
+        'restoreCheckpoint': on_restore_checkpoint
+    }
+
+def set_tracing_handler(palette_id):
+    def on_set_tracing(msg):
+        tracer.enabled = msg['enabled']
+        palette = get_palette(palette_id)
+        if palette:
+            palette.sendInfoToHTML('tracing', json.dumps({'enabled': tracer.enabled, 'path': tracer.trace_path}))
+    return on_set_tracing
+
+def selection_handlers(palette_id):
+    """Handlers for previewing rules and managing saved selections, the same in both palettes."""
+    def send(action, data):
+        palette = get_palette(palette_id)
+        if palette:
+            palette.sendInfoToHTML(action, json.dumps(data))
+
+    def on_preview_selection(msg):
+        names = message_selection(msg)
+        rows = temp_params.rows if names is None else temp_params.select(names)
+        send('selectionPreview', {
+            'count': len(rows),
+            'names': [p.name for p in rows[:msg.get('limit', palette_page_size)]]
+        })
+
+    def on_list_selections(msg):
+        send('selections', selection_store.load())
+
+    def on_save_selection(msg):
+        selection_store.save(msg['name'], msg['rules'])
+        on_list_selections(msg)
+
+    def on_delete_selection(msg):
+        selection_store.delete(msg['name'])
+        on_list_selections(msg)
+
+    return {
+        'previewSelection': on_preview_selection,
+        'listSelections': on_list_selections,
+        'saveSelection': on_save_selection,
+        'deleteSelection': on_delete_selection
+    }
+
+import_router = MessageRouter('import')
+import_router.register('htmlReady', on_import_html_ready)
+import_router.register('getPage', on_import_get_page)
+import_router.register('validate', on_validate)
+import_router.register('import', on_import)
+import_router.register('cancelImport', on_cancel_import)
+import_router.register('mergeResolve', on_merge_resolve)
+import_router.register('previewUpdate', on_update)
+import_router.register('update', on_update)
+import_router.register('setTracing', set_tracing_handler(palette_import_id))
+import_router.register('librarySearch', on_library_search)
+import_router.register('libraryImport', on_library_import)
+import_router.register('libraryAddFolder', on_library_add_folder)
+import_router.register('libraryReindex', on_library_reindex)
+import_router.register('libraryStatus', on_library_status)
+for action, handler in selection_handlers(palette_import_id).items():
+    import_router.register(action, handler)
+for action, handler in checkpoint_handlers(palette_import_id).items():
+    import_router.register(action, handler)
+
+export_router = MessageRouter('export')
+export_router.register('htmlReady', on_export_html_ready)
+export_router.register('getPage', on_export_get_page)
+export_router.register('export', on_export)
+export_router.register('setExportScope', on_set_export_scope)
+export_router.register('listComponents', on_list_components)
+export_router.register('setTracing', set_tracing_handler(palette_export_id))
+for action, handler in selection_handlers(palette_export_id).items():
+    export_router.register(action, handler)
+for action, handler in checkpoint_handlers(palette_export_id).items():
+    export_router.register(action, handler)
+
+class ImportHTMLMessageHandler(adsk.core.HTMLEventHandler):
+    def notify(self, args):
+        try:
+            import_router.dispatch(args.data)
+        except (MessageError, SelectionError, MergeError, CheckpointError) as e:
+            ui.messageBox(f'Invalid import palette message:\n{e}')
+        except:
+            ui.messageBox('Import HTML Message Error:\n{}'.format(traceback.format_exc()))
+
+class ExportHTMLMessageHandler(adsk.core.HTMLEventHandler):
+    def notify(self, args):
+        try:
+            export_router.dispatch(args.data)
+        except (MessageError, SelectionError, ScopeError, CheckpointError) as e:
+            ui.messageBox(f'Invalid export palette message:\n{e}')
+        except:
+            ui.messageBox('Export HTML Message Error:\n{}'.format(traceback.format_exc()))
+
+class ImportStepEventHandler(adsk.core.CustomEventHandler):
+    def notify(self, args):
+        try:
+            run_import_step()
+        except:
+            ui.messageBox('Import step failed:\n{}'.format(traceback.format_exc()))
+
+class LibraryEventHandler(adsk.core.CustomEventHandler):
+    def notify(self, args):
+        try:
+            send_library_status(json.loads(args.additionalInfo))
+        except:
+            ui.messageBox('Library update failed:\n{}'.format(traceback.format_exc()))
+
+class WatchSyncEventHandler(adsk.core.CustomEventHandler):
+    def notify(self, args):
+        try:
+            run_watch_sync()
+        except:
+            app.log('Parameter file sync failed:\n{}'.format(traceback.format_exc()))
+
+class ApplyNextEventHandler(adsk.core.CustomEventHandler):
+    def notify(self, args):
+        try:
+            execute_pending_apply()
+        except:
+            ui.messageBox('Applying parameters failed:\n{}'.format(traceback.format_exc()))
+
+class CommandTerminatedHandler(adsk.core.ApplicationCommandEventHandler):
+    def notify(self, args):
+        global apply_requested
+        try:
+            if pending_apply:
+                if args.commandId == apply_cmd_id:
+                    # Also when the apply command ended without running its work.
+                    apply_requested = False
+                # The next work waits for the command to be gone, the event comes after it.
+                app.fireCustomEvent(apply_event_id, '')
+            # Ours keep the snapshot current themselves, selecting, orbiting or sketching leave it alone.
+            if args.commandId in parameter_command_ids:
+                snapshot_cache.mark_dirty()
+        except:
+            pass
+
+class SnapshotDocumentActivatedHandler(adsk.core.DocumentEventHandler):
+    def notify(self, args):
+        try:
+            # Referenced designs may have been updated while the document was in the background.
+            snapshot_cache.mark_dirty(args.document.creationId)
+        except:
+            pass
+
+class SnapshotDocumentClosedHandler(adsk.core.DocumentEventHandler):
+    def notify(self, args):
+        try:
+            snapshot_cache.discard(args.document.creationId)
+            if args.document.creationId == watch_document_key:
+                stop_watch()
+        except:
+            pass
+
+class PaletteClosedHandler(adsk.core.UserInterfaceGeneralEventHandler):
+    def notify(self, args):
+        try:
+            #ui.messageBox('Parameter import canceled.')
+            # Do nothing.
+            pass
+        except:
+            pass
+
+
+class ApplyParamsCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
+    def __init__(self):
+        super().__init__()
+        self.onExecute = ApplyParamsCommandExecuteHandler()
+
+    def notify(self, args):
+        try:
+            args.command.execute.add(self.onExecute)
+        except:
+            ui.messageBox('ApplyCommandCreated Failed:\n{}'.format(traceback.format_exc()))
+
+class ApplyParamsCommandExecuteHandler(adsk.core.CommandEventHandler):
+    def notify(self, args):
+        global apply_requested
+        if not pending_apply:
+            return
+        # Kept in the queue while it runs, so work queued meanwhile waits for it.
+        work = pending_apply[0]
+        try:
+            # Failing the execute aborts the command's transaction, so nothing is left half applied.
+            if not work():
+                args.executeFailed = True
+        except:
+            args.executeFailed = True
+            ui.messageBox('Applying parameters failed:\n{}'.format(traceback.format_exc()))
+        finally:
+            pending_apply.popleft()
+            apply_requested = False
+            if pending_apply:
+                app.fireCustomEvent(apply_event_id, '')
+
+def start(command_ids):
+    """Sets up what the commands share, the first time one of them runs."""
+    global addin_command_ids
+    addin_command_ids = tuple(command_ids)
+
+    onCommandTerminated = CommandTerminatedHandler()
+    ui.commandTerminated.add(onCommandTerminated)
+    handlers.append(onCommandTerminated)
+
+    onDocumentActivated = SnapshotDocumentActivatedHandler()
+    app.documentActivated.add(onDocumentActivated)
+    handlers.append(onDocumentActivated)
+
+    onDocumentClosed = SnapshotDocumentClosedHandler()
+    app.documentClosed.add(onDocumentClosed)
+    handlers.append(onDocumentClosed)
+
+    for eventId, handler in [
+        (import_event_id, ImportStepEventHandler()),
+        (library_event_id, LibraryEventHandler()),
+        (watch_event_id, WatchSyncEventHandler()),
+        (apply_event_id, ApplyNextEventHandler())
+    ]:
+        app.registerCustomEvent(eventId).add(handler)
+        handlers.append(handler)
+
+def stop():
+    for handler in handlers:
+        if isinstance(handler, CommandTerminatedHandler):
+            ui.commandTerminated.remove(handler)
+        elif isinstance(handler, SnapshotDocumentActivatedHandler):
+            app.documentActivated.remove(handler)
+        elif isinstance(handler, SnapshotDocumentClosedHandler):
+            app.documentClosed.remove(handler)
+    snapshot_cache.entries.clear()
+
+    # Roll back an unfinished background import, its steps can not run once the event is gone.
+    if import_job and not import_job.finished:
+        import_job.cancel()
+        import_job.step(value_input_factory())
+    app.unregisterCustomEvent(import_event_id)
+    # An indexing thread is left to finish, its events go nowhere once unregistered.
+    app.unregisterCustomEvent(library_event_id)
+    stop_watch()
+    app.unregisterCustomEvent(watch_event_id)
+    pending_apply.clear()
+    app.unregisterCustomEvent(apply_event_id)
+
+    # Palettes live for the session, they go with the add-in.
+    for paletteId in [palette_import_id, palette_export_id]:
+        palette = ui.palettes.itemById(paletteId)
+        if palette:
+            palette.deleteMe()
+    html_ready_flags['import'] = html_ready_flags['export'] = False
+
+    cmdDef = ui.commandDefinitions.itemById(apply_cmd_id)
+    if cmdDef: cmdDef.deleteMe()
+    handlers.clear()
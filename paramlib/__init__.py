@@ -0,0 +1,24 @@
+"""
+Parameter handling for the Json Parameters add-in.
+
+Nothing in this package imports adsk, so it can be used and measured outside Fusion.
+The add-in passes real API objects in, batch runs and benchmarks use paramlib.fakefusion.
+"""
+
+from .canonical import canonical_records, content_hash, read_content_hash, write_canonical_file
+from .checkpoints import CheckpointJournal
+from .diff import ParameterDiff, UpdateResult, apply_update, diff_parameters
+from .expressions import ExpressionError, ValidationReport, evaluate_expression, parse_expression, validate_parameters
+from .formats import detect_format, read_parameter_file, write_parameter_file
+from .importer import ImportResult, deferred_compute, delete_parameters, import_parameters, known_parameters
+from .jobs import ImportJob
+from .library import ParameterLibrary
+from .jsonio import iter_json_records, read_records, write_json_records, write_records
+from .merge import MergeResult, merge_records
+from .ordering import format_import_problems, order_parameters_for_import, parse_expression_references
+from .paging import ParameterPager
+from .records import RECORD_FIELDS, param_expression, param_to_record, record_dict
+from .scope import ScopedParameters, scope_parameters
+from .snapshot import ParameterSnapshotCache
+from .table import ParamRecord, ParamTable
+from .watch import FileChange, FileWatcher
@@ -0,0 +1,252 @@
+"""
+Headless batch processing of JSON parameter files.
+
+    python -m paramlib convert IN OUT [--format FORMAT] [--canonical] [--rules RULES | --selection NAME]
+    python -m paramlib hash FILE [FILE ...]
+    python -m paramlib validate FILE [FILE ...] [--base BASE]
+    python -m paramlib apply FILE [FILE ...] --out OUT [--base BASE] [--latency SECONDS] [--update]
+    python -m paramlib merge FILE FILE [...] --out OUT [--policy first|last|prompt]
+    python -m paramlib library [--add DIR ...] [--reindex] [--processes] [--search TEXT] [--units UNITS]
+
+apply adds the parameters of each file, in order and each file as a whole or not at all, to an in-memory design that starts with the
+parameters of BASE and writes the resulting parameter set to OUT.
+Input files can be in any format of paramlib.formats, output files are written in the format
+given by --format or else the one matching their extension. With --update, parameters
+that already exist take the expression and comment from the file as well.
+convert can write only part of a file, selected by rules given as JSON or by a selection saved
+from the add-in (see paramlib.selection).
+merge combines the parameters of several files into one, names the files define differently
+are settled by --policy, prompt asks for each of them on the terminal.
+library adds folders to the parameter library the add-in searches (see paramlib.library),
+indexes them and searches it. Outside Fusion --processes parses files in worker processes.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from .canonical import read_content_hash, write_canonical_file
+from .diff import apply_update, diff_parameters
+from .expressions import validate_parameters
+from .fakefusion import FakeDesign, FakeFusion, LatencyModel
+from .importer import deferred_compute, import_parameters
+from .library import ParameterLibrary
+from .merge import POLICIES, PROMPT, merge_records
+from .formats import FORMATS, FORMAT_JSON_COMPACT, format_for_path, read_parameter_file, write_parameter_file
+from .records import param_to_record
+from .selection import SelectionError, SelectionIndex, SelectionStore
+from .table import ParamTable
+
+DEFAULT_SELECTIONS = os.path.join(os.path.expanduser('~'), '.json_parameters', 'selections.json')
+DEFAULT_LIBRARY = os.path.join(os.path.expanduser('~'), '.json_parameters', 'library.sqlite3')
+
+def validate_records(records, known=None):
+    """
+    Returns a list of problems found in a parameter file's records, empty when it can be imported
+    into a design that already has the parameters in known, a dict of name -> (value, units).
+    Expressions are parsed and evaluated, so syntax and unit errors are found as well.
+    """
+    problems = []
+    names = set()
+    valid = []
+    for index, p in enumerate(records):
+        if not isinstance(p, dict) or not isinstance(p.get('name'), str) or not p['name']:
+            problems.append(f'Record {index} has no name')
+            continue
+        if p['name'] in names:
+            problems.append(f'Duplicate parameter "{p["name"]}"')
+            continue
+        names.add(p['name'])
+        valid.append(p)
+
+    report = validate_parameters(valid, known)
+    problems.extend(f'{name}: {message}' for name, _, message in report.blocking_errors())
+    return problems
+
+def output_format(args):
+    if args.format:
+        return args.format
+    if args.compact:
+        return FORMAT_JSON_COMPACT
+    return format_for_path(args.output)
+
+def selected_records(records, args):
+    """Filters records by --rules or --selection, without either they are all kept."""
+    if not args.rules and not args.selection:
+        return records
+    rules = json.loads(args.rules) if args.rules else SelectionStore(args.selections).get(args.selection)
+    table = ParamTable(records)
+    return table.select(SelectionIndex(table).select(rules))
+
+def convert(args):
+    try:
+        records = selected_records(read_parameter_file(args.input), args)
+    except (SelectionError, json.JSONDecodeError) as e:
+        print(f'Invalid selection: {e}')
+        return 2
+    if args.canonical:
+        count, digest, written = write_canonical_file(args.output, records, output_format(args))
+        print(f'{"Converted" if written else "Unchanged"} {count} parameters in {args.output} {digest}')
+        return 0
+    count = write_parameter_file(args.output, records, output_format(args))
+    print(f'Converted {count} parameters to {args.output}')
+    return 0
+
+def hash_files(args):
+    status = 0
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f'{path}: no such file')
+            status = 1
+            continue
+        try:
+            print(f'{read_content_hash(path)}  {path}')
+        except (OSError, ValueError) as e:
+            print(f'{path}: {e}')
+            status = 1
+    return status
+
+def validate(args):
+    known = {p['name']: (p.get('value'), p.get('units', '')) for p in read_parameter_file(args.base)} if args.base else {}
+    failed = 0
+    for path in args.files:
+        try:
+            problems = validate_records(list(read_parameter_file(path)), known)
+        except ValueError as e:
+            problems = [str(e)]
+        if problems:
+            failed += 1
+            print(f'{path}:')
+            for problem in problems:
+                print('    ' + problem.replace('\n', '\n    '))
+    print(f'{len(args.files) - failed} of {len(args.files)} files valid')
+    return 1 if failed else 0
+
+def apply(args):
+    fusion = FakeFusion(LatencyModel(args.latency))
+    base = list(read_parameter_file(args.base)) if args.base else []
+    design = FakeDesign.from_records(base, fusion)
+
+    status = 0
+    start = time.perf_counter()
+    for path in args.files:
+        with deferred_compute(design):
+            if args.update:
+                current = [param_to_record(p) for p in design.userParameters]
+                diff = diff_parameters(read_parameter_file(path), current)
+                result = apply_update(design, diff, fusion.createByString, atomic=True)
+            else:
+                result = import_parameters(design, read_parameter_file(path), fusion.createByString, atomic=True)
+        if result.aborted or result.failed:
+            status = 1
+            print(f'{path}: {result.summary()}')
+
+    count = write_parameter_file(args.output, (param_to_record(p) for p in design.userParameters), output_format(args))
+    elapsed = time.perf_counter() - start
+    print(f'Applied {len(args.files)} files, wrote {count} parameters to {args.output} '
+          f'({fusion.total_calls} API calls, {elapsed:.3f}s)')
+    return status
+
+def merge(args):
+    result = merge_records([(path, read_parameter_file(path)) for path in args.files], args.policy)
+    if args.policy == PROMPT:
+        for conflict in result.conflicts:
+            print(f'{conflict.name} is defined differently:')
+            for n, (i, p) in enumerate(conflict.candidates, 1):
+                print(f'    {n}: {p.get("expression", p.get("value"))} {p.get("units", "")}  ({args.files[i]})')
+            choice = ''
+            while not choice.isdigit() or not 1 <= int(choice) <= len(conflict.candidates):
+                choice = input(f'Keep which [1-{len(conflict.candidates)}]? ').strip()
+            result.resolve({conflict.name: conflict.candidates[int(choice) - 1][0]})
+    count = write_parameter_file(args.output, result.table, output_format(args))
+    print(result.summary())
+    print(f'Wrote {count} parameters to {args.output}')
+    return 0
+
+def library(args):
+    lib = ParameterLibrary(args.db)
+    for path in args.add or []:
+        lib.add_root(path)
+    status = 0
+    if args.add or args.reindex:
+        stats = lib.ingest(workers=args.workers, processes=args.processes)
+        print(f'Indexed {stats.indexed} of {stats.scanned} files ({stats.params} parameters), '
+              f'{stats.unchanged} unchanged, {stats.removed} removed, {stats.seconds:.3f}s')
+        for path, error in stats.failed:
+            print(f'{path}: {error}')
+        status = 1 if stats.failed else 0
+    if args.search is not None:
+        start = time.perf_counter()
+        found = lib.search(args.search, args.units, limit=args.limit)
+        for row in found['rows']:
+            print(f'{row["name"]}\t{row["expression"] or row["value"]}\t{row["units"]}\t{row["file"]}')
+        more = ' or more' if found['more'] else ''
+        print(f'{found["total"]}{more} matches ({(time.perf_counter() - start) * 1000:.1f}ms)')
+    elif not (args.add or args.reindex):
+        stats = lib.stats()
+        print(f'{stats["params"]} parameters in {stats["files"]} files, folders:')
+        for root in stats['roots']:
+            print('    ' + root)
+    return status
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='paramlib', description='Batch tools for JSON parameter files.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('convert', help='Rewrite a parameter file.')
+    cmd.add_argument('input')
+    cmd.add_argument('output')
+    cmd.add_argument('--compact', action='store_true', help='Write JSON without indentation.')
+    cmd.add_argument('--format', choices=FORMATS, help='Output format, by default taken from the extension.')
+    selection = cmd.add_mutually_exclusive_group()
+    selection.add_argument('--rules', help='Selection rules as JSON, only the selected parameters are written.')
+    selection.add_argument('--selection', help='Name of a saved selection, only its parameters are written.')
+    cmd.add_argument('--selections', default=DEFAULT_SELECTIONS, help='File of saved selections.')
+    cmd.add_argument('--canonical', action='store_true', help='Write sorted records with a content hash, skip an unchanged file.')
+    cmd.set_defaults(func=convert)
+
+    cmd = commands.add_parser('hash', help='Print the content hash of parameter files.')
+    cmd.add_argument('files', nargs='+')
+    cmd.set_defaults(func=hash_files)
+
+    cmd = commands.add_parser('validate', help='Check parameter files can be imported.')
+    cmd.add_argument('files', nargs='+')
+    cmd.add_argument('--base', help='Parameter file whose names count as already defined.')
+    cmd.set_defaults(func=validate)
+
+    cmd = commands.add_parser('apply', help='Import parameter files into an in-memory design.')
+    cmd.add_argument('files', nargs='+')
+    cmd.add_argument('--out', dest='output', required=True)
+    cmd.add_argument('--base', help='Parameter file the design starts with.')
+    cmd.add_argument('--latency', type=float, default=0.0, help='Simulated seconds per API call.')
+    cmd.add_argument('--compact', action='store_true', help='Write JSON without indentation.')
+    cmd.add_argument('--format', choices=FORMATS, help='Output format, by default taken from the extension.')
+    cmd.add_argument('--update', action='store_true', help='Also update parameters that already exist.')
+    cmd.set_defaults(func=apply)
+
+    cmd = commands.add_parser('merge', help='Merge parameter files into one.')
+    cmd.add_argument('files', nargs='+')
+    cmd.add_argument('--out', dest='output', required=True)
+    cmd.add_argument('--policy', choices=POLICIES, default=POLICIES[0], help='Which definition a name defined differently keeps.')
+    cmd.add_argument('--compact', action='store_true', help='Write JSON without indentation.')
+    cmd.add_argument('--format', choices=FORMATS, help='Output format, by default taken from the extension.')
+    cmd.set_defaults(func=merge)
+
+    cmd = commands.add_parser('library', help='Index and search the parameter library.')
+    cmd.add_argument('--db', default=DEFAULT_LIBRARY, help='Library database file.')
+    cmd.add_argument('--add', nargs='+', metavar='DIR', help='Folders to add to the library, then index.')
+    cmd.add_argument('--reindex', action='store_true', help='Index new and changed files of every folder.')
+    cmd.add_argument('--workers', type=int, default=os.cpu_count() or 4, help='Files parsed at the same time.')
+    cmd.add_argument('--processes', action='store_true', help='Parse in worker processes instead of threads.')
+    cmd.add_argument('--search', help='Text to find in parameter names and comments.')
+    cmd.add_argument('--units', help='Only find parameters in these units.')
+    cmd.add_argument('--limit', type=int, default=50)
+    cmd.set_defaults(func=library)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Canonical, content hashed parameter files.
+
+A canonical export writes the same bytes for the same parameters: records sorted by name,
+fields in RECORD_FIELDS order and values rounded to 15 significant digits, which drops the
+last-bit noise of values Fusion computes. The JSON formats wrap the records in an object
+that carries the hash of its content ahead of them:
+
+    {
+        "format": "json-parameters",
+        "version": 1,
+        "hash": "sha256:...",
+        "count": 2,
+        "parameters": [...]
+    }
+
+The hash covers the canonical records only, not the layout, so compact, indented and
+compressed files of the same parameters share it. read_content_hash reads it from the first
+bytes of a file, which makes it a cheap change detector. An export whose hash matches the
+header and the records of the file on disk leaves the file alone.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+
+from .formats import FORMAT_BINARY, FORMAT_GZIP, FORMAT_JSON, FORMAT_JSON_COMPACT, detect_format, read_parameter_file, write_parameter_file
+from .records import record_dict
+
+CANONICAL_FORMAT = 'json-parameters'
+CANONICAL_VERSION = 1
+HASH_PREFIX = 'sha256:'
+
+_header_hash_re = re.compile(r'"hash"\s*:\s*"([^"]*)"')
+
+def normalize_value(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None if value is None or isinstance(value, bool) else value
+    value = float(value)
+    if math.isnan(value) or math.isinf(value):
+        return None
+    # 15 significant digits survive any float round trip, the digits beyond are noise.
+    value = float(f'{value:.15g}')
+    return 0.0 if value == 0 else value
+
+def canonical_record(p):
+    p = record_dict(p)
+    record = {'name': str(p['name'])}
+    record['value'] = normalize_value(p.get('value'))
+    # The binary format stores a missing expression as ''.
+    if p.get('expression') not in (None, ''):
+        record['expression'] = str(p['expression'])
+    record['units'] = str(p.get('units') or '')
+    record['comment'] = str(p.get('comment') or '')
+    return record
+
+def canonical_records(records):
+    """Canonical copies of records sorted by name, the first of duplicate names is kept."""
+    by_name = {}
+    for p in records:
+        record = canonical_record(p)
+        by_name.setdefault(record['name'], record)
+    return [by_name[name] for name in sorted(by_name)]
+
+def content_hash(canonical):
+    """Hash of canonical records, as returned by canonical_records."""
+    data = json.dumps(canonical, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return HASH_PREFIX + hashlib.sha256(data).hexdigest()
+
+def _read_head(path, fmt, size=4096):
+    if fmt == FORMAT_GZIP:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return f.read(size)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read(size)
+
+def read_content_hash(path, compute=True):
+    """
+    Returns the content hash of a parameter file, read from the header of a canonical file.
+    Other files are hashed from their records when compute is set, else None is returned.
+    Returns None for files that do not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    fmt = detect_format(path)
+    if fmt != FORMAT_BINARY:
+        head = _read_head(path, fmt)
+        if head.lstrip().startswith('{'):
+            header = head.split('"parameters"', 1)[0]
+            match = _header_hash_re.search(header)
+            if match:
+                return match.group(1)
+    if not compute:
+        return None
+    return content_hash(canonical_records(read_parameter_file(path)))
+
+def _records_hash(path):
+    """The content hash of a file's records, None when they can not be read."""
+    try:
+        return content_hash(canonical_records(read_parameter_file(path)))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _stored_format(fmt):
+    # detect_format can not tell compact from indented JSON.
+    return FORMAT_JSON if fmt == FORMAT_JSON_COMPACT else fmt
+
+# Files this process wrote, or found to hold the records their hash is of:
+# path -> ((mtime_ns, size), fmt, hash). A file with the same stat is not read again.
+_verified = {}
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def write_canonical_file(path, records, fmt=FORMAT_JSON, force=False):
+    """
+    Writes records canonically. Unless force is set, a file whose content hash already
+    matches is not rewritten. Returns (count, hash, written).
+
+    The file is written to a temporary file next to it and moved into place, so readers
+    never see half of it.
+    """
+    canonical = canonical_records(records)
+    digest = content_hash(canonical)
+    key = os.path.abspath(path)
+    if not force and os.path.exists(path):
+        stamp = _file_stamp(path)
+        if _verified.get(key) == (stamp, fmt, digest):
+            return len(canonical), digest, False
+        if detect_format(path) == _stored_format(fmt) and read_content_hash(path, compute=fmt == FORMAT_BINARY) == digest:
+            # A JSON file without a header is rewritten once to become canonical. A matching
+            # header is only trusted once the records are hashed too, the body may have been
+            # edited by hand and the header kept. That is done once per change of the file.
+            if fmt == FORMAT_BINARY or _records_hash(path) == digest:
+                _verified[key] = (stamp, fmt, digest)
+                return len(canonical), digest, False
+
+    temp_path = path + '.tmp'
+    try:
+        _write_canonical(temp_path, canonical, digest, fmt)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _verified[key] = (_file_stamp(path), fmt, digest)
+    return len(canonical), digest, True
+
+def _write_canonical(path, canonical, digest, fmt):
+    if fmt == FORMAT_BINARY:
+        # The binary format has no header, the hash is worked out from its records.
+        write_parameter_file(path, canonical, fmt)
+        return
+
+    document = {
+        'format': CANONICAL_FORMAT,
+        'version': CANONICAL_VERSION,
+        'hash': digest,
+        'count': len(canonical),
+        'parameters': canonical
+    }
+    if fmt == FORMAT_GZIP:
+        # mtime=0 keeps the compressed bytes the same for the same content.
+        with open(path, 'wb') as raw:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as f:
+                f.write(json.dumps(document, separators=(',', ':')).encode('utf-8'))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            if fmt == FORMAT_JSON_COMPACT:
+                json.dump(document, f, separators=(',', ':'))
+            else:
+                json.dump(document, f, indent=4)
+                f.write('\n')
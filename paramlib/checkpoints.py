@@ -0,0 +1,183 @@
+"""
+Checkpoints of a design's user parameters, kept in a delta encoded journal per document.
+
+A checkpoint stores the name, expression, units and comment of every parameter. The journal
+is a gzip file of JSON lines appended one checkpoint at a time: the first, and every
+full_every-th after it, holds the full state, the others only the parameters set or removed
+since the checkpoint before. Checkpoints of a large design that an import changed a little
+take a few hundred bytes each.
+
+Restoring works out the difference between a checkpoint and the current parameters, so only
+the parameters that differ are written.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from .records import param_definition
+from .diff import diff_parameters
+
+class CheckpointError(ValueError):
+    pass
+
+def parameter_state(records):
+    """name -> (expression, units, comment) of records, the first of duplicate names wins."""
+    state = {}
+    for p in records:
+        if p['name'] not in state:
+            state[p['name']] = param_definition(p)
+    return state
+
+def state_records(state):
+    return [{'name': name, 'expression': expression, 'units': units, 'comment': comment}
+            for name, (expression, units, comment) in state.items()]
+
+def journal_path(folder, document_key):
+    """A journal file name for a document id, which may hold any characters."""
+    return os.path.join(folder, hashlib.sha1(document_key.encode('utf-8')).hexdigest()[:20] + '.jsonl.gz')
+
+class CheckpointJournal:
+    def __init__(self, path, full_every=20, keep=50):
+        self.path = path
+        self.full_every = full_every
+        self.keep = keep  # Older checkpoints are dropped beyond this many
+        self._entries = None
+        self._last_state = None  # State of the newest checkpoint, so adding one does not replay the journal
+
+    def entries(self):
+        if self._entries is None:
+            self._entries = []
+            if os.path.exists(self.path):
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    self._entries = [json.loads(line) for line in f if line.strip()]
+        return self._entries
+
+    def checkpoints(self):
+        """Summaries of the checkpoints, oldest first."""
+        return [{
+            'id': entry['id'],
+            'time': entry['time'],
+            'label': entry['label'],
+            'count': entry['count'],
+            'changes': len(entry['set']) + len(entry['removed']),
+            'full': entry['full']
+        } for entry in self.entries()]
+
+    def state(self, checkpoint_id=None):
+        """The parameter state of a checkpoint, by default the newest."""
+        entries = self.entries()
+        if not entries:
+            raise CheckpointError('There are no checkpoints')
+        if checkpoint_id is None or checkpoint_id == entries[-1]['id']:
+            if self._last_state is None:
+                self._last_state = self._replay(len(entries) - 1)
+            return dict(self._last_state)
+        for i, entry in enumerate(entries):
+            if entry['id'] == checkpoint_id:
+                return self._replay(i)
+        raise CheckpointError(f'No checkpoint {checkpoint_id}')
+
+    def _replay(self, end):
+        entries = self.entries()
+        start = end
+        while not entries[start]['full']:
+            start -= 1
+        state = {}
+        for entry in entries[start:end + 1]:
+            for name in entry['removed']:
+                state.pop(name, None)
+            for name, expression, units, comment in entry['set']:
+                state[name] = (expression, units, comment)
+        return state
+
+    def add(self, records, label=''):
+        """
+        Records a checkpoint of records, the design's current parameters. When nothing
+        changed since the newest checkpoint no entry is written and its id is returned.
+        """
+        state = parameter_state(records)
+        entries = self.entries()
+        previous = self.state() if entries else None
+        if previous == state:
+            return entries[-1]['id']
+
+        entry = self._encode(state, previous, entries[-1]['id'] + 1 if entries else 1,
+                             self._since_full() >= self.full_every)
+        entry['time'] = time.time()
+        entry['label'] = label
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Each append is a gzip member of its own, a reader sees them as one stream.
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        entries.append(entry)
+        self._last_state = state
+        if len(entries) >= self.keep + self.full_every:
+            self.prune()
+        return entry['id']
+
+    def _since_full(self):
+        """Entries since the newest full one, full_every when there is none that recent."""
+        entries = self.entries()
+        for n in range(min(len(entries), self.full_every)):
+            if entries[-1 - n]['full']:
+                return n + 1
+        return self.full_every
+
+    @staticmethod
+    def _encode(state, previous, checkpoint_id, full):
+        if full or previous is None:
+            changed, removed = state.items(), []
+        else:
+            changed = [(name, d) for name, d in state.items() if previous.get(name) != d]
+            removed = [name for name in previous if name not in state]
+        return {
+            'id': checkpoint_id,
+            'full': full or previous is None,
+            'count': len(state),
+            'set': [[name, *d] for name, d in changed],
+            'removed': removed
+        }
+
+    def prune(self):
+        """
+        Drops the oldest checkpoints beyond keep. They are dropped up to the newest full
+        checkpoint that keeps at least keep, which then starts the journal as it is, so
+        nothing is replayed. add only prunes once keep + full_every checkpoints have
+        built up, so the journal is rewritten about every full_every checkpoints.
+        """
+        entries = self.entries()
+        drop = len(entries) - self.keep
+        if drop <= 0:
+            return
+        start = next(i for i in range(drop, -1, -1) if entries[i]['full'] or i == 0)
+        if start > 0:
+            rewritten = entries[start:]
+        else:
+            # No full checkpoint to start from, the oldest one kept is made full. The
+            # changes recorded after it still apply.
+            first = self._encode(self._replay(drop), None, entries[drop]['id'], True)
+            first['time'] = entries[drop]['time']
+            first['label'] = entries[drop]['label']
+            rewritten = [first] + entries[drop + 1:]
+
+        temp_path = self.path + '.tmp'
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            for entry in rewritten:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        os.replace(temp_path, self.path)
+        self._entries = rewritten
+
+    def restore_plan(self, checkpoint_id, current_records):
+        """
+        Returns (diff, removed) bringing current_records back to a checkpoint: diff holds the
+        parameters to add or change, removed the names added since, in the order of
+        current_records.
+        """
+        state = self.state(checkpoint_id)
+        diff = diff_parameters(state_records(state), current_records)
+        removed = [p['name'] for p in diff.removed]
+        diff.removed = []
+        return diff, removed
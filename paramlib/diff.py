@@ -0,0 +1,186 @@
+"""Comparing incoming parameter records with a design and applying only the differences."""
+
+import re
+
+from .importer import delete_parameters, import_parameters
+from .ordering import order_parameters_for_import, format_import_problems
+from .records import param_expression
+from .tracing import tracer
+
+ADDED = 'added'
+CHANGED_EXPRESSION = 'expression'
+CHANGED_META = 'meta'
+UNCHANGED = 'unchanged'
+REMOVED = 'removed'
+
+_whitespace_re = re.compile(r'\s+')
+
+def normalize_expression(expression):
+    # Fusion may hand back '10mm' for '10 mm', spacing never changes the meaning.
+    return _whitespace_re.sub('', str(expression))
+
+class ParameterDiff:
+    """Incoming records sorted into ADDED, CHANGED_EXPRESSION, CHANGED_META, UNCHANGED and REMOVED."""
+    def __init__(self):
+        self.added = []
+        self.changed_expression = []  # (record, current record)
+        self.changed_meta = []  # (record, current record), only comment or units differ
+        self.unchanged = []
+        self.removed = []  # Current records not in the incoming set, reported but never deleted
+
+    @property
+    def write_count(self):
+        return len(self.added) + len(self.changed_expression) + len(self.changed_meta)
+
+    def to_dict(self):
+        """Summary for the palette preview."""
+        def change(p, current):
+            return {
+                'name': p['name'],
+                'expression': [current.get('expression'), param_expression(p)],
+                'units': [current.get('units', ''), p.get('units', '')],
+                'comment': [current.get('comment', ''), p.get('comment', '')]
+            }
+        return {
+            ADDED: [p['name'] for p in self.added],
+            CHANGED_EXPRESSION: [change(p, current) for p, current in self.changed_expression],
+            CHANGED_META: [change(p, current) for p, current in self.changed_meta],
+            UNCHANGED: [p['name'] for p in self.unchanged],
+            REMOVED: [p['name'] for p in self.removed]
+        }
+
+def diff_parameters(records, current_records, selected_names=None):
+    """
+    Compares incoming records with the current records of a design by name.
+    selected_names limits which incoming records are considered, removed is always
+    worked out against the full incoming set.
+    """
+    with tracer.span('diff'):
+        return _diff_parameters(records, current_records, selected_names)
+
+def _diff_parameters(records, current_records, selected_names):
+    diff = ParameterDiff()
+    current = {p['name']: p for p in current_records}
+    incoming_names = set()
+    for p in records:
+        incoming_names.add(p['name'])
+        if selected_names is not None and p['name'] not in selected_names:
+            continue
+        existing = current.get(p['name'])
+        if existing is None:
+            diff.added.append(p)
+        elif normalize_expression(param_expression(p)) != normalize_expression(existing.get('expression', '')):
+            diff.changed_expression.append((p, existing))
+        elif p.get('units', '') != existing.get('units', '') or p.get('comment', '') != existing.get('comment', ''):
+            diff.changed_meta.append((p, existing))
+        else:
+            diff.unchanged.append(p)
+    diff.removed = [p for name, p in current.items() if name not in incoming_names]
+    return diff
+
+class UpdateResult:
+    def __init__(self, diff):
+        self.diff = diff
+        self.added = []  # Parameter objects created
+        self.updated = []  # Parameter objects whose expression or comment was set
+        self.failed = []  # (record, error message)
+        self.unit_changes = []  # Names whose units differ, the API can not change a parameter's unit
+        self.unresolved = {}
+        self.cycles = []
+        self.rolled_back = False
+
+    @property
+    def aborted(self):
+        return bool(self.unresolved or self.cycles)
+
+    @property
+    def ok(self):
+        return not (self.aborted or self.failed)
+
+    def summary(self):
+        if self.aborted:
+            return 'Update aborted, no parameters were changed.\n\n' + format_import_problems(self.unresolved, self.cycles)
+        if self.rolled_back:
+            message = 'Update rolled back, no parameters were changed.'
+        else:
+            message = (f'Added {len(self.added)}, updated {len(self.updated)}, '
+                       f'{len(self.diff.unchanged)} unchanged, {len(self.diff.removed)} not in file.')
+        if self.unit_changes:
+            message += '\n\nUnits can not be changed in place, re-create these parameters:\n' + '\n'.join(self.unit_changes)
+        if self.failed:
+            message += '\n\nFailed:\n' + '\n'.join(
+                f'{p["name"]} = {param_expression(p)}: {error}' for p, error in self.failed)
+        return message
+
+def apply_update(design, diff, create_value, atomic=False, known_names=None):
+    """
+    Writes the differences in diff to design with the fewest API calls: new parameters are
+    added, changed expressions and comments are set on the existing parameters and
+    unchanged parameters are not touched. With atomic, the first failure restores the
+    changed parameters and deletes the added ones. known_names, the names of every parameter
+    of the design, is read from the design unless given.
+    """
+    result = UpdateResult(diff)
+    userParams = design.userParameters
+    if known_names is None:
+        known_names = {p.name for p in design.allParameters}
+
+    # New expressions may reference each other, so they are set in dependency order.
+    added_names = {p['name'] for p in diff.added}
+    known_names = set(known_names) | added_names
+    changed = [p for p, _ in diff.changed_expression]
+    with tracer.span('order'):
+        ordered, result.unresolved, result.cycles = order_parameters_for_import(changed, known_names)
+    if result.aborted:
+        return result
+
+    if diff.added:
+        # The diff has sorted out what is in the design already, the added names are not.
+        imported = import_parameters(design, diff.added, create_value, atomic=atomic,
+                                     existing=(), known_names=known_names - added_names)
+        result.unresolved, result.cycles = imported.unresolved, imported.cycles
+        if imported.aborted:
+            return result
+        result.added = imported.added
+        result.failed.extend(imported.failed)
+        if imported.rolled_back:
+            result.rolled_back = True
+            return result
+
+    # (param, previous expression, previous comment) for undoing an atomic update.
+    previous = []
+    current = {p['name']: existing for p, existing in diff.changed_expression}
+    changes = [(p, current[p['name']], True) for p in ordered]
+    changes += [(p, existing, False) for p, existing in diff.changed_meta]
+    for p, existing, set_expression in changes:
+        comment_changed = p.get('comment', '') != existing.get('comment', '')
+        if p.get('units', '') != existing.get('units', ''):
+            result.unit_changes.append(p['name'])
+        if not set_expression and not comment_changed:
+            continue
+        try:
+            param = userParams.itemByName(p['name'])
+            previous.append((param, existing.get('expression'), existing.get('comment', '')))
+            if set_expression:
+                param.expression = param_expression(p)
+            if comment_changed:
+                param.comment = p.get('comment', '')
+            result.updated.append(param)
+        except Exception as e:
+            result.failed.append((p, str(e)))
+            if atomic:
+                rollback_update(result, previous)
+                break
+    return result
+
+def rollback_update(result, previous):
+    # Expressions are restored newest first, the reverse of the order they were set in.
+    for param, expression, comment in reversed(previous):
+        if param.expression != expression:
+            param.expression = expression
+        if param.comment != comment:
+            param.comment = comment
+    delete_parameters(result.added)
+    result.added = []
+    result.updated = []
+    result.rolled_back = True
@@ -0,0 +1,623 @@
+"""
+Offline parsing and unit-aware evaluation of Fusion parameter expressions.
+
+Values are kept in Fusion's internal units (cm, rad, kg, s), the same units Parameter.value
+reports, together with a dimension vector (length, angle, mass, time). A unitless number
+next to a quantity with units takes the units of the parameter being evaluated, the way
+Fusion reads '10' in a millimetre parameter as 10 mm.
+
+validate_parameters checks and evaluates a whole set of records before anything is written
+to a design and reports syntax errors, unknown references, cycles and unit mismatches.
+"""
+
+import gc
+import math
+import re
+import threading
+from contextlib import contextmanager
+
+from .records import param_expression
+from .table import ParamRecord
+
+DIMENSIONLESS = (0, 0, 0, 0)
+LENGTH = (1, 0, 0, 0)
+ANGLE = (0, 1, 0, 0)
+MASS = (0, 0, 1, 0)
+TIME = (0, 0, 0, 1)
+
+# unit -> (factor to internal units, dimensions)
+UNITS = {
+    'mm': (0.1, LENGTH), 'cm': (1.0, LENGTH), 'm': (100.0, LENGTH), 'km': (100000.0, LENGTH),
+    'um': (0.0001, LENGTH), 'micron': (0.0001, LENGTH), 'nm': (1e-7, LENGTH),
+    'in': (2.54, LENGTH), 'ft': (30.48, LENGTH), 'yd': (91.44, LENGTH), 'mi': (160934.4, LENGTH),
+    'mil': (0.00254, LENGTH), 'thou': (0.00254, LENGTH),
+    'rad': (1.0, ANGLE), 'deg': (math.pi / 180, ANGLE), 'grad': (math.pi / 200, ANGLE),
+    'kg': (1.0, MASS), 'g': (0.001, MASS), 'lb': (0.45359237, MASS), 'lbmass': (0.45359237, MASS),
+    'oz': (0.028349523125, MASS), 'ozm': (0.028349523125, MASS), 'slug': (14.5939029372, MASS),
+    's': (1.0, TIME), 'sec': (1.0, TIME), 'ms': (0.001, TIME), 'min': (60.0, TIME), 'hr': (3600.0, TIME),
+    # Force and pressure in kg, cm and s.
+    'N': (100.0, (1, 0, 1, -2)), 'lbf': (444.822161526, (1, 0, 1, -2)),
+    'Pa': (0.01, (-1, 0, 1, -2)), 'kPa': (10.0, (-1, 0, 1, -2)), 'MPa': (10000.0, (-1, 0, 1, -2)),
+    'psi': (68.9475729318, (-1, 0, 1, -2)),
+}
+
+CONSTANTS = {'PI': math.pi, 'E': math.e}
+
+SYNTAX = 'syntax'
+REFERENCE = 'reference'
+UNIT = 'unit'
+UNSUPPORTED = 'unsupported'
+
+class ExpressionError(ValueError):
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+_token_re = re.compile(
+    r"\s*(?:((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|([A-Za-z_][A-Za-z0-9_]*)|('[^']*'|\"[^\"]*\")|(\S))"
+)
+
+def tokenize(text):
+    """Splits text into (number, identifier, quoted text, operator) tuples, one field set each."""
+    return _token_re.findall(text)
+
+_END = ('', '', '', '')
+
+# Nodes are tuples: ('num', value, dims), ('str', text), ('ref', name), ('neg', node),
+# ('bin', op, left, right) and ('call', name, [args]).
+_BINARY_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '^': 4}
+
+class _Parser:
+    __slots__ = ('tokens', 'pos', 'text')
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.tokens.append(_END)
+        self.pos = 0
+
+    def error(self, message):
+        raise ExpressionError(SYNTAX, f'{message} in "{self.text}"')
+
+    def parse(self):
+        if self.tokens[0] is _END:
+            self.error('Empty expression')
+        node = self.expression(0)
+        token = self.tokens[self.pos]
+        if token is not _END:
+            self.error(f'Unexpected "{"".join(token)}"')
+        return node
+
+    def expression(self, min_precedence):
+        left = self.unary()
+        tokens = self.tokens
+        while True:
+            precedence = _BINARY_PRECEDENCE.get(tokens[self.pos][3])
+            if precedence is None or precedence < min_precedence:
+                return left
+            op = tokens[self.pos][3]
+            self.pos += 1
+            # ^ is right associative, the others left associative.
+            right = self.expression(precedence if op == '^' else precedence + 1)
+            left = ('bin', op, left, right)
+
+    def unary(self):
+        op = self.tokens[self.pos][3]
+        if op == '-':
+            self.pos += 1
+            return ('neg', self.expression(3))
+        if op == '+':
+            self.pos += 1
+            return self.expression(3)
+        return self.primary()
+
+    def primary(self):
+        tokens = self.tokens
+        token = tokens[self.pos]
+        if token is _END:
+            self.error('Unexpected end')
+        number, ident, string, op = token
+        self.pos += 1
+        if number:
+            # A unit directly after a number belongs to it: '10 mm'.
+            unit = tokens[self.pos][1]
+            if unit in UNITS:
+                self.pos += 1
+                factor, dims = UNITS[unit]
+                # And so does its power: '10 mm^2' is 10 square millimetres, not (10 mm)^2.
+                if tokens[self.pos][3] == '^' and tokens[self.pos + 1][0]:
+                    power = float(tokens[self.pos + 1][0])
+                    self.pos += 2
+                    factor, dims = factor ** power, _scale_dims(dims, power)
+                return ('num', float(number) * factor, dims)
+            if unit and tokens[self.pos + 1][3] != '(':
+                # Nothing else may follow a number directly, so this is a unit too.
+                raise ExpressionError(UNSUPPORTED, f'Unknown unit "{unit}" in "{self.text}"')
+            return ('num', float(number), DIMENSIONLESS)
+        if ident:
+            if tokens[self.pos][3] == '(':
+                return self.call(ident)
+            if ident in UNITS:
+                factor, dims = UNITS[ident]
+                return ('num', factor, dims)
+            if ident in CONSTANTS:
+                return ('num', CONSTANTS[ident], DIMENSIONLESS)
+            return ('ref', ident)
+        if string:
+            return ('str', string[1:-1])
+        if op == '(':
+            node = self.expression(0)
+            if tokens[self.pos][3] != ')':
+                self.error('Missing ")"')
+            self.pos += 1
+            return node
+        self.error(f'Unexpected "{op}"')
+
+    def call(self, name):
+        self.pos += 1
+        args = []
+        tokens = self.tokens
+        if tokens[self.pos][3] == ')':
+            self.pos += 1
+            return ('call', name, args)
+        while True:
+            args.append(self.expression(0))
+            op = tokens[self.pos][3]
+            self.pos += 1
+            if op == ',':
+                continue
+            if op == ')':
+                return ('call', name, args)
+            self.error(f'Missing ")" after arguments of {name}')
+
+_number = r'(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+_operand = rf'(?:([A-Za-z_][A-Za-z0-9_]*)|({_number})\s*([A-Za-z_]+)?)'
+# A number with a unit, a name, or one operation on two of those, such as 'width + 10 mm'.
+_simple_re = re.compile(rf'\s*{_operand}\s*(?:([-+*/])\s*{_operand}\s*)?$')
+_parse_cache = {}
+
+def _operand_node(ident, number, unit, text):
+    if ident:
+        if ident in UNITS:
+            factor, dims = UNITS[ident]
+            return ('num', factor, dims)
+        if ident in CONSTANTS:
+            return ('num', CONSTANTS[ident], DIMENSIONLESS)
+        return ('ref', ident)
+    if unit is None:
+        return ('num', float(number), DIMENSIONLESS)
+    if unit not in UNITS:
+        raise ExpressionError(UNSUPPORTED, f'Unknown unit "{unit}" in "{text}"')
+    factor, dims = UNITS[unit]
+    return ('num', float(number) * factor, dims)
+
+def _parse(text):
+    """(node, referenced names) of an expression, cached by expression text."""
+    parsed = _parse_cache.get(text)
+    if parsed is None:
+        # Most parameters are that simple, they skip the parser.
+        simple = _simple_re.match(text)
+        if simple is not None:
+            ident, number, unit, op, ident2, number2, unit2 = simple.groups()
+            node = _operand_node(ident, number, unit, text)
+            refs = (ident,) if node[0] == 'ref' else ()
+            if op is not None:
+                right = _operand_node(ident2, number2, unit2, text)
+                if right[0] == 'ref' and ident2 not in refs:
+                    refs += (ident2,)
+                node = ('bin', op, node, right)
+            parsed = (node, refs)
+        else:
+            node = _Parser(text).parse()
+            parsed = (node, tuple(node_references(node)))
+        if len(_parse_cache) > 200000:
+            _parse_cache.clear()
+        _parse_cache[text] = parsed
+    return parsed
+
+def parse_expression(text):
+    """Parses an expression into a node tree. Results are cached by expression text."""
+    return _parse(text)[0]
+
+def node_references(node, refs=None):
+    """Returns the parameter names a parsed expression references."""
+    if refs is None:
+        refs = []
+    kind = node[0]
+    if kind == 'ref':
+        if node[1] not in refs:
+            refs.append(node[1])
+    elif kind == 'neg':
+        node_references(node[1], refs)
+    elif kind == 'bin':
+        node_references(node[2], refs)
+        node_references(node[3], refs)
+    elif kind == 'call':
+        for arg in node[2]:
+            node_references(arg, refs)
+    return refs
+
+_unit_token_re = re.compile(r'\s*([A-Za-z_]+|[*/^()]|-?\d+)')
+_unit_cache = {'': (1.0, DIMENSIONLESS)}
+
+def parse_unit(unit):
+    """Returns (factor, dims) for a unit string such as 'mm', 'mm^2' or 'kg / m^3'."""
+    cached = _unit_cache.get(unit)
+    if cached is not None:
+        return cached
+    factor = 1.0
+    dims = DIMENSIONLESS
+    sign = 1
+    tokens = _unit_token_re.findall(unit)
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if token == '*':
+            sign = 1
+        elif token == '/':
+            sign = -1
+        elif token in ('(', ')'):
+            continue
+        elif token in UNITS:
+            power = 1
+            if i + 1 < len(tokens) and tokens[i] == '^':
+                power = int(tokens[i + 1])
+                i += 2
+            unit_factor, unit_dims = UNITS[token]
+            factor *= unit_factor ** (sign * power)
+            dims = tuple(d + sign * power * u for d, u in zip(dims, unit_dims))
+        else:
+            raise ExpressionError(UNSUPPORTED, f'Unknown unit "{unit}"')
+    _unit_cache[unit] = (factor, dims)
+    return factor, dims
+
+def describe_dims(dims):
+    names = {DIMENSIONLESS: 'unitless', LENGTH: 'a length', ANGLE: 'an angle', MASS: 'a mass', TIME: 'a time'}
+    if dims in names:
+        return names[dims]
+    parts = []
+    for symbol, power in zip(('length', 'angle', 'mass', 'time'), dims):
+        if power:
+            parts.append(symbol if power == 1 else f'{symbol}^{power}')
+    return ' * '.join(parts)
+
+def _match_dims(a, b, default):
+    """Brings a unitless operand of + or - to the other operand's units."""
+    (av, ad), (bv, bd) = a, b
+    if ad == bd:
+        return a, b
+    default_factor, default_dims = default
+    if ad == DIMENSIONLESS:
+        return (av * (default_factor if bd == default_dims else 1.0), bd), b
+    if bd == DIMENSIONLESS:
+        return a, (bv * (default_factor if ad == default_dims else 1.0), ad)
+    raise ExpressionError(UNIT, f'Can not add {describe_dims(ad)} and {describe_dims(bd)}')
+
+def _combine_dims(a, b, sign):
+    """Dimensions of a product (sign 1) or quotient (sign -1)."""
+    if b == DIMENSIONLESS:
+        return a
+    if a == DIMENSIONLESS and sign == 1:
+        return b
+    return tuple(x + sign * y for x, y in zip(a, b))
+
+def _scale_dims(dims, power):
+    scaled = tuple(d * power for d in dims)
+    if any(s != int(s) for s in scaled):
+        raise ExpressionError(UNIT, f'Can not raise {describe_dims(dims)} to {power}')
+    return tuple(int(s) for s in scaled)
+
+def _unitless(name, q):
+    if q[1] != DIMENSIONLESS:
+        raise ExpressionError(UNIT, f'{name} needs a unitless argument, got {describe_dims(q[1])}')
+    return q[0]
+
+def _angle(name, q):
+    if q[1] not in (ANGLE, DIMENSIONLESS):
+        raise ExpressionError(UNIT, f'{name} needs an angle, got {describe_dims(q[1])}')
+    return q[0]
+
+def _same_dims(name, args, default):
+    first = args[0]
+    for other in args[1:]:
+        first, other = _match_dims(first, other, default)
+    return first[1]
+
+_TRIG = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan}
+_INVERSE_TRIG = {'asin': math.asin, 'acos': math.acos, 'atan': math.atan}
+_HYPERBOLIC = {'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh,
+               'asinh': math.asinh, 'acosh': math.acosh, 'atanh': math.atanh}
+_PLAIN = {'exp': math.exp, 'ln': math.log, 'log': math.log10}
+_KEEP_UNITS = {'abs': abs, 'ceil': math.ceil, 'floor': math.floor, 'round': round}
+
+def _call(name, args, default):
+    count = len(args)
+
+    def need(n):
+        if count != n:
+            raise ExpressionError(SYNTAX, f'{name} takes {n} argument{"s" if n != 1 else ""}, got {count}')
+
+    if name in _TRIG:
+        need(1)
+        return _TRIG[name](_angle(name, args[0])), DIMENSIONLESS
+    if name in _INVERSE_TRIG:
+        need(1)
+        return _INVERSE_TRIG[name](_unitless(name, args[0])), ANGLE
+    if name in _HYPERBOLIC:
+        need(1)
+        return _HYPERBOLIC[name](_unitless(name, args[0])), DIMENSIONLESS
+    if name in _PLAIN:
+        need(1)
+        return _PLAIN[name](_unitless(name, args[0])), DIMENSIONLESS
+    if name in _KEEP_UNITS:
+        need(1)
+        return float(_KEEP_UNITS[name](args[0][0])), args[0][1]
+    if name == 'sign':
+        need(1)
+        value = args[0][0]
+        return float((value > 0) - (value < 0)), DIMENSIONLESS
+    if name == 'sqrt':
+        need(1)
+        return math.sqrt(args[0][0]), _scale_dims(args[0][1], 0.5)
+    if name == 'pow':
+        need(2)
+        power = _unitless(name, args[1])
+        return args[0][0] ** power, _scale_dims(args[0][1], power)
+    if name in ('max', 'min'):
+        if not args:
+            raise ExpressionError(SYNTAX, f'{name} needs at least one argument')
+        dims = _same_dims(name, args, default)
+        matched = [_match_dims(arg, (0.0, dims), default)[0][0] for arg in args]
+        return (max if name == 'max' else min)(matched), dims
+    if name == 'random':
+        need(0)
+        # Fusion draws a new number on every recompute, any value in range will do for a preview.
+        return 0.5, DIMENSIONLESS
+    raise ExpressionError(UNSUPPORTED, f'Unknown function "{name}"')
+
+def evaluate(node, lookup, default=(1.0, DIMENSIONLESS)):
+    """
+    Evaluates a parsed expression to (value, dims). lookup maps a parameter name to its
+    (value, dims), default is the (factor, dims) of the unit unitless numbers are read in.
+    """
+    kind = node[0]
+    if kind == 'num':
+        return node[1], node[2]
+    if kind == 'ref':
+        try:
+            return lookup[node[1]]
+        except KeyError:
+            raise ExpressionError(REFERENCE, f'Unknown parameter "{node[1]}"')
+    if kind == 'bin':
+        op, a, b = node[1], node[2], node[3]
+        # Numbers and references are read in place, most operands are one or the other.
+        try:
+            a = (a[1], a[2]) if a[0] == 'num' else lookup[a[1]] if a[0] == 'ref' else evaluate(a, lookup, default)
+            b = (b[1], b[2]) if b[0] == 'num' else lookup[b[1]] if b[0] == 'ref' else evaluate(b, lookup, default)
+        except KeyError as e:
+            raise ExpressionError(REFERENCE, f'Unknown parameter "{e.args[0]}"')
+        if op == '+' or op == '-':
+            if a[1] != b[1]:
+                a, b = _match_dims(a, b, default)
+            return (a[0] + b[0] if op == '+' else a[0] - b[0]), a[1]
+        if op == '*':
+            return a[0] * b[0], _combine_dims(a[1], b[1], 1)
+        if op == '/':
+            if b[0] == 0:
+                raise ExpressionError(UNIT, 'Division by zero')
+            return a[0] / b[0], _combine_dims(a[1], b[1], -1)
+        power = _unitless('^', b)
+        return a[0] ** power, _scale_dims(a[1], power)
+    if kind == 'neg':
+        value, dims = evaluate(node[1], lookup, default)
+        return -value, dims
+    if kind == 'call':
+        return _call(node[1], [evaluate(arg, lookup, default) for arg in node[2]], default)
+    if kind == 'str':
+        raise ExpressionError(UNSUPPORTED, 'Text can not be evaluated as a number')
+    raise ExpressionError(SYNTAX, f'Unknown node {kind}')
+
+def evaluate_expression(expression, units='', lookup=None):
+    """
+    Evaluates expression for a parameter with the given units and returns its value in internal
+    units. Raises ExpressionError when it can not be parsed, references an unknown name or its
+    units do not match.
+    """
+    factor, dims = parse_unit(units or '')
+    value, result_dims = evaluate(parse_expression(expression), lookup or {}, (factor, dims))
+    if result_dims == dims:
+        return value
+    if result_dims == DIMENSIONLESS:
+        return value * factor
+    raise ExpressionError(UNIT, f'Expression is {describe_dims(result_dims)} but the parameter is {describe_dims(dims)} ({units})')
+
+class ValidationReport:
+    def __init__(self):
+        self.values = {}  # name -> value in internal units
+        self.errors = []  # (name, kind, message)
+
+    @property
+    def ok(self):
+        return not self.blocking_errors()
+
+    def blocking_errors(self):
+        """Errors Fusion would reject too. Unsupported functions or units are only warnings."""
+        return [error for error in self.errors if error[1] != UNSUPPORTED]
+
+    def summary(self, limit=50):
+        lines = [f'{name}: {message}' for name, _, message in self.errors[:limit]]
+        if len(self.errors) > limit:
+            lines.append(f'... and {len(self.errors) - limit} more')
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {
+            'values': self.values,
+            'errors': [{'name': name, 'kind': kind, 'message': message} for name, kind, message in self.errors]
+        }
+
+_gc_lock = threading.Lock()
+_gc_pauses = 0  # Pauses in progress on the main thread, the last one to end restores the collector
+_gc_was_enabled = False
+
+@contextmanager
+def _paused_gc():
+    """
+    Pauses the cyclic garbage collector on the main thread. Parsing many records allocates
+    hundreds of thousands of tuples, which can not form cycles but make it walk the whole heap
+    several times. The collector is shared by every thread of the interpreter, Fusion's
+    included, so validating on another thread, such as a background import's, leaves it on.
+    """
+    global _gc_pauses, _gc_was_enabled
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    with _gc_lock:
+        if not _gc_pauses:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_pauses += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_pauses -= 1
+            if not _gc_pauses and _gc_was_enabled:
+                gc.enable()
+
+def validate_parameters(records, known=None):
+    """
+    Parses and evaluates records in dependency order without touching a design.
+    known maps names already in the design to (value, units), e.g. from exported records.
+    A record using an unsupported function or unit gets a warning, the records that depend
+    on it are not evaluated and get none.
+    """
+    with _paused_gc():
+        return _validate_parameters(records, known)
+
+def _validate_parameters(records, known):
+    report = ValidationReport()
+    errors = report.errors
+    values = report.values
+    lookup = {}
+    failed = set()
+    unknown = set()  # Names whose value could not be worked out, only for lack of support
+    known_names = set(known or ())
+    for name, (value, units) in (known or {}).items():
+        try:
+            lookup[name] = (value or 0.0, parse_unit(units or '')[1])
+        except ExpressionError:
+            unknown.add(name)
+
+    entries = {}  # name -> (node, refs, units), None when it did not parse. The first of duplicate names wins.
+    for p in records:
+        if type(p) is ParamRecord:
+            # Its slots read much faster than through the record dict interface.
+            name, expression, units = p.name, p.expression, p.units
+            if expression is None:
+                expression = param_expression(p)
+        else:
+            name, expression, units = p['name'], param_expression(p), p.get('units') or ''
+        if name in entries:
+            continue
+        try:
+            node, refs = _parse(expression)
+        except ExpressionError as e:
+            errors.append((name, e.kind, str(e)))
+            (unknown if e.kind == UNSUPPORTED else failed).add(name)
+            entries[name] = None
+            continue
+        entries[name] = (node, refs, units)
+
+    units_parsed = {}
+
+    def check(name, node, refs, units):
+        try:
+            if refs and (failed or unknown):
+                broken = [ref for ref in refs if ref in failed]
+                if broken:
+                    raise ExpressionError(REFERENCE, f'Depends on {broken[0]}, which has errors')
+                if any(ref in unknown for ref in refs):
+                    # A value that could not be worked out is not an error, Fusion may well accept it.
+                    unknown.add(name)
+                    return
+            unit = units_parsed.get(units)
+            if unit is None:
+                try:
+                    unit = parse_unit(units)
+                except ExpressionError as e:
+                    unit = e
+                units_parsed[units] = unit
+            if type(unit) is ExpressionError:
+                raise unit
+            factor, dims = unit
+            if refs or node[0] != 'num':
+                value, result_dims = evaluate(node, lookup, unit)
+            else:
+                value, result_dims = node[1], node[2]
+            if result_dims != dims:
+                if result_dims != DIMENSIONLESS:
+                    raise ExpressionError(UNIT, f'Expression is {describe_dims(result_dims)} but the parameter is {describe_dims(dims)} ({units})')
+                value *= factor
+        except ExpressionError as e:
+            errors.append((name, e.kind, str(e)))
+            (unknown if e.kind == UNSUPPORTED else failed).add(name)
+            return
+        except (ArithmeticError, ValueError) as e:
+            errors.append((name, UNIT, f'Can not evaluate: {e}'))
+            failed.add(name)
+            return
+        lookup[name] = (value, dims)
+        values[name] = value
+
+    # Each record is checked once the records it references are, walking into those first.
+    settled = known_names - entries.keys()  # Names that can be referenced as they are
+    settled.update(name for name, entry in entries.items() if entry is None)
+    visiting = set()
+    for first, entry in entries.items():
+        if first in settled:
+            continue
+        node, refs, units = entry
+        for ref in refs:
+            if ref not in settled:
+                break
+        else:
+            # Usually all it references came before it.
+            settled.add(first)
+            check(first, node, refs, units)
+            continue
+        stack = [first]
+        visiting.add(first)
+        while stack:
+            name = stack[-1]
+            node, refs, units = entries[name]
+            waiting = None
+            for ref in refs:
+                if ref not in settled and ref in entries:
+                    waiting = ref
+                    break
+            if waiting is not None:
+                if waiting in visiting:
+                    loop = stack[stack.index(waiting):]
+                    errors.append((waiting, REFERENCE, 'Dependency cycle ' + ' -> '.join(loop + [waiting])))
+                    failed.update(loop)
+                    settled.update(loop)
+                    visiting.difference_update(loop)
+                    del stack[-len(loop):]
+                else:
+                    visiting.add(waiting)
+                    stack.append(waiting)
+                continue
+            stack.pop()
+            visiting.discard(name)
+            settled.add(name)
+            for ref in refs:
+                if ref not in settled:
+                    missing = [ref for ref in refs if ref not in settled]
+                    errors.append((name, REFERENCE, f'Unknown parameter{"s" if len(missing) > 1 else ""} {", ".join(missing)}'))
+                    failed.add(name)
+                    break
+            else:
+                check(name, node, refs, units)
+    return report
@@ -0,0 +1,332 @@
+"""
+In-memory stand-in for the parts of the Fusion API this add-in uses.
+
+FakeDesign mirrors design.userParameters / design.allParameters / design.allComponents, with
+model parameters that user parameters may reference, and FakeFusion.createByString
+mirrors adsk.core.ValueInput.createByString. Every property read and method call is counted
+and charged the time given by a LatencyModel to approximate Fusion's cross-process calls.
+"""
+
+import re
+import time
+from collections import Counter
+
+from .expressions import DIMENSIONLESS, UNSUPPORTED, ExpressionError, evaluate_expression, parse_unit
+from .importer import deferred_compute, import_parameters
+from .ordering import parse_expression_references
+
+_leading_number_re = re.compile(r'\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)')
+
+class LatencyModel:
+    """Seconds to wait per call, keyed by call name such as 'UserParameters.add'."""
+    def __init__(self, default=0.0, calls=None):
+        self.default = default
+        self.calls = dict(calls or {})
+
+    def delay(self, name):
+        return self.calls.get(name, self.default)
+
+class FakeFusion:
+    """
+    A fake API session, holds the call counter and latency shared by its objects.
+    With sleep=False the latency is only added up in api_seconds, which lets benchmarks
+    model slow calls without waiting for them.
+    """
+    def __init__(self, latency=None, sleep=True):
+        self.latency = latency or LatencyModel()
+        self.sleep = sleep
+        self.calls = Counter()
+        self.api_seconds = 0.0
+        self.compute_deferred = False
+        self.compute_pending = False
+
+    def call(self, name):
+        self.calls[name] += 1
+        delay = self.latency.delay(name)
+        if delay:
+            self.api_seconds += delay
+            if self.sleep:
+                time.sleep(delay)
+
+    def reset(self):
+        self.calls.clear()
+        self.api_seconds = 0.0
+
+    def changed(self):
+        """A parameter changed, the design recomputes now unless compute is deferred."""
+        if self.compute_deferred:
+            self.compute_pending = True
+        else:
+            self.call('Design.compute')
+
+    def set_compute_deferred(self, deferred):
+        self.compute_deferred = deferred
+        if not deferred and self.compute_pending:
+            self.compute_pending = False
+            self.call('Design.compute')
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def createByString(self, expression):
+        self.call('ValueInput.createByString')
+        return FakeValueInput(expression)
+
+class FakeValueInput:
+    def __init__(self, expression):
+        self.stringValue = expression
+
+class FakeUserParameter:
+    def __init__(self, fusion, collection, name, expression, unit, comment):
+        self._fusion = fusion
+        self._collection = collection
+        self._name = name
+        self._expression = expression
+        self._unit = unit
+        self._comment = comment
+
+    @property
+    def name(self):
+        self._fusion.call('UserParameter.name')
+        return self._name
+
+    @property
+    def value(self):
+        self._fusion.call('UserParameter.value')
+        return self._collection.evaluate(self._name)
+
+    @property
+    def expression(self):
+        self._fusion.call('UserParameter.expression')
+        return self._expression
+
+    @expression.setter
+    def expression(self, expression):
+        self._fusion.call('UserParameter.expression.set')
+        self._collection.check_references(self._name, expression)
+        self._collection.check_expression(expression, self._unit)
+        self._expression = expression
+        self._collection.values.clear()
+        self._fusion.changed()
+
+    @property
+    def unit(self):
+        self._fusion.call('UserParameter.unit')
+        return self._unit
+
+    @property
+    def comment(self):
+        self._fusion.call('UserParameter.comment')
+        return self._comment
+
+    @comment.setter
+    def comment(self, comment):
+        self._fusion.call('UserParameter.comment.set')
+        self._comment = comment
+
+    def deleteMe(self):
+        self._fusion.call('UserParameter.deleteMe')
+        removed = self._collection.remove(self._name)
+        if removed:
+            self._fusion.changed()
+        return removed
+
+class FakeUserParameters:
+    """Ordered collection of FakeUserParameter with the lookup methods of adsk.fusion.UserParameters."""
+    def __init__(self, fusion):
+        self._fusion = fusion
+        self._params = {}
+        self.values = {}  # name -> evaluated value, cleared when an expression changes
+        self.model = {}  # name -> FakeModelParameter of the design, user parameters may reference them
+
+    @property
+    def count(self):
+        self._fusion.call('UserParameters.count')
+        return len(self._params)
+
+    def __len__(self):
+        return len(self._params)
+
+    def __iter__(self):
+        self._fusion.call('UserParameters.iterate')
+        return iter(list(self._params.values()))
+
+    def item(self, index):
+        self._fusion.call('UserParameters.item')
+        return list(self._params.values())[index]
+
+    def itemByName(self, name):
+        self._fusion.call('UserParameters.itemByName')
+        return self._params.get(name)
+
+    def add(self, name, value_input, units, comment):
+        self._fusion.call('UserParameters.add')
+        if name in self._params:
+            raise RuntimeError(f'A parameter named "{name}" already exists')
+        expression = value_input.stringValue
+        self.check_references(name, expression)
+        self.check_expression(expression, units)
+        param = FakeUserParameter(self._fusion, self, name, expression, units, comment)
+        self._params[name] = param
+        self._fusion.changed()
+        return param
+
+    def remove(self, name):
+        # Like Fusion, a parameter that others reference can not be deleted.
+        for other in self._params.values():
+            if other._name != name and name in parse_expression_references(other._expression):
+                return False
+        self.values.pop(name, None)
+        return self._params.pop(name, None) is not None
+
+    def check_references(self, name, expression):
+        for ref in parse_expression_references(expression):
+            if ref == name or (ref not in self._params and ref not in self.model):
+                raise RuntimeError(f'Invalid expression "{expression}": unknown parameter "{ref}"')
+
+    def check_expression(self, expression, units):
+        # Fusion rejects expressions it can not parse or whose units do not match the parameter's.
+        try:
+            evaluate_expression(expression, units, _ValueLookup(self))
+        except ExpressionError as e:
+            if e.kind != UNSUPPORTED:
+                raise RuntimeError(f'Invalid expression "{expression}": {e}')
+
+    def evaluate(self, name):
+        value = self.values.get(name)
+        if value is None:
+            param = self._params[name]
+            try:
+                value = evaluate_expression(param._expression, param._unit, _ValueLookup(self))
+            except (ExpressionError, ArithmeticError, RecursionError):
+                # Expressions the evaluator does not support get their leading number.
+                match = _leading_number_re.match(param._expression or '')
+                value = float(match.group(1)) if match else 0.0
+            self.values[name] = value
+        return value
+
+class _ValueLookup:
+    """(value, dims) of the parameters of a FakeUserParameters, for evaluate_expression."""
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getitem__(self, name):
+        param = self._collection._params.get(name)
+        if param is None:
+            param = self._collection.model[name]
+            value = param._value
+        else:
+            value = self._collection.evaluate(name)
+        try:
+            dims = parse_unit(param._unit or '')[1]
+        except ExpressionError:
+            dims = DIMENSIONLESS
+        return value, dims
+
+class FakeModelParameter:
+    """A model parameter, such as a sketch dimension. Its expression is fixed, only read."""
+    def __init__(self, fusion, name, expression, unit, comment=''):
+        self._fusion = fusion
+        self._name = name
+        self._expression = expression
+        self._unit = unit
+        self._comment = comment
+        try:
+            self._value = evaluate_expression(expression, unit)
+        except (ExpressionError, ArithmeticError):
+            match = _leading_number_re.match(expression or '')
+            self._value = float(match.group(1)) if match else 0.0
+
+    @property
+    def name(self):
+        self._fusion.call('ModelParameter.name')
+        return self._name
+
+    @property
+    def value(self):
+        self._fusion.call('ModelParameter.value')
+        return self._value
+
+    @property
+    def expression(self):
+        self._fusion.call('ModelParameter.expression')
+        return self._expression
+
+    @property
+    def unit(self):
+        self._fusion.call('ModelParameter.unit')
+        return self._unit
+
+    @property
+    def comment(self):
+        self._fusion.call('ModelParameter.comment')
+        return self._comment
+
+class FakeComponent:
+    def __init__(self, name, modelParameters):
+        self.name = name
+        self.modelParameters = modelParameters
+
+class FakeDocument:
+    def __init__(self, creationId):
+        self.creationId = creationId
+
+class FakeDesign:
+    def __init__(self, fusion=None, document_id='fake-document'):
+        self.fusion = fusion or FakeFusion()
+        self.userParameters = FakeUserParameters(self.fusion)
+        self.parentDocument = FakeDocument(document_id)
+        self.allComponents = []
+
+    @property
+    def allParameters(self):
+        """User parameters first, then the model parameters of every component."""
+        self.fusion.call('Design.allParameters')
+        params = list(self.userParameters)
+        for component in self.allComponents:
+            params.extend(component.modelParameters)
+        return params
+
+    def add_component(self, name, records):
+        """Adds a component whose model parameters are records, e.g. [{'name': 'd1', 'expression': '10 mm', 'units': 'mm'}]."""
+        params = [FakeModelParameter(self.fusion, p['name'], p.get('expression', ''), p.get('units', ''), p.get('comment', ''))
+                  for p in records]
+        for param in params:
+            if param._name in self.userParameters._params or param._name in self.userParameters.model:
+                raise ValueError(f'A parameter named "{param._name}" already exists')
+            self.userParameters.model[param._name] = param
+        component = FakeComponent(name, params)
+        self.allComponents.append(component)
+        return component
+
+    @property
+    def isComputeDeferred(self):
+        self.fusion.call('Design.isComputeDeferred')
+        return self.fusion.compute_deferred
+
+    @isComputeDeferred.setter
+    def isComputeDeferred(self, deferred):
+        self.fusion.call('Design.isComputeDeferred.set')
+        self.fusion.set_compute_deferred(deferred)
+
+    @classmethod
+    def from_records(cls, records, fusion=None, components=None):
+        """
+        Creates a design holding records as user parameters and components, a dict of component
+        name to model parameter records. Setting it up is not slowed down or counted.
+        """
+        design = cls(fusion)
+        latency = design.fusion.latency
+        design.fusion.latency = LatencyModel()
+        try:
+            for name, model_records in (components or {}).items():
+                design.add_component(name, model_records)
+            with deferred_compute(design):
+                result = import_parameters(design, records, design.fusion.createByString)
+        finally:
+            design.fusion.latency = latency
+        design.fusion.reset()
+        if result.aborted or result.failed:
+            raise ValueError(result.summary())
+        return design
@@ -0,0 +1,154 @@
+"""
+On-disk parameter file formats.
+
+FORMAT_JSON          Indented JSON array, the original format.
+FORMAT_JSON_COMPACT  JSON array without whitespace.
+FORMAT_GZIP          Compact JSON array, gzip compressed.
+FORMAT_BINARY        Columnar binary: one string table holding every distinct name,
+                     expression, unit and comment once, columns of indexes into it and a
+                     column of float64 values, zlib compressed.
+
+Reading detects the format from the first bytes of the file, so the extension does not matter.
+"""
+
+import gzip
+import math
+import struct
+import sys
+import zlib
+from array import array
+
+from .jsonio import iter_json_records, write_json_records
+
+FORMAT_JSON = 'json'
+FORMAT_JSON_COMPACT = 'json-compact'
+FORMAT_GZIP = 'json.gz'
+FORMAT_BINARY = 'jparams'
+FORMATS = (FORMAT_JSON, FORMAT_JSON_COMPACT, FORMAT_GZIP, FORMAT_BINARY)
+
+EXTENSIONS = {
+    FORMAT_JSON: '.json',
+    FORMAT_JSON_COMPACT: '.json',
+    FORMAT_GZIP: '.json.gz',
+    FORMAT_BINARY: '.jparams'
+}
+
+GZIP_MAGIC = b'\x1f\x8b'
+BINARY_MAGIC = b'JPRM'
+BINARY_VERSION = 1
+BINARY_COLUMNS = ('name', 'expression', 'units', 'comment')
+
+def detect_format(path):
+    with open(path, 'rb') as f:
+        head = f.read(len(BINARY_MAGIC))
+    if head.startswith(GZIP_MAGIC):
+        return FORMAT_GZIP
+    if head == BINARY_MAGIC:
+        return FORMAT_BINARY
+    return FORMAT_JSON
+
+def format_for_path(path):
+    """Picks the format matching a file name's extension."""
+    lower = path.lower()
+    if lower.endswith(EXTENSIONS[FORMAT_GZIP]):
+        return FORMAT_GZIP
+    if lower.endswith(EXTENSIONS[FORMAT_BINARY]):
+        return FORMAT_BINARY
+    return FORMAT_JSON
+
+def read_parameter_file(path):
+    """Yields the records of a parameter file in any of the supported formats."""
+    fmt = detect_format(path)
+    if fmt == FORMAT_BINARY:
+        with open(path, 'rb') as f:
+            yield from decode_binary(f.read())
+    elif fmt == FORMAT_GZIP:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            yield from iter_json_records(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from iter_json_records(f)
+
+def write_parameter_file(path, records, fmt=FORMAT_JSON):
+    """Writes records to path in the given format and returns how many were written."""
+    if fmt == FORMAT_BINARY:
+        records = list(records)
+        with open(path, 'wb') as f:
+            f.write(encode_binary(records))
+        return len(records)
+    if fmt == FORMAT_GZIP:
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            return write_json_records(f, records, compact=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        return write_json_records(f, records, compact=fmt == FORMAT_JSON_COMPACT)
+
+def _pack_array(typecode, items):
+    packed = array(typecode, items)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+def _unpack_array(typecode, data, pos, count):
+    unpacked = array(typecode)
+    end = pos + unpacked.itemsize * count
+    unpacked.frombytes(data[pos:end])
+    if sys.byteorder != 'little':
+        unpacked.byteswap()
+    return unpacked, end
+
+def encode_binary(records):
+    strings = {}
+    columns = {column: [] for column in BINARY_COLUMNS}
+    values = []
+    for p in records:
+        for column in BINARY_COLUMNS:
+            text = p.get(column, '')
+            text = '' if text is None else str(text)
+            columns[column].append(strings.setdefault(text, len(strings)))
+        value = p.get('value')
+        values.append(float(value) if isinstance(value, (int, float)) else math.nan)
+
+    encoded = [text.encode('utf-8') for text in strings]
+    body = [
+        struct.pack('<II', len(values), len(encoded)),
+        _pack_array('I', [len(text) for text in encoded]),
+        b''.join(encoded)
+    ]
+    body.extend(_pack_array('I', columns[column]) for column in BINARY_COLUMNS)
+    body.append(_pack_array('d', values))
+    return BINARY_MAGIC + bytes([BINARY_VERSION]) + zlib.compress(b''.join(body), 9)
+
+def decode_binary(data):
+    if data[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError('Not a binary parameter file')
+    version = data[len(BINARY_MAGIC)]
+    if version != BINARY_VERSION:
+        raise ValueError(f'Unsupported binary parameter file version {version}')
+    body = zlib.decompress(data[len(BINARY_MAGIC) + 1:])
+
+    count, string_count = struct.unpack_from('<II', body, 0)
+    lengths, pos = _unpack_array('I', body, 8, string_count)
+    strings = []
+    for length in lengths:
+        strings.append(body[pos:pos + length].decode('utf-8'))
+        pos += length
+    columns = []
+    for _ in BINARY_COLUMNS:
+        indexes, pos = _unpack_array('I', body, pos, count)
+        columns.append(indexes)
+    values, pos = _unpack_array('d', body, pos, count)
+
+    names, expressions, units, comments = columns
+    for i in range(count):
+        value = values[i]
+        record = {
+            'name': strings[names[i]],
+            'value': None if math.isnan(value) else value,
+            'units': strings[units[i]],
+            'comment': strings[comments[i]]
+        }
+        # A record without an expression is stored with an empty one, it is given by its value.
+        expression = strings[expressions[i]]
+        if expression:
+            record['expression'] = expression
+        yield record
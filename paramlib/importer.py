@@ -0,0 +1,116 @@
+"""Adding parameter records to a design's user parameters."""
+
+from contextlib import contextmanager
+
+from .ordering import order_parameters_for_import, format_import_problems
+from .records import param_expression
+from .tracing import tracer
+
+class ImportResult:
+    """Outcome of import_parameters."""
+    def __init__(self):
+        self.added = []  # Parameter objects created, in the order they were added
+        self.failed = []  # (record, error message) for adds the API rejected
+        self.skipped = []  # Names that already exist in the design
+        self.unresolved = {}
+        self.cycles = []
+        self.rolled_back = False  # An atomic import failed and removed what it had added
+
+    @property
+    def aborted(self):
+        return bool(self.unresolved or self.cycles)
+
+    @property
+    def ok(self):
+        return not (self.aborted or self.failed)
+
+    def summary(self):
+        if self.aborted:
+            return 'Import aborted, no parameters were added.\n\n' + format_import_problems(self.unresolved, self.cycles)
+        if self.rolled_back:
+            message = 'Import rolled back, no parameters were added.'
+        else:
+            message = f'Imported {len(self.added)} parameters.'
+        if self.failed:
+            message += '\n\nFailed:\n' + '\n'.join(
+                f'{p["name"]} = {param_expression(p)}: {error}' for p, error in self.failed)
+        return message
+
+@contextmanager
+def deferred_compute(design):
+    """Defers recomputing the design until the block ends, so a bulk change recomputes once."""
+    previous = design.isComputeDeferred
+    design.isComputeDeferred = True
+    try:
+        yield
+    finally:
+        design.isComputeDeferred = previous
+
+def known_parameters(design, current=()):
+    """
+    name -> (value, units) of every parameter of the design, user and model, for
+    validate_parameters. current are records of parameters already read, e.g. a snapshot of
+    the user parameters, whose value and units are not read from the design again.
+    """
+    known = {p['name']: (p.get('value'), p.get('units', '')) for p in current}
+    for param in design.allParameters:
+        name = param.name
+        if name not in known:
+            known[name] = (param.value, param.unit)
+    return known
+
+def delete_parameters(params):
+    """Deletes parameters newest first, so dependents go before what they reference."""
+    for param in reversed(params):
+        param.deleteMe()
+
+def import_parameters(design, records, create_value, selected_names=None, atomic=False, existing=None, known_names=None):
+    """
+    Adds the records that are not yet in design.userParameters, in dependency order.
+    create_value turns an expression into a value input, e.g. adsk.core.ValueInput.createByString.
+    Nothing is written when a record references a missing parameter or takes part in a cycle.
+    With atomic, the first failed add stops the import and the parameters added before it
+    are deleted again.
+
+    existing, the names of the user parameters, and known_names, the names of every parameter
+    of the design, are read from the design unless the caller has them already, e.g. from a
+    snapshot and known_parameters.
+    """
+    result = ImportResult()
+    userParams = design.userParameters
+    if existing is None:
+        existing = {p.name for p in userParams}
+    if known_names is None:
+        known_names = {p.name for p in design.allParameters}
+
+    to_add = []
+    for p in records:
+        if selected_names is not None and p['name'] not in selected_names:
+            continue
+        if p['name'] in existing:
+            result.skipped.append(p['name'])
+            continue
+        to_add.append(p)
+
+    with tracer.span('order'):
+        ordered, result.unresolved, result.cycles = order_parameters_for_import(to_add, known_names)
+    if result.aborted:
+        return result
+
+    for p in ordered:
+        try:
+            result.added.append(userParams.add(
+                p['name'],
+                create_value(param_expression(p)),
+                p.get('units', ''),
+                p.get('comment', '')
+            ))
+        except Exception as e:
+            # Anything depending on a failed parameter will fail too and be listed with it.
+            result.failed.append((p, str(e)))
+            if atomic:
+                delete_parameters(result.added)
+                result.added = []
+                result.rolled_back = True
+                break
+    return result
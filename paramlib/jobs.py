@@ -0,0 +1,170 @@
+"""
+Imports split into steps, so a large import does not block the thread that owns the design.
+
+prepare() does the pure-Python work, selecting, validating and ordering the records, and can
+run on a worker thread. step() adds the next batch of parameters through the API and must run
+on the thread the design belongs to, in Fusion the main thread reached through a custom event.
+cancel() may be called from any thread, the next step then deletes what was added.
+"""
+
+import threading
+import time
+import traceback
+
+from .expressions import validate_parameters
+from .importer import ImportResult, delete_parameters
+from .ordering import order_parameters_for_import
+from .records import param_expression
+
+PENDING = 'pending'
+PREPARED = 'prepared'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+class ImportJob:
+    def __init__(self, design, records, current_records, selected_names=None, validate=True, known=None):
+        """
+        current_records are the records of the design's user parameters and known maps the
+        name of every parameter, model parameters too, to (value, units), see known_parameters.
+        Both are read beforehand on the main thread. Without known only current_records can
+        be referenced.
+        """
+        self.design = design
+        self.records = records
+        self.current_records = current_records
+        self.known = known
+        self.selected_names = selected_names
+        self.validate = validate
+        self.state = PENDING
+        self.result = ImportResult()
+        self.validation = None
+        self.ordered = []
+        self.done = 0
+        self.cancel_requested = False
+        self.error = None
+        self.started = None  # Time the first step ran, the ETA is based on steps only
+        self.step_seconds = 0.0
+        self.previous_deferred = None  # Compute is deferred from the first step until the job ends
+
+    @property
+    def finished(self):
+        return self.state in (DONE, CANCELLED, FAILED)
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def prepare(self):
+        """Selects, validates and orders the records. Touches no API objects."""
+        existing = {p['name'] for p in self.current_records}
+        to_add = []
+        for p in self.records:
+            if self.selected_names is not None and p['name'] not in self.selected_names:
+                continue
+            if p['name'] in existing:
+                self.result.skipped.append(p['name'])
+                continue
+            to_add.append(p)
+
+        known = self.known
+        if known is None:
+            known = {p['name']: (p.get('value'), p.get('units', '')) for p in self.current_records}
+        if self.validate:
+            self.validation = validate_parameters(to_add, known)
+            if not self.validation.ok:
+                self.state = FAILED
+                return
+        self.ordered, self.result.unresolved, self.result.cycles = order_parameters_for_import(to_add, known)
+        self.state = FAILED if self.result.aborted else PREPARED
+
+    def start(self, on_prepared):
+        """Runs prepare on a worker thread, which calls on_prepared when it is done or failed."""
+        def work():
+            try:
+                self.prepare()
+            except Exception:
+                self.error = traceback.format_exc()
+                self.state = FAILED
+            on_prepared()
+        thread = threading.Thread(target=work, name='paramlib-import', daemon=True)
+        thread.start()
+        return thread
+
+    def step(self, create_value, budget=0.1, max_batch=500):
+        """
+        Adds parameters until budget seconds have passed or max_batch were added.
+        Returns True while there is more to do. A failed add or a cancel deletes every
+        parameter the job added.
+        """
+        if self.finished:
+            return False
+        if self.cancel_requested:
+            self.rollback(CANCELLED)
+            return False
+        if self.state == PREPARED:
+            self.state = RUNNING
+            self.started = time.perf_counter()
+            self.previous_deferred = self.design.isComputeDeferred
+            self.design.isComputeDeferred = True
+
+        userParams = self.design.userParameters
+
+        start = time.perf_counter()
+        end = min(self.done + max_batch, len(self.ordered))
+        while self.done < end:
+            p = self.ordered[self.done]
+            try:
+                self.result.added.append(userParams.add(
+                    p['name'],
+                    create_value(param_expression(p)),
+                    p.get('units', ''),
+                    p.get('comment', '')
+                ))
+            except Exception as e:
+                self.result.failed.append((p, str(e)))
+                self.rollback(FAILED)
+                return False
+            self.done += 1
+            if time.perf_counter() - start >= budget:
+                break
+        self.step_seconds += time.perf_counter() - start
+
+        if self.done >= len(self.ordered):
+            self.end(DONE)
+            return False
+        return True
+
+    def rollback(self, state):
+        delete_parameters(self.result.added)
+        self.result.added = []
+        self.result.rolled_back = True
+        self.end(state)
+
+    def end(self, state):
+        self.state = state
+        # The design recomputes once, now that all parameters are in.
+        if self.previous_deferred is not None:
+            self.design.isComputeDeferred = self.previous_deferred
+            self.previous_deferred = None
+
+    def progress(self):
+        eta = None
+        if self.done and self.state == RUNNING:
+            eta = self.step_seconds / self.done * (len(self.ordered) - self.done)
+        return {
+            'state': self.state,
+            'done': self.done,
+            'total': len(self.ordered),
+            'elapsedSeconds': round(time.perf_counter() - self.started, 3) if self.started else 0.0,
+            'etaSeconds': None if eta is None else round(eta, 1)
+        }
+
+    def summary(self):
+        if self.error:
+            return f'Import failed:\n{self.error}'
+        if self.validation is not None and not self.validation.ok:
+            return 'Import aborted, no parameters were added.\n\n' + self.validation.summary()
+        if self.state == CANCELLED:
+            return 'Import cancelled, no parameters were added.'
+        return self.result.summary()
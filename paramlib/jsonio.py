@@ -0,0 +1,136 @@
+"""Incremental reading and writing of JSON parameter files."""
+
+import json
+
+from .records import record_dict
+
+def _find_parameters(decoder, buf, pos):
+    """
+    pos is at the '{' of a top level object. Returns the position of the value of its
+    "parameters" field, or None when buf ends before it.
+    """
+    pos += 1
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ','):
+            pos += 1
+        if pos >= len(buf):
+            return None
+        if buf[pos] == '}':
+            raise ValueError('JSON parameter file has no "parameters" array')
+        try:
+            key, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            return None
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if pos >= len(buf):
+            return None
+        if buf[pos] != ':':
+            raise ValueError('Invalid JSON parameter file')
+        pos += 1
+        while pos < len(buf) and buf[pos].isspace():
+            pos += 1
+        if key == 'parameters':
+            return pos if pos < len(buf) else None
+        try:
+            _, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            return None
+        # A number touching the end of the buffer may continue in the next chunk.
+        if end >= len(buf):
+            return None
+        pos = end
+
+def iter_json_records(f, chunk_size=65536):
+    """
+    Yields the items of a top level JSON array one at a time, or of the array in the
+    "parameters" field of a top level object as canonical exports write it.
+    Only a chunk of the file is held in memory, so the first records are
+    available before the rest of the file has been read.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def skip(pos):
+        while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ',')):
+            pos += 1
+        return pos
+
+    while True:
+        pos = skip(pos)
+        if pos >= len(buf) and not eof:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        if pos >= len(buf):
+            raise ValueError('Unexpected end of JSON parameter file')
+
+        if not started:
+            if buf[pos] == '{':
+                start = _find_parameters(decoder, buf, pos)
+                if start is None:
+                    if eof:
+                        raise ValueError('JSON parameter file has no "parameters" array')
+                    chunk = f.read(chunk_size)
+                    eof = not chunk
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                    continue
+                pos = start
+            if buf[pos] != '[':
+                raise ValueError('JSON parameter file must contain an array of parameters')
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        # A value touching the end of the buffer may still be cut short, read more first.
+        if end is None or (end >= len(buf) and not eof):
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        pos = end
+        yield item
+
+def write_json_records(f, records, compact=False):
+    """
+    Writes records to f as a JSON array as they are produced.
+    The indented layout matches json.dump(records, f, indent=4), compact drops all whitespace.
+    Returns the number of records written.
+    """
+    count = 0
+    f.write('[')
+    for record in records:
+        record = record_dict(record)
+        if count:
+            f.write(',')
+        if compact:
+            f.write(json.dumps(record, separators=(',', ':')))
+        else:
+            f.write('\n    ' + json.dumps(record, indent=4).replace('\n', '\n    '))
+        count += 1
+    f.write(']' if compact or not count else '\n]')
+    return count
+
+def read_records(path):
+    """Yields the records of a JSON parameter file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from iter_json_records(f)
+
+def write_records(path, records, compact=False):
+    with open(path, 'w', encoding='utf-8') as f:
+        return write_json_records(f, records, compact)
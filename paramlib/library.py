@@ -0,0 +1,291 @@
+"""
+An SQLite index over many parameter files, for searching and importing from all of them.
+
+Folders added as roots are scanned for parameter files, which are parsed in parallel and
+their parameters stored with the file they came from. Indexing is incremental: a file whose
+size and mtime are unchanged is not opened, and one whose content hash is unchanged is not
+re-indexed. Names and comments are searched through an FTS5 trigram index when the SQLite
+build has one, otherwise with LIKE.
+
+Each method opens its own connection and closes it when done, so the library can be used from a worker thread while
+another thread searches it.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .canonical import canonical_records, content_hash, read_content_hash
+from .formats import read_parameter_file
+
+LIBRARY_EXTENSIONS = ('.json', '.json.gz', '.jparams')
+COUNT_LIMIT = 10000  # Searches count matches up to this many, counting all of a broad match is slow
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL,
+    size INTEGER,
+    hash TEXT,
+    count INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS params (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    expression TEXT,
+    units TEXT,
+    comment TEXT
+);
+CREATE INDEX IF NOT EXISTS params_name ON params (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS params_units ON params (units);
+CREATE INDEX IF NOT EXISTS params_file ON params (file_id);
+'''
+
+_text_schema = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS params_text
+USING fts5 (name, comment, content='params', content_rowid='id', tokenize='trigram');
+'''
+
+def read_library_file(path, known_hash=None):
+    """
+    Reads a file for indexing, in a worker thread or process.
+    Returns (path, mtime, size, hash, rows, error), rows is None when the content hash in the
+    file's header still equals known_hash.
+    """
+    st = None
+    try:
+        # Inside the try, a file may be deleted or renamed between listing and reading it.
+        st = os.stat(path)
+        if known_hash and read_content_hash(path, compute=False) == known_hash:
+            return path, st.st_mtime, st.st_size, known_hash, None, None
+        canonical = canonical_records(read_parameter_file(path))
+        rows = [(p['name'], p['value'], p.get('expression'), p['units'], p['comment']) for p in canonical]
+        return path, st.st_mtime, st.st_size, content_hash(canonical), rows, None
+    except (ValueError, OSError, KeyError, TypeError, UnicodeDecodeError) as e:
+        if st is None:
+            return path, None, None, None, [], str(e)
+        return path, st.st_mtime, st.st_size, None, [], str(e)
+
+def find_parameter_files(root):
+    for folder, _, names in os.walk(root):
+        for name in names:
+            if name.lower().endswith(LIBRARY_EXTENSIONS):
+                yield os.path.join(folder, name)
+
+class IngestStats:
+    def __init__(self):
+        self.scanned = 0
+        self.indexed = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.failed = []  # (path, error)
+        self.params = 0
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {
+            'scanned': self.scanned,
+            'indexed': self.indexed,
+            'unchanged': self.unchanged,
+            'removed': self.removed,
+            'failed': [{'path': path, 'error': error} for path, error in self.failed],
+            'params': self.params,
+            'seconds': round(self.seconds, 3)
+        }
+
+class ParameterLibrary:
+    def __init__(self, path):
+        self.path = path
+        self.text_search = False
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.transaction() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(_schema)
+            try:
+                db.executescript(_text_schema)
+                self.text_search = True
+            except sqlite3.OperationalError:
+                pass
+
+    def connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute('PRAGMA foreign_keys=ON')
+        return db
+
+    @contextmanager
+    def transaction(self):
+        """A connection that commits when the block ends, or rolls back on an error, and is then closed."""
+        db = self.connect()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add_root(self, path):
+        with self.transaction() as db:
+            db.execute('INSERT OR IGNORE INTO roots (path) VALUES (?)', (os.path.abspath(path),))
+
+    def remove_root(self, path):
+        path = os.path.abspath(path)
+        with self.transaction() as db:
+            db.execute('DELETE FROM roots WHERE path = ?', (path,))
+            for file_id, file_path in db.execute('SELECT id, path FROM files').fetchall():
+                if os.path.commonpath([path, file_path]) == path:
+                    self._delete_file(db, file_id)
+
+    def roots(self):
+        with self.transaction() as db:
+            return [row[0] for row in db.execute('SELECT path FROM roots ORDER BY path')]
+
+    def ingest(self, paths=None, workers=4, processes=False, progress=None):
+        """
+        Indexes new and changed files. Without paths every root is scanned and files that
+        are gone are dropped. processes parses in worker processes, which only works where
+        the interpreter can be started again, not inside Fusion. progress(done, total) is
+        called as files are indexed.
+        """
+        start = time.perf_counter()
+        stats = IngestStats()
+        db = self.connect()
+        try:
+            known = {path: (file_id, mtime, size, digest)
+                     for file_id, path, mtime, size, digest in db.execute('SELECT id, path, mtime, size, hash FROM files')}
+            if paths is None:
+                paths = [path for root in self.roots() for path in find_parameter_files(root)]
+                present = set(paths)
+                for path, (file_id, _, _, _) in known.items():
+                    if path not in present:
+                        self._delete_file(db, file_id)
+                        stats.removed += 1
+            paths = [os.path.abspath(path) for path in paths]
+            stats.scanned = len(paths)
+
+            changed = []
+            for path in paths:
+                entry = known.get(path)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if entry and entry[1] == st.st_mtime and entry[2] == st.st_size:
+                    stats.unchanged += 1
+                else:
+                    changed.append(path)
+
+            executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with executor_class(max_workers=max(1, workers)) as executor:
+                known_hashes = [known[path][3] if path in known else None for path in changed]
+                results = executor.map(read_library_file, changed, known_hashes, chunksize=16 if processes else 1)
+                for done, (path, mtime, size, digest, rows, error) in enumerate(results, 1):
+                    self._store_file(db, known.get(path), path, mtime, size, digest, rows, error, stats)
+                    if done % 100 == 0:
+                        db.commit()
+                    if progress:
+                        progress(done, len(changed))
+            db.commit()
+        finally:
+            db.close()
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def _store_file(self, db, entry, path, mtime, size, digest, rows, error, stats):
+        if error:
+            stats.failed.append((path, error))
+        if entry and (rows is None or (digest and digest == entry[3])):
+            # Touched but not changed, only the stat is updated.
+            db.execute('UPDATE files SET mtime = ?, size = ? WHERE id = ?', (mtime, size, entry[0]))
+            stats.unchanged += 1
+            return
+        if entry:
+            self._delete_file(db, entry[0])
+        cursor = db.execute('INSERT INTO files (path, mtime, size, hash, count, error) VALUES (?, ?, ?, ?, ?, ?)',
+                            (path, mtime, size, digest, len(rows), error))
+        file_id = cursor.lastrowid
+        db.executemany('INSERT INTO params (file_id, name, value, expression, units, comment) VALUES (?, ?, ?, ?, ?, ?)',
+                       [(file_id,) + row for row in rows])
+        if self.text_search:
+            db.execute('INSERT INTO params_text (rowid, name, comment) SELECT id, name, comment FROM params WHERE file_id = ?',
+                       (file_id,))
+        stats.indexed += 1
+        stats.params += len(rows)
+
+    def _delete_file(self, db, file_id):
+        if self.text_search:
+            db.execute("INSERT INTO params_text (params_text, rowid, name, comment) "
+                       "SELECT 'delete', id, name, comment FROM params WHERE file_id = ?", (file_id,))
+        db.execute('DELETE FROM params WHERE file_id = ?', (file_id,))
+        db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def search(self, text='', units=None, path=None, limit=100, offset=0):
+        """
+        Finds parameters whose name or comment contains text, optionally only those in units
+        or from files whose path contains path. Returns {'total', 'more', 'rows'}, rows sorted by
+        name, more is set when there are over COUNT_LIMIT matches and total stopped counting.
+        """
+        source = 'params p JOIN files f ON f.id = p.file_id'
+        where = []
+        args = []
+        if text:
+            if self.text_search and len(text) >= 3:
+                # The trigram index needs three characters, shorter text is matched with LIKE.
+                # CROSS JOIN keeps the text index as the outer loop, SQLite may otherwise probe it once per row.
+                source = 'params_text t CROSS JOIN params p ON p.id = t.rowid CROSS JOIN files f ON f.id = p.file_id'
+                where.append('params_text MATCH ?')
+                args.append('"' + text.replace('"', '""') + '"')
+            else:
+                pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                where.append("(p.name LIKE ? ESCAPE '\\' OR p.comment LIKE ? ESCAPE '\\')")
+                args.extend([pattern, pattern])
+        if units is not None:
+            where.append('p.units = ?')
+            args.append(units)
+        if path:
+            where.append("f.path LIKE ? ESCAPE '\\'")
+            args.append('%' + path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        clause = ('WHERE ' + ' AND '.join(where)) if where else ''
+
+        with self.transaction() as db:
+            total = db.execute(f'SELECT COUNT(*) FROM (SELECT 1 FROM {source} {clause} LIMIT ?)',
+                               args + [COUNT_LIMIT + 1]).fetchone()[0]
+            rows = db.execute(
+                f'SELECT p.id, p.name, p.value, p.expression, p.units, p.comment, f.path '
+                f'FROM {source} {clause} '
+                f'ORDER BY p.name COLLATE NOCASE, p.id LIMIT ? OFFSET ?',
+                args + [max(1, int(limit)), max(0, int(offset))]
+            ).fetchall()
+        return {
+            'total': min(total, COUNT_LIMIT),
+            'more': total > COUNT_LIMIT,
+            'rows': [{'id': row[0], 'name': row[1], 'value': row[2], 'expression': row[3],
+                      'units': row[4], 'comment': row[5], 'file': row[6]} for row in rows]
+        }
+
+    def records(self, ids):
+        """The parameter records with the given ids, in the order of ids."""
+        ids = list(ids)
+        found = {}
+        with self.transaction() as db:
+            # SQLite limits the number of parameters in one statement.
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                for row in db.execute(f'SELECT id, name, value, expression, units, comment FROM params WHERE id IN ({marks})', chunk):
+                    record = {'name': row[1], 'value': row[2], 'units': row[4] or '', 'comment': row[5] or ''}
+                    if row[3] is not None:
+                        record['expression'] = row[3]
+                    found[row[0]] = record
+        return [found[i] for i in ids if i in found]
+
+    def stats(self):
+        with self.transaction() as db:
+            files, failed = db.execute('SELECT COUNT(*), COUNT(error) FROM files').fetchone()
+            params = db.execute('SELECT COUNT(*) FROM params').fetchone()[0]
+        return {'roots': self.roots(), 'files': files, 'failedFiles': failed, 'params': params, 'textSearch': self.text_search}
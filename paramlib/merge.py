@@ -0,0 +1,146 @@
+"""
+Merging the parameters of several files into one set, imported in a single pass.
+
+A name defined differently by more than one file is a conflict, settled by the policy:
+FIRST keeps the definition from the earliest file, LAST the one from the latest and PROMPT
+keeps the first for now and leaves the conflict open until it is resolved by choosing a file.
+Definitions that agree, in expression, units and comment, are not conflicts. A name defined
+more than once within one file is not a conflict either, the file's first definition is used
+and the others are reported as duplicates with their positions in the file.
+"""
+
+from .records import param_definition, param_expression
+from .table import ParamRecord, ParamTable
+
+FIRST = 'first'
+LAST = 'last'
+PROMPT = 'prompt'
+POLICIES = (FIRST, LAST, PROMPT)
+
+class MergeError(ValueError):
+    pass
+
+def _check_policy(policy):
+    if policy not in POLICIES:
+        raise MergeError(f'Unknown merge policy "{policy}", expected one of {", ".join(POLICIES)}')
+
+class MergeConflict:
+    def __init__(self, name, candidates):
+        self.name = name
+        self.candidates = candidates  # (source index, record), in source order
+        self.chosen = None  # Source index, once resolved
+
+    def to_dict(self, sources):
+        return {
+            'name': self.name,
+            'chosen': self.chosen,
+            'candidates': [{
+                'source': i,
+                'file': sources[i],
+                'expression': param_expression(p),
+                'units': p.get('units', ''),
+                'comment': p.get('comment', '')
+            } for i, p in self.candidates]
+        }
+
+class MergeResult:
+    def __init__(self, sources, policy):
+        self.sources = sources  # Labels of the merged files, usually their paths
+        self.policy = policy
+        self.table = ParamTable()
+        self.conflicts = []
+        self.duplicates = []  # (source index, name, [record indexes]), names defined more than once in one source
+        self.counts = [0] * len(sources)  # Records read from each source
+
+    @property
+    def unresolved(self):
+        return [c for c in self.conflicts if c.chosen is None]
+
+    def apply_policy(self, policy):
+        """Settles every conflict again by another policy, PROMPT reopens them all."""
+        _check_policy(policy)
+        self.policy = policy
+        for conflict in self.conflicts:
+            source, record = conflict.candidates[-1 if policy == LAST else 0]
+            conflict.chosen = None if policy == PROMPT else source
+            self.table.replace(record)
+
+    def resolve(self, choices):
+        """Settles open conflicts, choices maps a name to the index of the source to keep."""
+        by_name = {c.name: c for c in self.conflicts}
+        for name, source in choices.items():
+            conflict = by_name.get(name)
+            if conflict is None:
+                raise MergeError(f'"{name}" is not a merge conflict')
+            record = next((p for i, p in conflict.candidates if i == source), None)
+            if record is None:
+                label = self.sources[source] if isinstance(source, int) and 0 <= source < len(self.sources) else f'File {source!r}'
+                raise MergeError(f'{label} does not define "{name}"')
+            conflict.chosen = source
+            self.table.replace(record)
+
+    def summary(self):
+        lines = [f'Merged {len(self.table)} parameters from {len(self.sources)} files.']
+        if self.conflicts:
+            lines.append(f'{len(self.conflicts)} names were defined differently, {len(self.unresolved)} not resolved:')
+            lines.extend(f'    {c.name}' for c in self.conflicts[:20])
+            if len(self.conflicts) > 20:
+                lines.append(f'    and {len(self.conflicts) - 20} more')
+        if self.duplicates:
+            lines.append(f'{len(self.duplicates)} names were defined more than once in the same file, the first definition is used:')
+            lines.extend(f'    {name} in {self.sources[i]}, records {", ".join(str(n + 1) for n in indexes)}'
+                         for i, name, indexes in self.duplicates[:20])
+            if len(self.duplicates) > 20:
+                lines.append(f'    and {len(self.duplicates) - 20} more')
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {
+            'files': self.sources,
+            'counts': self.counts,
+            'policy': self.policy,
+            'total': len(self.table),
+            'conflicts': [c.to_dict(self.sources) for c in self.conflicts],
+            'unresolved': len(self.unresolved),
+            'duplicates': [{'source': i, 'file': self.sources[i], 'name': name, 'records': indexes}
+                           for i, name, indexes in self.duplicates]
+        }
+
+def merge_records(sources, policy=FIRST):
+    """
+    Merges [(label, records), ...] in one pass over every record. Returns a MergeResult
+    whose table holds the merged records in the order their names first appeared.
+    """
+    _check_policy(policy)
+    result = MergeResult([label for label, _ in sources], policy)
+    table = result.table
+    origin = {}  # name -> index of the source that defined it first
+    seen = {}  # name -> [(source index, record)], for names defined by more than one source
+    for i, (_, records) in enumerate(sources):
+        positions = {}  # name -> indexes of its records in this source
+        for n, p in enumerate(records):
+            record = p if isinstance(p, ParamRecord) else ParamRecord.from_dict(p)
+            result.counts[i] += 1
+            indexes = positions.get(record.name)
+            if indexes is not None:
+                indexes.append(n)
+                continue
+            positions[record.name] = [n]
+            first = origin.get(record.name)
+            if first is None:
+                origin[record.name] = i
+                table.append(record)
+                continue
+            candidates = seen.get(record.name)
+            if candidates is None:
+                candidates = seen[record.name] = [(first, table.get(record.name))]
+            candidates.append((i, record))
+        result.duplicates.extend((i, name, indexes) for name, indexes in positions.items() if len(indexes) > 1)
+
+    for name, candidates in seen.items():
+        definitions = {param_definition(p) for _, p in candidates}
+        if len(definitions) == 1:
+            continue
+        result.conflicts.append(MergeConflict(name, candidates))
+    result.apply_policy(policy)
+    return result
@@ -0,0 +1,192 @@
+"""
+Decoding, validation and dispatch of the messages the palettes send from HTML.
+
+A message is a JSON object with an 'action' and the fields listed for it in MESSAGE_SCHEMA.
+An optional 'v' gives the schema version the page was written against. A 'batch' message
+carries a list of messages in 'messages' that are handled in order, so the page can send
+many operations in one round-trip.
+"""
+
+import json
+
+MESSAGE_VERSION = 1
+
+ANY = object()
+
+# Parameters are chosen by a list of names, by selection rules (see paramlib.selection) or by
+# the name of a saved selection.
+SELECTION_FIELDS = {
+    'selected': ((list,), False),
+    'rules': ((dict,), False),
+    'selectionSet': ((str,), False),
+}
+
+# action -> field -> (accepted types, required)
+MESSAGE_SCHEMA = {
+    'htmlReady': {
+        'paging': ((bool,), False),
+    },
+    'getPage': {
+        'offset': ((int,), False),
+        'limit': ((int,), False),
+        'sort': ((str, type(None)), False),
+        'descending': ((bool,), False),
+        'filter': ((str,), False),
+        'requestId': (ANY, False),
+    },
+    'import': {
+        **SELECTION_FIELDS,
+        'transaction': ((bool,), False),
+        'validate': ((bool,), False),
+        'background': ((bool,), False),
+    },
+    'cancelImport': {},
+    'validate': {
+        **SELECTION_FIELDS,
+    },
+    'previewUpdate': {
+        **SELECTION_FIELDS,
+    },
+    'update': {
+        **SELECTION_FIELDS,
+        'transaction': ((bool,), False),
+        'validate': ((bool,), False),
+    },
+    'export': {
+        **SELECTION_FIELDS,
+        'compact': ((bool,), False),
+        'canonical': ((bool,), False),
+    },
+    # Files picked together in the import dialog are merged, see paramlib.merge.
+    'mergeResolve': {
+        'policy': ((str,), False),
+        'choices': ((dict,), False),
+    },
+    # Parameters the export palette shows, see paramlib.scope.
+    'setExportScope': {
+        'scope': ((str,), True),
+        'components': ((list,), False),
+        'fields': ((list,), False),
+    },
+    'listComponents': {},
+    'previewSelection': {
+        **SELECTION_FIELDS,
+        'limit': ((int,), False),
+    },
+    'listSelections': {},
+    'saveSelection': {
+        'name': ((str,), True),
+        'rules': ((dict,), True),
+    },
+    'deleteSelection': {
+        'name': ((str,), True),
+    },
+    # The parameter library, see paramlib.library.
+    'librarySearch': {
+        'query': ((str,), False),
+        'units': ((str, type(None)), False),
+        'file': ((str,), False),
+        'offset': ((int,), False),
+        'limit': ((int,), False),
+        'requestId': (ANY, False),
+    },
+    'libraryImport': {
+        'ids': ((list,), True),
+    },
+    'libraryAddFolder': {},
+    'libraryReindex': {},
+    'libraryStatus': {},
+    # Checkpoints of the design's parameters, see paramlib.checkpoints.
+    'listCheckpoints': {},
+    'createCheckpoint': {
+        'label': ((str,), False),
+    },
+    'restoreCheckpoint': {
+        'id': ((int,), True),
+        'transaction': ((bool,), False),
+    },
+    'setTracing': {
+        'enabled': ((bool,), True),
+    },
+    'batch': {
+        'messages': ((list,), True),
+    },
+}
+
+class MessageError(ValueError):
+    pass
+
+def decode_message(data):
+    """
+    Decodes a palette payload. Some pages send the message JSON encoded twice, as a JSON
+    string holding the JSON object, in that case the string is decoded once more.
+    Returns None for payloads that are not messages.
+    """
+    try:
+        msg = json.loads(data)
+        if isinstance(msg, str):
+            msg = json.loads(msg)
+    except json.JSONDecodeError as e:
+        raise MessageError(f'Message is not valid JSON: {e}')
+    if not isinstance(msg, dict) or 'action' not in msg:
+        return None
+    return msg
+
+def validate_message(msg, schema=MESSAGE_SCHEMA):
+    if not isinstance(msg, dict):
+        raise MessageError(f'Message must be an object, got {type(msg).__name__}')
+    action = msg.get('action')
+    if action not in schema:
+        raise MessageError(f'Unknown action "{action}"')
+    version = msg.get('v', MESSAGE_VERSION)
+    if not isinstance(version, int) or version > MESSAGE_VERSION:
+        raise MessageError(f'Unsupported message version {version!r} for "{action}"')
+
+    for field, (types, required) in schema[action].items():
+        if field not in msg:
+            if required:
+                raise MessageError(f'"{action}" message is missing "{field}"')
+            continue
+        # bool is an int, do not let True through as an offset.
+        value = msg[field]
+        if types is not ANY and (not isinstance(value, types) or (isinstance(value, bool) and bool not in types)):
+            expected = ' or '.join('null' if t is type(None) else t.__name__ for t in types)
+            raise MessageError(f'"{action}" field "{field}" must be {expected}')
+    return msg
+
+class MessageRouter:
+    """Dispatches palette messages to the handler registered for their action."""
+    def __init__(self, name, schema=MESSAGE_SCHEMA):
+        self.name = name
+        self.schema = schema
+        self.handlers = {}
+
+    def register(self, action, handler):
+        if action not in self.schema:
+            raise MessageError(f'Unknown action "{action}"')
+        self.handlers[action] = handler
+
+    def dispatch(self, data):
+        """Decodes data once and handles the message, or each message of a batch."""
+        msg = decode_message(data)
+        if msg is None:
+            return
+        validate_message(msg, self.schema)
+        if msg['action'] != 'batch':
+            self.handle(msg)
+            return
+
+        # Validate the whole batch first so a bad entry does not leave it half done.
+        messages = msg['messages']
+        for item in messages:
+            validate_message(item, self.schema)
+            if item['action'] == 'batch':
+                raise MessageError('Batches can not be nested')
+        for item in messages:
+            self.handle(item)
+
+    def handle(self, msg):
+        handler = self.handlers.get(msg['action'])
+        if handler is None:
+            raise MessageError(f'The {self.name} palette does not handle "{msg["action"]}"')
+        handler(msg)
@@ -0,0 +1,111 @@
+"""Expression references and dependency ordering of parameter records."""
+
+import re
+from collections import deque
+
+from .records import param_expression
+
+# Identifiers that can appear in a Fusion expression without referring to a parameter.
+EXPRESSION_UNITS = {
+    'mm', 'cm', 'm', 'km', 'um', 'nm', 'micron', 'in', 'ft', 'yd', 'mi', 'mil', 'thou',
+    'deg', 'rad', 'grad', 'g', 'kg', 'lb', 'lbmass', 'oz', 'ozm', 'slug',
+    's', 'sec', 'ms', 'min', 'hr', 'N', 'lbf', 'Pa', 'kPa', 'MPa', 'psi',
+}
+EXPRESSION_FUNCTIONS = {
+    'abs', 'acos', 'acosh', 'asin', 'asinh', 'atan', 'atanh', 'ceil', 'cos', 'cosh',
+    'exp', 'floor', 'ln', 'log', 'max', 'min', 'pow', 'random', 'round', 'sign',
+    'sin', 'sinh', 'sqrt', 'tan', 'tanh',
+}
+EXPRESSION_CONSTANTS = {'PI', 'E'}
+
+# Numbers and quoted text are matched first so '1e3' or 'in' inside a string is not taken as a name.
+_expression_token_re = re.compile(
+    r"'[^']*'|\"[^\"]*\"|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|([A-Za-z_][A-Za-z0-9_]*)"
+)
+
+def parse_expression_references(expression):
+    """Returns the parameter names referenced by an expression, in order of first use."""
+    refs = []
+    for match in _expression_token_re.finditer(expression or ''):
+        ident = match.group(1)
+        if not ident or ident in refs:
+            continue
+        if ident in EXPRESSION_UNITS or ident in EXPRESSION_FUNCTIONS or ident in EXPRESSION_CONSTANTS:
+            continue
+        refs.append(ident)
+    return refs
+
+def order_parameters_for_import(params, known_names, references=None):
+    """
+    Orders parameters so every parameter is added after the parameters it references.
+    known_names are the names already present in the design. references returns the names a
+    record references, by default they are scanned from its expression.
+    Returns (ordered, unresolved, cycles) where unresolved maps a parameter name to the
+    names it references that can not be found and cycles is a list of name loops.
+    """
+    by_name = {}
+    for p in params:
+        by_name.setdefault(p['name'], p)
+
+    deps = {}
+    unresolved = {}
+    for name, p in by_name.items():
+        internal = set()
+        refs = references(p) if references else parse_expression_references(param_expression(p))
+        for ref in refs:
+            if ref in by_name:
+                internal.add(ref)
+            elif ref not in known_names:
+                unresolved.setdefault(name, []).append(ref)
+        deps[name] = internal
+
+    dependents = {name: [] for name in by_name}
+    pending = {}
+    for name, refs in deps.items():
+        pending[name] = len(refs)
+        for ref in refs:
+            dependents[ref].append(name)
+
+    # Kahn's algorithm, seeded in file order so independent parameters keep their order.
+    ready = deque(name for name in by_name if pending[name] == 0)
+    ordered = []
+    while ready:
+        name = ready.popleft()
+        ordered.append(by_name[name])
+        for dependent in dependents[name]:
+            pending[dependent] -= 1
+            if pending[dependent] == 0:
+                ready.append(dependent)
+
+    cycles = []
+    stuck = {name for name, count in pending.items() if count > 0}
+    seen = set()
+    for start in by_name:
+        if start not in stuck or start in seen:
+            continue
+        # Walk stuck dependencies until a name repeats, that closes a loop.
+        path = []
+        index = {}
+        name = start
+        while name not in index and name not in seen:
+            index[name] = len(path)
+            path.append(name)
+            name = next(ref for ref in deps[name] if ref in stuck)
+        seen.update(path)
+        if name in index:
+            loop = path[index[name]:]
+            cycles.append(loop + [loop[0]])
+
+    return ordered, unresolved, cycles
+
+def format_import_problems(unresolved, cycles):
+    lines = []
+    if unresolved:
+        lines.append('Unresolved references:')
+        for name, refs in unresolved.items():
+            lines.append(f'    {name} -> {", ".join(refs)}')
+    if cycles:
+        lines.append('Dependency cycles:')
+        for loop in cycles:
+            lines.append('    ' + ' -> '.join(loop))
+    return '\n'.join(lines)
@@ -0,0 +1,74 @@
+"""Sorted, filtered and paged views over parameter records."""
+
+from .records import record_dict
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+PAGE_SORT_KEYS = {
+    'name': lambda p: p.get('name', ''),
+    'value': lambda p: p.get('value') if isinstance(p.get('value'), (int, float)) else float('-inf'),
+    'expression': lambda p: str(p.get('expression', '')),
+    'units': lambda p: p.get('units', ''),
+    'comment': lambda p: p.get('comment', ''),
+}
+
+class ParameterPager:
+    """
+    Serves fixed size pages of the parameter records to a palette.
+    The sorted and filtered view is kept as a list of indexes and only rebuilt when the
+    sort, the filter or the number of records changes, so paging through it is cheap.
+    """
+    def __init__(self):
+        self.records = []
+        self.view = []
+        self.view_key = None
+
+    def reset(self, records):
+        self.records = records
+        self.view = []
+        self.view_key = None
+
+    def page(self, offset=0, limit=None, sort=None, descending=False, filter_text=''):
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        offset = max(0, int(offset or 0))
+        filter_text = (filter_text or '').lower()
+        key = (sort, bool(descending), filter_text, len(self.records))
+        if key != self.view_key:
+            self.view = self.build_view(sort, descending, filter_text)
+            self.view_key = key
+
+        shown = [self.records[i] for i in self.view[offset:offset + limit]]
+        if hasattr(self.records, 'projected'):
+            # Records that read fields lazily, such as paramlib.scope.ScopedParameters.
+            rows = self.records.projected(shown)
+        else:
+            rows = [record_dict(p) for p in shown]
+        return {
+            'offset': offset,
+            'total': len(self.view),
+            'count': len(self.records),
+            'sort': sort,
+            'descending': bool(descending),
+            'filter': filter_text,
+            'rows': rows
+        }
+
+    def build_view(self, sort, descending, filter_text):
+        indexes = range(len(self.records))
+        needed = (['comment'] if filter_text else []) + ([sort] if sort in PAGE_SORT_KEYS else [])
+        if needed and hasattr(self.records, 'fetch'):
+            # Filtering and sorting look at every record, read what they need first.
+            self.records.fetch(indexes, needed)
+        if filter_text:
+            indexes = [i for i in indexes if self.matches(self.records[i], filter_text)]
+        if sort in PAGE_SORT_KEYS:
+            sort_key = PAGE_SORT_KEYS[sort]
+            return sorted(indexes, key=lambda i: sort_key(self.records[i]), reverse=bool(descending))
+        return list(indexes)
+
+    @staticmethod
+    def matches(p, filter_text):
+        return (filter_text in p.get('name', '').lower()
+                or filter_text in str(p.get('expression', '')).lower()
+                or filter_text in p.get('comment', '').lower())
@@ -0,0 +1,24 @@
+"""Conversion between Fusion parameter objects and the JSON parameter records."""
+
+RECORD_FIELDS = ('name', 'value', 'expression', 'units', 'comment')
+
+def param_to_record(param):
+    """Reads a parameter, or any object with the same properties, into a record dict."""
+    return {
+        'name': param.name,
+        'value': param.value,
+        'expression': param.expression,
+        'units': param.unit,
+        'comment': param.comment
+    }
+
+def record_dict(p):
+    """A record as a plain dict for JSON, records may also be paramlib.table.ParamRecord."""
+    return p if isinstance(p, dict) else p.to_dict()
+
+def param_expression(p):
+    return p.get('expression', str(p.get('value', 1)))
+
+def param_definition(p):
+    """What a record defines, records that agree on it describe the same parameter."""
+    return param_expression(p), p.get('units', ''), p.get('comment', '')
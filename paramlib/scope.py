@@ -0,0 +1,115 @@
+"""
+Reading the parameters of part of a design, and only the properties that are needed.
+
+Each property read through the API is a call, so for a large assembly reading all five of
+every parameter is most of the cost of an export. A scope names the parameters to read:
+
+    user          the design's user parameters
+    model         the model parameters of every component
+    components    the model parameters of the named components
+    all           user and model parameters
+
+and fields names the properties to export besides the name. Of those, EAGER_FIELDS are read
+up front and LAZY_FIELDS only for the rows that are shown, sorted or filtered by, or exported.
+"""
+
+from .records import RECORD_FIELDS
+from .table import ParamRecord, ParamTable
+
+SCOPE_USER = 'user'
+SCOPE_MODEL = 'model'
+SCOPE_COMPONENTS = 'components'
+SCOPE_ALL = 'all'
+SCOPES = (SCOPE_USER, SCOPE_MODEL, SCOPE_COMPONENTS, SCOPE_ALL)
+
+EXPORT_FIELDS = RECORD_FIELDS[1:]  # Every field but the name, which is always read
+EAGER_FIELDS = ('expression', 'units')
+LAZY_FIELDS = ('value', 'comment')
+
+# Record field -> API property
+_properties = {'value': 'value', 'expression': 'expression', 'units': 'unit', 'comment': 'comment'}
+
+class ScopeError(ValueError):
+    pass
+
+def check_fields(fields):
+    if fields is None:
+        return EXPORT_FIELDS
+    unknown = [field for field in fields if field not in EXPORT_FIELDS]
+    if unknown:
+        raise ScopeError(f'Unknown field "{unknown[0]}", expected some of {", ".join(EXPORT_FIELDS)}')
+    return tuple(field for field in EXPORT_FIELDS if field in fields)
+
+def scope_parameters(design, scope, components=None):
+    """The API parameter objects of a scope, components is a list of component names."""
+    if scope == SCOPE_USER:
+        return list(design.userParameters)
+    if scope == SCOPE_ALL:
+        return list(design.allParameters)
+    if scope not in SCOPES:
+        raise ScopeError(f'Unknown scope "{scope}", expected one of {", ".join(SCOPES)}')
+    if scope == SCOPE_COMPONENTS and not components:
+        raise ScopeError('The components scope needs the names of the components')
+    wanted = set(components or ())
+    params = []
+    for component in design.allComponents:
+        if scope == SCOPE_MODEL or component.name in wanted:
+            params.extend(component.modelParameters)
+            wanted.discard(component.name)
+    if scope == SCOPE_COMPONENTS and wanted:
+        raise ScopeError(f'No component named "{sorted(wanted)[0]}"')
+    return params
+
+def project_record(p, fields):
+    """A record dict with the name and only the given fields."""
+    record = {'name': p['name']}
+    for field in fields:
+        value = p.get(field)
+        if value is not None:
+            record[field] = value
+    return record
+
+class ScopedParameters(ParamTable):
+    """
+    A ParamTable over API parameter objects that reads the lazy fields of a row the first
+    time fetch is asked for them. Fields that are not projected stay unread.
+    """
+    def __init__(self, params, fields=None):
+        super().__init__()
+        self.fields = check_fields(fields)
+        self.params = params
+        self.loaded = {field: bytearray(len(params)) for field in LAZY_FIELDS if field in self.fields}
+        expression = 'expression' in self.fields
+        units = 'units' in self.fields
+        for param in params:
+            self.append(ParamRecord(
+                param.name,
+                expression=param.expression if expression else None,
+                units=param.unit if units else ''
+            ))
+
+    def fetch(self, indexes, fields=None):
+        """Reads the lazy fields of the rows at indexes that have not been read yet."""
+        for field in (fields or self.loaded):
+            flags = self.loaded.get(field)
+            if flags is None:
+                continue
+            prop = _properties[field]
+            for i in indexes:
+                if flags[i]:
+                    continue
+                try:
+                    setattr(self.rows[i], field, getattr(self.params[i], prop))
+                except RuntimeError:
+                    pass  # Deleted since it was listed, the field stays empty
+                flags[i] = 1
+                self.version += 1
+
+    def projected(self, records):
+        """Record dicts of records from this table, with their lazy fields read."""
+        index = self.index
+        self.fetch([index[p.name] for p in records])
+        return [project_record(p, self.fields) for p in records]
+
+    def to_dicts(self, rows=None):
+        return self.projected(self.rows if rows is None else rows)
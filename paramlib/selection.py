@@ -0,0 +1,185 @@
+"""
+Selecting parameters by rules instead of by lists of names.
+
+Rules are {"include": [rule, ...], "exclude": [rule, ...]}. A parameter is selected when it
+matches any include rule, or there are none, and no exclude rule. Each rule is an object
+with one of these keys:
+
+    {"all": true}                     every parameter
+    {"names": ["a", "b"]}             the listed names
+    {"glob": "wheel_*"}               names matching a shell pattern
+    {"regex": "^(front|rear)_"}       names the regular expression is found in
+    {"tag": "chassis"}                comments containing #chassis
+    {"units": "mm"}                   parameters in these units
+    {"dependsOn": "width"}            parameters whose expression uses width, directly or
+                                      through others, {"direct": true} stops at the first level
+
+glob and regex take "ignoreCase": true. Rules can be saved under a name in a SelectionStore
+and used again later.
+"""
+
+import fnmatch
+import json
+import os
+import re
+
+from .ordering import parse_expression_references
+from .records import param_expression
+
+RULE_KEYS = ('all', 'names', 'glob', 'regex', 'tag', 'units', 'dependsOn')
+
+_tag_re = re.compile(r'#([\w-]+)')
+
+class SelectionError(ValueError):
+    pass
+
+def validate_rules(rules):
+    if not isinstance(rules, dict):
+        raise SelectionError('Selection rules must be an object')
+    unknown = set(rules) - {'include', 'exclude'}
+    if unknown:
+        raise SelectionError(f'Unknown selection field "{sorted(unknown)[0]}"')
+    for part in ('include', 'exclude'):
+        part_rules = rules.get(part, [])
+        if not isinstance(part_rules, list):
+            raise SelectionError(f'"{part}" must be a list of rules')
+        for rule in part_rules:
+            keys = [key for key in RULE_KEYS if isinstance(rule, dict) and key in rule]
+            if len(keys) != 1:
+                raise SelectionError(f'A rule needs exactly one of {", ".join(RULE_KEYS)}: {json.dumps(rule)}')
+            if keys[0] == 'regex':
+                try:
+                    re.compile(rule['regex'])
+                except re.error as e:
+                    raise SelectionError(f'Invalid regex "{rule["regex"]}": {e}')
+    return rules
+
+class SelectionIndex:
+    """
+    Lookups for evaluating rules against a ParamTable. The unit index is built up front,
+    the tag and dependency indexes the first time a rule needs them. Comments are only
+    fetched from a table that reads them lazily when a tag rule is evaluated.
+    """
+    def __init__(self, table):
+        self.table = table
+        self.version = table.version
+        self.names = list(table.names)
+        self.by_units = {}
+        for name in self.names:
+            self.by_units.setdefault(table.get(name).units, set()).add(name)
+        self._by_tag = None
+        self._dependents = None
+
+    @property
+    def by_tag(self):
+        if self._by_tag is None:
+            current = self.is_current(self.table)
+            self.table.fetch(range(len(self.table)), ['comment'])
+            if current:
+                # The comments read for the tag index leave the rest of it as it was.
+                self.version = self.table.version
+            self._by_tag = {}
+            for name in self.names:
+                for tag in _tag_re.findall(self.table.get(name).comment):
+                    self._by_tag.setdefault(tag.lower(), set()).add(name)
+        return self._by_tag
+
+    @property
+    def dependents(self):
+        """name -> names whose expression references it directly."""
+        if self._dependents is None:
+            self._dependents = {}
+            for name in self.names:
+                for ref in parse_expression_references(param_expression(self.table.get(name))):
+                    self._dependents.setdefault(ref, set()).add(name)
+        return self._dependents
+
+    def is_current(self, table):
+        """Whether the index was built over table as it is, no record was added or replaced since."""
+        return table is self.table and table.version == self.version
+
+    def select(self, rules):
+        """Returns the set of names the rules select."""
+        validate_rules(rules)
+        include = rules.get('include', [])
+        if include:
+            selected = set()
+            for rule in include:
+                selected |= self.match(rule)
+        else:
+            selected = set(self.names)
+        for rule in rules.get('exclude', []):
+            selected -= self.match(rule)
+        return selected
+
+    def match(self, rule):
+        if 'all' in rule:
+            return set(self.names) if rule['all'] else set()
+        if 'names' in rule:
+            return {name for name in rule['names'] if name in self.table}
+        if 'glob' in rule or 'regex' in rule:
+            flags = re.IGNORECASE if rule.get('ignoreCase') else 0
+            if 'glob' in rule:
+                # A glob covers the whole name, translate anchors its end and match its start.
+                find = re.compile(fnmatch.translate(rule['glob']), flags).match
+            else:
+                find = re.compile(rule['regex'], flags).search
+            return {name for name in self.names if find(name)}
+        if 'tag' in rule:
+            return set(self.by_tag.get(str(rule['tag']).lstrip('#').lower(), ()))
+        if 'units' in rule:
+            units = rule['units']
+            return set().union(*(self.by_units.get(u, ()) for u in (units if isinstance(units, list) else [units])))
+        return self.dependents_of(rule['dependsOn'], rule.get('direct', False))
+
+    def dependents_of(self, name, direct=False):
+        found = set(self.dependents.get(name, ()))
+        if direct:
+            return found
+        pending = list(found)
+        while pending:
+            for dependent in self.dependents.get(pending.pop(), ()):
+                if dependent not in found:
+                    found.add(dependent)
+                    pending.append(dependent)
+        return found
+
+class SelectionStore:
+    """Named selection rules kept in a JSON file."""
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def names(self):
+        return sorted(self.load())
+
+    def get(self, name):
+        sets = self.load()
+        if name not in sets:
+            raise SelectionError(f'No saved selection named "{name}"')
+        return sets[name]
+
+    def save(self, name, rules):
+        if not name:
+            raise SelectionError('A saved selection needs a name')
+        sets = self.load()
+        sets[name] = validate_rules(rules)
+        self.write(sets)
+
+    def delete(self, name):
+        sets = self.load()
+        if sets.pop(name, None) is not None:
+            self.write(sets)
+
+    def write(self, sets):
+        # Written next to the file and swapped in, so a crash never leaves half a file.
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(sets, f, indent=4)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,67 @@
+"""Per-design cache of parameter records."""
+
+from .table import ParamRecord, ParamTable
+
+class ParameterSnapshotCache:
+    """
+    Keeps the exported records of each open design, as a ParamTable, so an unchanged design
+    is not re-read through the API. Entries are marked dirty by commands that may have edited parameters
+    and are updated in place when this add-in adds parameters itself.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, userParams):
+        entry = self.entries.get(key)
+        # The count is a single API call and catches changes no event told us about.
+        if entry and not entry['dirty'] and entry['count'] == userParams.count:
+            self.hits += 1
+            return entry['records']
+
+        self.misses += 1
+        records = ParamTable(ParamRecord.from_param(p) for p in userParams)
+        self.entries[key] = {'records': records, 'count': len(records), 'dirty': False}
+        return records
+
+    def add_parameters(self, key, params):
+        """Appends parameters this add-in created so the snapshot stays valid."""
+        entry = self.entries.get(key)
+        if not entry or entry['dirty']:
+            return
+        # A copy, the old table may still be shown by a palette.
+        records = entry['records'].copy()
+        records.extend(ParamRecord.from_param(p) for p in params)
+        entry['records'] = records
+        entry['count'] += len(params)
+
+    def replace_parameters(self, key, params):
+        """Re-reads parameters this add-in changed so the snapshot stays valid."""
+        entry = self.entries.get(key)
+        if not entry or entry['dirty'] or not params:
+            return
+        records = entry['records'].copy()
+        for p in params:
+            records.replace(ParamRecord.from_param(p))
+        entry['records'] = records
+
+    def mark_dirty(self, key=None):
+        for entry_key, entry in self.entries.items():
+            if (key is None or entry_key == key) and not entry['dirty']:
+                entry['dirty'] = True
+                self.invalidations += 1
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hitRate': self.hits / lookups if lookups else 0.0,
+            'designs': len(self.entries)
+        }
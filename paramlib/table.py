@@ -0,0 +1,128 @@
+"""
+Compact in-memory storage of parameter records.
+
+A ParamRecord holds one parameter in slots instead of a dict, and reads like a record dict
+(p['name'], p.get('units', '')) so the functions taking records accept it unchanged. Unit
+strings are interned, so every 'mm' is the same string object. A ParamTable keeps records in
+order with an index by name.
+"""
+
+import sys
+
+from .records import RECORD_FIELDS
+
+class ParamRecord:
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, name, value=None, expression=None, units='', comment=''):
+        self.name = name
+        self.value = value
+        self.expression = expression  # None when the file only gave a value
+        self.units = sys.intern(units or '')
+        self.comment = comment or ''
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get('name'), d.get('value'), d.get('expression'), d.get('units', ''), d.get('comment', ''))
+
+    @classmethod
+    def from_param(cls, param):
+        """Reads a parameter, or any object with the same properties."""
+        return cls(param.name, param.value, param.expression, param.unit, param.comment)
+
+    # A missing value or expression is None, and reads as an absent key like in a record dict.
+    def __getitem__(self, key):
+        value = getattr(self, key) if key in RECORD_FIELDS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = getattr(self, key) if key in RECORD_FIELDS else None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key in RECORD_FIELDS and getattr(self, key) is not None
+
+    def to_dict(self):
+        d = {
+            'name': self.name,
+            'value': self.value,
+            'expression': self.expression,
+            'units': self.units,
+            'comment': self.comment
+        }
+        if self.expression is None:
+            del d['expression']
+        return d
+
+    def __repr__(self):
+        return f'ParamRecord({self.name!r}, {self.expression!r}, {self.units!r})'
+
+class ParamTable:
+    """Parameter records in order, looked up by name in constant time. The first of duplicate names wins."""
+    def __init__(self, records=()):
+        self.rows = []
+        self.index = {}
+        self.version = 0  # Bumped by every change to the rows, for indexes built over them
+        self.extend(records)
+
+    def append(self, record):
+        if not isinstance(record, ParamRecord):
+            record = ParamRecord.from_dict(record)
+        self.index.setdefault(record.name, len(self.rows))
+        self.rows.append(record)
+        self.version += 1
+        return record
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def copy(self):
+        table = ParamTable()
+        table.rows = list(self.rows)
+        table.index = dict(self.index)
+        return table
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    def __contains__(self, name):
+        return name in self.index
+
+    @property
+    def names(self):
+        return self.index.keys()
+
+    def get(self, name):
+        i = self.index.get(name)
+        return None if i is None else self.rows[i]
+
+    def replace(self, record):
+        """Replaces the record with the same name, or appends it."""
+        if not isinstance(record, ParamRecord):
+            record = ParamRecord.from_dict(record)
+        i = self.index.get(record.name)
+        if i is None:
+            return self.append(record)
+        self.rows[i] = record
+        self.version += 1
+        return record
+
+    def fetch(self, indexes, fields=None):
+        """Reads fields of the rows at indexes that are read lazily. A ParamTable holds them all already."""
+
+    def select(self, names):
+        """The records named in names, in table order."""
+        index = self.index
+        return [self.rows[i] for i in sorted(index[name] for name in names if name in index)]
+
+    def to_dicts(self, rows=None):
+        return [p.to_dict() for p in (self.rows if rows is None else rows)]
@@ -0,0 +1,159 @@
+"""
+Timing and counting of API calls and phases.
+
+The shared tracer is off by default and then costs next to nothing: span() returns a no-op
+context manager and wrap() hands back the object it was given. Once enabled, wrap() returns a
+proxy that times every property read, property write and method call on the wrapped API
+object, and on the objects those calls return, under names like 'UserParameters.add'.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+_no_span = nullcontext()
+
+# Results of these types are plain data, everything else is assumed to be an API object.
+_plain_types = (str, bytes, int, float, bool, type(None), list, tuple, dict, set)
+
+class Tracer:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stats = {}  # name -> [count, total seconds, max seconds]
+        self.trace_path = None
+        self.last_summary = None
+
+    def record(self, name, seconds):
+        entry = self.stats.get(name)
+        if entry is None:
+            self.stats[name] = [1, seconds, seconds]
+            return
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+    def span(self, name):
+        """Times the with block under name."""
+        if not self.enabled:
+            return _no_span
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def wrap(self, obj, name=None):
+        """Returns obj, or a timing proxy for it when tracing is enabled."""
+        if not self.enabled or obj is None or isinstance(obj, (TracedObject,) + _plain_types):
+            return obj
+        return TracedObject(self, obj, name or type(obj).__name__)
+
+    def wrap_function(self, fn, name):
+        if not self.enabled:
+            return fn
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return self.wrap(fn(*[unwrap(a) for a in args], **kwargs))
+            finally:
+                self.record(name, time.perf_counter() - start)
+        return traced
+
+    @contextmanager
+    def operation(self, name):
+        """
+        Traces one user operation such as an import. Statistics start empty, and when it ends
+        they are kept in last_summary and appended to trace_path as one JSON line.
+        """
+        if not self.enabled:
+            yield
+            return
+        self.stats = {}
+        started = time.time()
+        try:
+            with self._span(name):
+                yield
+        finally:
+            self.last_summary = self.summary(name, started)
+            if self.trace_path:
+                os.makedirs(os.path.dirname(self.trace_path), exist_ok=True)
+                with open(self.trace_path, 'a') as f:
+                    f.write(json.dumps(self.last_summary) + '\n')
+
+    def summary(self, operation=None, started=None):
+        entries = [{
+            'name': name,
+            'count': count,
+            'totalMs': round(total * 1000, 3),
+            'maxMs': round(longest * 1000, 3),
+        } for name, (count, total, longest) in self.stats.items()]
+        entries.sort(key=lambda entry: entry['totalMs'], reverse=True)
+        return {
+            'operation': operation,
+            'started': started,
+            'apiCalls': sum(count for name, (count, _, _) in self.stats.items() if name[:1].isupper()),
+            'entries': entries
+        }
+
+def unwrap(obj):
+    return obj._target if isinstance(obj, TracedObject) else obj
+
+class TracedObject:
+    """Forwards to an API object, timing each attribute access and call."""
+    __slots__ = ('_tracer', '_target', '_name')
+
+    def __init__(self, tracer, target, name):
+        object.__setattr__(self, '_tracer', tracer)
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        tracer = self._tracer
+        start = time.perf_counter()
+        value = getattr(self._target, attr)
+        if not callable(value):
+            tracer.record(f'{self._name}.{attr}', time.perf_counter() - start)
+            return tracer.wrap(value)
+
+        name = f'{self._name}.{attr}'
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                # The API only accepts its own objects, never the proxies.
+                return tracer.wrap(value(*[unwrap(a) for a in args], **{k: unwrap(v) for k, v in kwargs.items()}))
+            finally:
+                tracer.record(name, time.perf_counter() - start)
+        return traced
+
+    def __setattr__(self, attr, value):
+        start = time.perf_counter()
+        try:
+            setattr(self._target, attr, unwrap(value))
+        finally:
+            self._tracer.record(f'{self._name}.{attr}=', time.perf_counter() - start)
+
+    def __iter__(self):
+        iterator = iter(self._target)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._tracer.record(f'{self._name}.next', time.perf_counter() - start)
+            yield self._tracer.wrap(item)
+
+    def __len__(self):
+        return len(self._target)
+
+    def __bool__(self):
+        return bool(self._target)
+
+tracer = Tracer(enabled=os.environ.get('JSON_PARAMETERS_TRACE') == '1')
@@ -0,0 +1,137 @@
+"""
+Watching a parameter file for changes made outside Fusion.
+
+A FileWatcher polls the file's size and mtime from a worker thread, which costs one stat
+per poll. A write is acted on once the file has stopped changing for the debounce time, so
+a burst of writes, or one large write in pieces, is read once. The file is then hashed and
+only parsed when its bytes changed, and the records whose definition differs from the last
+version read are handed on as a FileChange. The design is changed by whoever takes the
+change, on the thread that owns the design.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from .formats import read_parameter_file
+from .records import param_definition
+
+class FileChange:
+    def __init__(self, records, removed):
+        self.records = records  # Records that are new or defined differently
+        self.removed = removed  # Names no longer in the file
+
+    def merge(self, later):
+        """Combines this change with one made after it, for changes that were not taken yet."""
+        records = {p['name']: p for p in self.records}
+        records.update((p['name'], p) for p in later.records)
+        for name in later.removed:
+            records.pop(name, None)
+        # Removed by either unless defined again, also a name the earlier change added.
+        removed = (set(self.removed) | set(later.removed)) - set(records)
+        return FileChange(list(records.values()), sorted(removed))
+
+    def __bool__(self):
+        return bool(self.records or self.removed)
+
+class FileWatcher:
+    def __init__(self, path, on_change, interval=0.2, debounce=0.3, renotify=2.0):
+        """
+        on_change() is called from the watcher thread when a change is waiting in pending,
+        and again every renotify seconds until it is taken.
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self.renotify = renotify
+        self.stat = None
+        self.digest = None
+        self.definitions = {}  # name -> definition in the version last read
+        self.error = None  # Why the last read failed, a file in mid-write is read again on its next change
+        self.pending = None
+        self.notified = 0.0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='paramlib-watch', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def take(self):
+        """Returns the waiting FileChange, or None."""
+        with self.lock:
+            change, self.pending = self.pending, None
+            return change
+
+    def put_back(self, change):
+        """Returns a taken change that could not be applied, later changes are merged into it."""
+        with self.lock:
+            self.pending = change.merge(self.pending) if self.pending else change
+
+    def forget(self, change):
+        """
+        Forgets a taken change that could not be applied. Its records are offered again the
+        next time the file is saved, even with the same content, when it may have been fixed.
+        """
+        with self.lock:
+            for p in change.records:
+                self.definitions.pop(p['name'], None)
+            self.digest = None
+
+    def run(self):
+        changed_at = None
+        while not self.stopped.wait(self.interval):
+            try:
+                st = os.stat(self.path)
+                stat = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                stat = None  # Replaced by a rename, or deleted
+            now = time.monotonic()
+            if stat != self.stat:
+                self.stat = stat
+                changed_at = now
+            elif stat is not None and changed_at is not None and now - changed_at >= self.debounce:
+                changed_at = None
+                change = self.check()
+                if change:
+                    self.put_back(change)
+                    self.notify(now)
+            elif self.pending is not None and now - self.notified >= self.renotify:
+                self.notify(now)
+
+    def notify(self, now):
+        self.notified = now
+        self.on_change()
+
+    def check(self):
+        """Reads the file if its content changed, returns the FileChange or None."""
+        try:
+            with open(self.path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            if digest == self.digest:
+                return None
+            records = list(read_parameter_file(self.path))
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+            return None
+        self.error = None
+
+        definitions = {}
+        changed = []
+        with self.lock:
+            self.digest = digest
+            for p in records:
+                if p['name'] in definitions:
+                    continue
+                definitions[p['name']] = definition = param_definition(p)
+                if self.definitions.get(p['name']) != definition:
+                    changed.append(p)
+            removed = [name for name in self.definitions if name not in definitions]
+            self.definitions = definitions
+        return FileChange(changed, removed)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# paramlib lives next to the add-in's main module, not in an installed package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from paramlib import read_content_hash, read_parameter_file, write_parameter_file
+from paramlib.batch import main
+from paramlib.selection import SelectionStore
+
+def record(name, expression, comment=''):
+    return {'name': name, 'value': 1.0, 'expression': expression, 'units': 'mm', 'comment': comment}
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {}
+    for name, records in {
+        'base': [record('width', '10 mm')],
+        'a': [record('height', 'width * 2', '#body'), record('depth', '5 mm')],
+        'b': [record('height', '3 mm'), record('wheel', '1 mm', '#wheels')],
+        'bad': [record('x', 'missing + 1 mm'), record('y', '1 mm + 1 deg')],
+    }.items():
+        paths[name] = str(tmp_path / f'{name}.json')
+        write_parameter_file(paths[name], records)
+    return paths
+
+def expressions(path):
+    return {p['name']: p.get('expression') for p in read_parameter_file(path)}
+
+def test_convert_with_rules_and_saved_selections(tmp_path, files, capsys):
+    out = str(tmp_path / 'out.jparams')
+    assert main(['convert', files['a'], out, '--rules', '{"include": [{"tag": "body"}]}']) == 0
+    assert expressions(out) == {'height': 'width * 2'}
+
+    store = str(tmp_path / 'selections.json')
+    SelectionStore(store).save('depth', {'include': [{'glob': 'd*'}]})
+    assert main(['convert', files['a'], out, '--selection', 'depth', '--selections', store]) == 0
+    assert expressions(out) == {'depth': '5 mm'}
+    assert main(['convert', files['a'], out, '--rules', '{"include": [{"regex": "("}]}']) == 2
+    assert 'Invalid selection' in capsys.readouterr().out
+
+def test_canonical_convert_and_hash(tmp_path, files, capsys):
+    out = str(tmp_path / 'out.json')
+    assert main(['convert', files['a'], out, '--canonical']) == 0
+    assert main(['convert', files['a'], out, '--canonical']) == 0
+    assert 'Unchanged 2 parameters' in capsys.readouterr().out
+    assert main(['hash', out, files['a'], str(tmp_path / 'missing.json')]) == 1
+    lines = capsys.readouterr().out.splitlines()
+    digest = read_content_hash(out)
+    assert lines[:2] == [f'{digest}  {out}', f'{digest}  {files["a"]}']
+    assert lines[2].endswith('no such file')
+
+def test_validate_reports_problems(files, capsys):
+    assert main(['validate', files['a'], '--base', files['base']]) == 0
+    assert main(['validate', files['a'], files['bad']]) == 1
+    out = capsys.readouterr().out
+    assert 'x: ' in out and 'missing' in out and 'y: ' in out
+    assert '0 of 2 files valid' in out
+
+def test_apply_imports_each_file_whole_or_not_at_all(tmp_path, files, capsys):
+    out = str(tmp_path / 'out.json')
+    assert main(['apply', files['a'], files['b'], '--base', files['base'], '--out', out]) == 0
+    assert expressions(out) == {'width': '10 mm', 'height': 'width * 2', 'depth': '5 mm', 'wheel': '1 mm'}
+    assert main(['apply', files['b'], files['a'], '--base', files['base'], '--out', out, '--update']) == 0
+    assert expressions(out)['height'] == 'width * 2'
+    assert main(['apply', files['bad'], '--out', out]) == 1
+    assert expressions(out) == {}
+    assert 'aborted' in capsys.readouterr().out
+
+def test_merge_policies(tmp_path, files, capsys, monkeypatch):
+    out = str(tmp_path / 'merged.json')
+    assert main(['merge', files['a'], files['b'], '--out', out]) == 0
+    assert expressions(out)['height'] == 'width * 2'
+    assert main(['merge', files['a'], files['b'], '--out', out, '--policy', 'last']) == 0
+    assert expressions(out)['height'] == '3 mm'
+    answers = iter(['3', 'x', '2'])
+    monkeypatch.setattr('builtins.input', lambda prompt: next(answers))
+    assert main(['merge', files['a'], files['b'], '--out', out, '--policy', 'prompt']) == 0
+    assert expressions(out)['height'] == '3 mm'
+    assert 'height is defined differently' in capsys.readouterr().out
+
+def test_library_add_and_search(tmp_path, files, capsys):
+    db = str(tmp_path / 'library.sqlite3')
+    assert main(['library', '--db', db, '--add', os.path.dirname(files['a']), '--workers', '2']) == 0
+    assert 'Indexed 4 of 4 files (7 parameters)' in capsys.readouterr().out
+    assert main(['library', '--db', db, '--search', 'wheel']) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].split('\t')[:3] == ['wheel', '1 mm', 'mm'] and out[-1].startswith('1 matches')
+
+def test_runs_as_a_module(tmp_path, files):
+    out = str(tmp_path / 'out.json.gz')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run([sys.executable, '-m', 'paramlib', 'convert', files['a'], out],
+                               cwd=root, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert expressions(out) == expressions(files['a'])
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from paramlib import canonical, canonical_records, read_parameter_file, write_canonical_file
+from paramlib.formats import EXTENSIONS, FORMATS
+
+RECORDS = [
+    {'name': 'width', 'value': 2.0, 'expression': '20 mm', 'units': 'mm', 'comment': 'Overall #chassis'},
+    {'name': 'height', 'value': 1.5, 'expression': 'width * 0.75', 'units': 'mm', 'comment': ''},
+    {'name': 'angle', 'value': 0.5235987755982988, 'expression': '30 deg', 'units': 'deg', 'comment': 'ü'},
+    {'name': 'count', 'value': 4.0, 'units': '', 'comment': 'Value only'},
+]
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_canonical_file_is_not_rewritten_when_unchanged(tmp_path, fmt):
+    path = str(tmp_path / ('params' + EXTENSIONS[fmt]))
+    count, digest, written = write_canonical_file(path, RECORDS, fmt)
+    assert written and count == len(RECORDS)
+    assert write_canonical_file(path, list(reversed(RECORDS)), fmt) == (count, digest, False)
+    assert canonical_records(read_parameter_file(path)) == canonical_records(RECORDS)
+
+def test_canonical_file_with_edited_body_is_repaired(tmp_path):
+    path = str(tmp_path / 'params.json')
+    _, digest, _ = write_canonical_file(path, RECORDS)
+    with open(path) as f:
+        document = json.load(f)
+    document['parameters'][0]['expression'] = '99 mm'
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=4)
+
+    assert write_canonical_file(path, RECORDS) == (len(RECORDS), digest, True)
+    assert canonical_records(read_parameter_file(path)) == canonical_records(RECORDS)
+
+def test_unchanged_file_written_here_is_not_read_again(tmp_path, monkeypatch):
+    path = str(tmp_path / 'params.json')
+    write_canonical_file(path, RECORDS)
+
+    def read_parameter_file(path):
+        raise AssertionError('the file was read again')
+    monkeypatch.setattr(canonical, 'read_parameter_file', read_parameter_file)
+    for _ in range(3):
+        assert write_canonical_file(path, RECORDS)[2] is False
+
+def test_interrupted_write_keeps_the_old_file(tmp_path, monkeypatch):
+    path = tmp_path / 'params.json'
+    write_canonical_file(str(path), RECORDS)
+    before = path.read_bytes()
+
+    def write_half(path, canonical, digest, fmt):
+        with open(path, 'w') as f:
+            f.write('{"format": "json-par')
+        raise KeyboardInterrupt
+    monkeypatch.setattr(canonical, '_write_canonical', write_half)
+    with pytest.raises(KeyboardInterrupt):
+        write_canonical_file(str(path), RECORDS[:2])
+    assert path.read_bytes() == before
+    assert os.listdir(tmp_path) == ['params.json']
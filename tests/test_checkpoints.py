@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from paramlib import CheckpointJournal, checkpoints
+from paramlib.checkpoints import CheckpointError, parameter_state
+
+def state_of(n, count=5):
+    return [{'name': f'p{i}', 'expression': f'{n * 100 + i} mm', 'units': 'mm', 'comment': ''}
+            for i in range(count)]
+
+def test_replay_gives_every_state(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'doc.jsonl.gz'), full_every=3, keep=100)
+    ids = [journal.add(state_of(n), f'step {n}') for n in range(8)]
+    assert ids == list(range(1, 9))
+    assert [c['full'] for c in journal.checkpoints()] == [True, False, False, True, False, False, True, False]
+
+    reread = CheckpointJournal(journal.path, full_every=3, keep=100)
+    for n, checkpoint_id in enumerate(ids):
+        assert reread.state(checkpoint_id) == parameter_state(state_of(n))
+    with pytest.raises(CheckpointError):
+        reread.state(99)
+
+def test_unchanged_state_adds_nothing(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'doc.jsonl.gz'))
+    assert journal.add(state_of(0)) == journal.add(state_of(0)) == 1
+    assert len(journal.checkpoints()) == 1
+
+def test_deltas_hold_only_changes(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'doc.jsonl.gz'))
+    journal.add(state_of(0))
+    records = state_of(0)[1:]
+    records[0] = dict(records[0], expression='9 mm')
+    journal.add(records)
+    newest = journal.checkpoints()[-1]
+    assert not newest['full'] and newest['changes'] == 2
+    assert journal.state() == parameter_state(records)
+
+def test_restore_plan(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'doc.jsonl.gz'))
+    first = journal.add(state_of(0))
+    current = state_of(0)[:4] + [{'name': 'extra', 'expression': '1 mm', 'units': 'mm', 'comment': ''}]
+    current[2] = dict(current[2], expression='7 mm')
+    diff, removed = journal.restore_plan(first, current)
+    assert [p['name'] for p in diff.added] == ['p4']
+    assert [p['name'] for p, current in diff.changed_expression] == ['p2']
+    assert removed == ['extra']
+
+def test_prune_keeps_replayable_states(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'doc.jsonl.gz'), full_every=4, keep=6)
+    ids = [journal.add(state_of(n)) for n in range(20)]
+    kept = [c['id'] for c in journal.checkpoints()]
+    assert kept[-1] == ids[-1] and len(kept) >= 6
+    assert journal.checkpoints()[0]['full']
+
+    reread = CheckpointJournal(journal.path, full_every=4, keep=6)
+    assert [c['id'] for c in reread.checkpoints()] == kept
+    for checkpoint_id in kept:
+        assert reread.state(checkpoint_id) == parameter_state(state_of(checkpoint_id - 1))
+
+def test_prune_does_not_rewrite_on_every_add(tmp_path, monkeypatch):
+    rewrites = []
+    replace = os.replace
+    monkeypatch.setattr(checkpoints.os, 'replace', lambda *args: (rewrites.append(args), replace(*args)))
+    journal = CheckpointJournal(str(tmp_path / 'doc.jsonl.gz'), full_every=20, keep=50)
+    for n in range(200):
+        journal.add(state_of(n))
+    # Past keep the journal is rewritten about once per full_every checkpoints, not every time
+    assert 0 < len(rewrites) <= (200 - 50) // 20 + 1
+    assert len(journal.checkpoints()) <= 50 + 20
+    assert journal.state() == parameter_state(state_of(199))
+
+def test_prune_without_full_checkpoint_makes_the_first_one_full(tmp_path):
+    journal = CheckpointJournal(str(tmp_path / 'doc.jsonl.gz'), full_every=100, keep=5)
+    journal.keep = 100
+    ids = [journal.add(state_of(n)) for n in range(10)]
+    journal.keep = 5
+    journal.prune()
+    kept = journal.checkpoints()
+    assert [c['id'] for c in kept] == ids[5:]
+    assert kept[0]['full'] and not kept[1]['full']
+    reread = CheckpointJournal(journal.path)
+    for checkpoint_id in ids[5:]:
+        assert reread.state(checkpoint_id) == parameter_state(state_of(checkpoint_id - 1))
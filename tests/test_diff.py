@@ -0,0 +1,50 @@
+import pytest
+
+from paramlib import apply_update, diff_parameters, param_to_record
+from paramlib.fakefusion import FakeDesign
+
+def record(name, expression, units='mm', comment=''):
+    return {'name': name, 'expression': expression, 'units': units, 'comment': comment}
+
+def user_parameters(design):
+    return {p.name: p.expression for p in design.userParameters}
+
+def current_records(design):
+    return [param_to_record(p) for p in design.userParameters]
+
+def test_diff_sorts_records_by_change():
+    current = [record('same', '1 mm'), record('expr', '2 mm'), record('meta', '3 mm'), record('gone', '4 mm')]
+    incoming = [record('same', '1mm'), record('expr', '5 mm'), record('meta', '3 mm', comment='note'), record('new', '6 mm')]
+    diff = diff_parameters(incoming, current)
+    assert [p['name'] for p in diff.added] == ['new']
+    assert [p['name'] for p, _ in diff.changed_expression] == ['expr']
+    assert [p['name'] for p, _ in diff.changed_meta] == ['meta']
+    assert [p['name'] for p in diff.unchanged] == ['same']
+    assert [p['name'] for p in diff.removed] == ['gone']
+    assert diff.write_count == 3
+
+def test_update_writes_only_differences():
+    design = FakeDesign.from_records([record('a', '1 mm'), record('b', 'a * 2')])
+    diff = diff_parameters([record('a', '3 mm'), record('b', 'a * 2'), record('c', 'b + 1 mm')], current_records(design))
+    result = apply_update(design, diff, design.fusion.createByString)
+    assert result.ok
+    assert design.fusion.calls['UserParameter.expression.set'] == 1
+    assert user_parameters(design) == {'a': '3 mm', 'b': 'a * 2', 'c': 'b + 1 mm'}
+    assert design.userParameters.itemByName('c').value == pytest.approx(0.7)
+
+def test_atomic_update_restores_changed_parameters():
+    design = FakeDesign.from_records([record('a', '1 mm'), record('b', '2 mm')])
+    diff = diff_parameters([record('a', '5 mm'), record('b', '1 kg'), record('c', '1 mm')], current_records(design))
+    result = apply_update(design, diff, design.fusion.createByString, atomic=True)
+    assert result.rolled_back and not result.ok
+    assert user_parameters(design) == {'a': '1 mm', 'b': '2 mm'}
+
+def test_update_with_known_names_does_not_walk_the_design():
+    design = FakeDesign.from_records([record('a', '1 mm')], components={'Body': [record('d1', '5 mm')]})
+    diff = diff_parameters([record('a', 'd1'), record('b', 'c * 2'), record('c', 'a')], current_records(design))
+    design.fusion.reset()
+    result = apply_update(design, diff, design.fusion.createByString, known_names={'a', 'd1'})
+    assert result.ok, result.summary()
+    assert design.fusion.calls['Design.allParameters'] == 0
+    assert design.fusion.calls['UserParameters.iterate'] == 0
+    assert user_parameters(design) == {'a': 'd1', 'c': 'a', 'b': 'c * 2'}
@@ -0,0 +1,120 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from paramlib import ParamTable, evaluate_expression, known_parameters, validate_parameters
+from paramlib import expressions
+from paramlib.expressions import REFERENCE, SYNTAX, UNIT, UNSUPPORTED, ExpressionError
+from paramlib.fakefusion import FakeDesign
+from paramlib.table import ParamRecord
+
+def record(name, expression, units='mm'):
+    return {'name': name, 'expression': expression, 'units': units}
+
+def kinds(report):
+    return {name: kind for name, kind, _ in report.errors}
+
+def test_values_are_in_internal_units():
+    assert evaluate_expression('10 mm', 'mm') == pytest.approx(1.0)
+    assert evaluate_expression('10', 'mm') == pytest.approx(1.0)
+    assert evaluate_expression('1 in + 1 mm', 'mm') == pytest.approx(2.64)
+    assert evaluate_expression('90 deg', 'deg') == pytest.approx(1.5707963)
+
+def test_unit_power_belongs_to_the_unit():
+    assert evaluate_expression('10 mm^2', 'cm^2') == pytest.approx(0.1)
+    assert evaluate_expression('2 * 10 mm^2', 'mm^2') == pytest.approx(0.2)
+    assert evaluate_expression('(10 mm)^2', 'mm^2') == pytest.approx(1.0)
+
+def test_errors_have_a_kind():
+    with pytest.raises(ExpressionError) as e:
+        evaluate_expression('10 mm +', 'mm')
+    assert e.value.kind == SYNTAX
+    with pytest.raises(ExpressionError) as e:
+        evaluate_expression('10 mm + 5 deg', 'mm')
+    assert e.value.kind == UNIT
+    with pytest.raises(ExpressionError) as e:
+        evaluate_expression('width * 2', 'mm')
+    assert e.value.kind == REFERENCE
+
+def test_number_with_unknown_unit_is_unsupported():
+    with pytest.raises(ExpressionError) as e:
+        evaluate_expression('10 lbm', '')
+    assert e.value.kind == UNSUPPORTED
+    report = validate_parameters([record('m', '10 lbm', '')])
+    assert report.ok and kinds(report) == {'m': UNSUPPORTED}
+
+def test_validation_evaluates_in_dependency_order():
+    report = validate_parameters([record('b', 'a * 2'), record('a', '10 mm')])
+    assert report.ok
+    assert report.values == {'a': pytest.approx(1.0), 'b': pytest.approx(2.0)}
+
+def test_validation_reports_cycles_and_their_dependents():
+    report = validate_parameters([record('a', 'b'), record('b', 'a'), record('c', 'a + 1 mm'), record('d', '1 mm')])
+    assert not report.ok
+    assert kinds(report) == {'a': REFERENCE, 'c': REFERENCE}
+    assert report.values == {'d': pytest.approx(0.1)}
+
+def test_validation_reports_unknown_references_and_dependents():
+    report = validate_parameters([record('a', 'missing * 2'), record('b', 'a')])
+    assert kinds(report) == {'a': REFERENCE, 'b': REFERENCE}
+    assert 'missing' in report.errors[0][2]
+
+def test_unsupported_units_do_not_block_dependents():
+    report = validate_parameters([record('a', '10', 'GPa'), record('b', 'a * 2', 'GPa'), record('c', '1 mm')])
+    assert report.ok
+    assert kinds(report) == {'a': UNSUPPORTED}
+    assert 'b' not in report.values and 'c' in report.values
+
+def test_unsupported_functions_do_not_block_dependents():
+    report = validate_parameters([record('a', 'foo(1 mm)'), record('b', 'a + 1 mm')])
+    assert report.ok
+    assert [kind for _, kind, _ in report.blocking_errors()] == []
+
+def test_known_parameters_include_model_parameters():
+    design = FakeDesign.from_records([record('width', '20 mm')], components={'Body': [record('d1', '5 mm')]})
+    known = known_parameters(design)
+    assert set(known) == {'width', 'd1'}
+    report = validate_parameters([record('b', 'd1 * 2 + width')], known)
+    assert report.ok
+    assert report.values['b'] == pytest.approx(3.0)
+
+def test_validation_reads_records_from_their_slots(monkeypatch):
+    def fail(*args):
+        raise AssertionError('read through the dict interface')
+    monkeypatch.setattr(ParamRecord, 'get', fail)
+    monkeypatch.setattr(ParamRecord, '__getitem__', fail)
+    table = ParamTable([record('a', '1 mm'), record('b', 'a + 1 mm')])
+    assert validate_parameters(table.rows).ok
+
+def test_large_chain_validates_quickly():
+    count = 100000
+    table = ParamTable([record('p0', '1 mm')] + [record(f'p{i}', f'p{i - 1} + 1 mm') for i in range(1, count)])
+    expressions._parse_cache.clear()
+    validate_parameters(table.rows)
+    start = time.perf_counter()
+    report = validate_parameters(table.rows)
+    seconds = time.perf_counter() - start
+    assert report.ok and len(report.values) == count
+    assert seconds < 1.0
+
+def test_garbage_collector_is_only_paused_on_the_main_thread(monkeypatch):
+    seen = []
+    validate = expressions._validate_parameters
+    def record_collector(records, known):
+        seen.append((threading.current_thread() is threading.main_thread(), gc.isenabled()))
+        if len(seen) == 1:
+            # Nested, as when a validation runs inside another
+            validate_parameters([record('b', '1 mm')])
+        return validate(records, known)
+    monkeypatch.setattr(expressions, '_validate_parameters', record_collector)
+
+    assert gc.isenabled()
+    validate_parameters([record('a', '1 mm')])
+    assert gc.isenabled()
+    worker = threading.Thread(target=validate_parameters, args=([record('c', '1 mm')],))
+    worker.start()
+    worker.join()
+    assert seen == [(True, False), (True, False), (False, True)]
+    assert gc.isenabled()
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from paramlib import apply_update, diff_parameters, formats, jsonio, read_parameter_file, write_parameter_file
+from paramlib.fakefusion import FakeDesign
+from paramlib.formats import EXTENSIONS, FORMAT_BINARY, FORMATS, detect_format
+
+RECORDS = [
+    {'name': 'width', 'value': 2.0, 'expression': '20 mm', 'units': 'mm', 'comment': 'Overall #chassis'},
+    {'name': 'height', 'value': 1.5, 'expression': 'width * 0.75', 'units': 'mm', 'comment': ''},
+    {'name': 'angle', 'value': 0.5235987755982988, 'expression': '30 deg', 'units': 'deg', 'comment': 'ü'},
+    {'name': 'count', 'value': 4.0, 'units': '', 'comment': 'Value only'},
+]
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_formats_round_trip(tmp_path, fmt):
+    path = str(tmp_path / ('params' + EXTENSIONS[fmt]))
+    write_parameter_file(path, RECORDS, fmt)
+    assert detect_format(path) == (fmt if fmt != 'json-compact' else 'json')
+    assert list(read_parameter_file(path)) == RECORDS
+
+def test_value_only_records_import_from_binary(tmp_path):
+    path = str(tmp_path / 'params.jparams')
+    write_parameter_file(path, RECORDS, FORMAT_BINARY)
+    records = list(read_parameter_file(path))
+    assert 'expression' not in records[-1]
+    design = FakeDesign()
+    result = apply_update(design, diff_parameters(records, []), design.fusion.createByString, atomic=True)
+    assert result.ok, result.summary()
+    assert design.userParameters.itemByName('count').expression == '4.0'
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_text_files_are_read_and_written_as_utf8(tmp_path, monkeypatch, fmt):
+    # Fusion runs on Windows, where the default encoding is the locale's code page.
+    def utf8_open(file, mode='r', *args, **kwargs):
+        if 'b' not in mode:
+            assert kwargs.get('encoding') == 'utf-8', f'{file} opened as text without an encoding'
+        return open(file, mode, *args, **kwargs)
+    monkeypatch.setattr(formats, 'open', utf8_open, raising=False)
+    monkeypatch.setattr(jsonio, 'open', utf8_open, raising=False)
+
+    path = tmp_path / ('params' + EXTENSIONS[fmt])
+    write_parameter_file(str(path), RECORDS, fmt)
+    assert list(read_parameter_file(str(path))) == RECORDS
+
+def test_utf8_written_by_other_programs_is_read(tmp_path):
+    path = tmp_path / 'params.json'
+    path.write_bytes(json.dumps([RECORDS[2]], ensure_ascii=False).encode('utf-8'))
+    assert list(read_parameter_file(str(path)))[0]['comment'] == 'ü'
@@ -0,0 +1,47 @@
+import pytest
+
+from paramlib import import_parameters
+from paramlib.fakefusion import FakeDesign
+
+def record(name, expression, units='mm', comment=''):
+    return {'name': name, 'expression': expression, 'units': units, 'comment': comment}
+
+def user_parameters(design):
+    return {p.name: p.expression for p in design.userParameters}
+
+def test_import_adds_in_dependency_order():
+    design = FakeDesign()
+    result = import_parameters(design, [record('b', 'a * 2'), record('a', '10 mm')], design.fusion.createByString)
+    assert result.ok
+    assert [p.name for p in result.added] == ['a', 'b']
+    assert design.userParameters.itemByName('b').value == pytest.approx(2.0)
+
+def test_import_skips_existing_and_aborts_on_cycles():
+    design = FakeDesign.from_records([record('a', '1 mm')])
+    result = import_parameters(design, [record('a', '5 mm'), record('x', 'y'), record('y', 'x')], design.fusion.createByString)
+    assert result.skipped == ['a']
+    assert result.aborted and result.cycles
+    assert user_parameters(design) == {'a': '1 mm'}
+
+def test_import_resolves_model_parameters():
+    design = FakeDesign.from_records([], components={'Body': [record('d1', '5 mm')]})
+    result = import_parameters(design, [record('b', 'd1 * 2')], design.fusion.createByString)
+    assert result.ok
+    assert design.userParameters.itemByName('b').value == pytest.approx(1.0)
+
+def test_atomic_import_rolls_back():
+    design = FakeDesign.from_records([record('keep', '1 mm')])
+    records = [record('a', '1 mm'), record('b', 'a * 2'), record('bad', '1 kg')]
+    result = import_parameters(design, records, design.fusion.createByString, atomic=True)
+    assert result.rolled_back and not result.added
+    assert [p['name'] for p, _ in result.failed] == ['bad']
+    assert user_parameters(design) == {'keep': '1 mm'}
+
+def test_import_with_known_names_does_not_walk_the_design():
+    design = FakeDesign.from_records([record('a', '1 mm')], components={'Body': [record('d1', '5 mm')]})
+    result = import_parameters(design, [record('a', '2 mm'), record('b', 'a + d1')], design.fusion.createByString,
+                               existing={'a'}, known_names={'a', 'd1'})
+    assert result.ok and result.skipped == ['a']
+    assert design.fusion.calls['UserParameters.iterate'] == 0
+    assert design.fusion.calls['Design.allParameters'] == 0
+    assert design.userParameters.itemByName('b').value == pytest.approx(0.6)
@@ -0,0 +1,38 @@
+import pytest
+
+from paramlib import ImportJob, known_parameters, param_to_record
+from paramlib.fakefusion import FakeDesign
+from paramlib.jobs import DONE, FAILED
+
+def record(name, expression, units='mm', comment=''):
+    return {'name': name, 'expression': expression, 'units': units, 'comment': comment}
+
+def user_parameters(design):
+    return {p.name: p.expression for p in design.userParameters}
+
+def current_records(design):
+    return [param_to_record(p) for p in design.userParameters]
+
+def run_job(job, design):
+    job.prepare()
+    while job.step(design.fusion.createByString):
+        pass
+    return job
+
+def test_background_import_resolves_model_parameters():
+    design = FakeDesign.from_records([record('width', '20 mm')], components={'Body': [record('d1', '5 mm')]})
+    current = current_records(design)
+    for validate in (True, False):
+        name = f'b{validate}'
+        job = ImportJob(design, [record(name, 'd1 * 2 + width')], current, validate=validate,
+                        known=known_parameters(design, current))
+        run_job(job, design)
+        assert job.state == DONE, job.result.summary()
+        assert design.userParameters.itemByName(name).value == pytest.approx(3.0)
+
+def test_background_import_rolls_back_on_failure():
+    design = FakeDesign.from_records([record('keep', '1 mm')])
+    job = ImportJob(design, [record('a', '1 mm'), record('bad', '1 kg')], current_records(design), validate=False)
+    run_job(job, design)
+    assert job.state == FAILED
+    assert user_parameters(design) == {'keep': '1 mm'}
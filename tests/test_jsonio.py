@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from paramlib import iter_json_records, read_records, write_json_records, write_records
+
+RECORDS = [
+    {'name': 'width', 'value': 2.0, 'expression': '20 mm', 'units': 'mm', 'comment': 'with "quotes", [brackets] and {braces}'},
+    {'name': 'count', 'value': 12345678901, 'units': '', 'comment': ''},
+    {'name': 'angle', 'value': -0.5, 'expression': '-30 deg', 'units': 'deg', 'comment': 'ü'},
+]
+
+WRAPPED = {'format': 'json-parameters', 'version': 1, 'nested': {'parameters': 'not these'},
+           'count': 3, 'hash': 'sha256:0', 'parameters': RECORDS}
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 65536])
+@pytest.mark.parametrize('document', [RECORDS, WRAPPED], ids=['array', 'wrapped'])
+def test_records_split_across_chunks(document, chunk_size):
+    for text in (json.dumps(document), json.dumps(document, indent=4)):
+        assert list(iter_json_records(io.StringIO(text), chunk_size)) == RECORDS
+
+def test_first_record_is_yielded_before_the_rest_is_read():
+    text = json.dumps(RECORDS + [{'name': f'p{i}', 'value': i} for i in range(1000)])
+    f = CountingReader(text)
+    records = iter_json_records(f, chunk_size=256)
+    assert next(records) == RECORDS[0]
+    assert f.reads < 3
+
+@pytest.mark.parametrize('text', ['', '{"name": "a"}', '{"format": "json-parameters"}', '"text"', '[{"name": "a"}', '[{"name": '])
+def test_invalid_files_raise_value_error(text):
+    with pytest.raises(ValueError):
+        list(iter_json_records(io.StringIO(text), chunk_size=4))
+
+def test_empty_array():
+    assert list(iter_json_records(io.StringIO(' [ ] '))) == []
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_written_layout_matches_json_dump(compact):
+    f = io.StringIO()
+    assert write_json_records(f, iter(RECORDS), compact) == len(RECORDS)
+    if compact:
+        assert f.getvalue() == json.dumps(RECORDS, separators=(',', ':'))
+    else:
+        assert f.getvalue() == json.dumps(RECORDS, indent=4)
+    empty = io.StringIO()
+    write_json_records(empty, [], compact)
+    assert empty.getvalue() == json.dumps([], indent=4)
+
+def test_files_round_trip(tmp_path):
+    path = str(tmp_path / 'params.json')
+    assert write_records(path, RECORDS) == 3
+    assert list(read_records(path)) == RECORDS
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import weakref
+
+import pytest
+
+from paramlib import ParameterLibrary, library, write_parameter_file
+from paramlib.formats import FORMAT_BINARY, FORMAT_GZIP
+
+def record(name, expression, comment=''):
+    return {'name': name, 'value': 1.0, 'expression': expression, 'units': 'mm', 'comment': comment}
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / 'params'
+    (root / 'sub').mkdir(parents=True)
+    write_parameter_file(str(root / 'car.json'), [record('wheel_size', '20 mm', 'Front #wheels'), record('width', '1 mm')])
+    write_parameter_file(str(root / 'sub' / 'bike.json.gz'), [record('wheel_count', '2 mm')], FORMAT_GZIP)
+    write_parameter_file(str(root / 'sub' / 'boat.jparams'), [record('hull', '3 mm', 'wheelhouse')], FORMAT_BINARY)
+    (root / 'notes.txt').write_text('not a parameter file')
+    (root / 'broken.json').write_text('[{"name": ')
+    return root
+
+@pytest.fixture
+def lib(tmp_path, folder):
+    lib = ParameterLibrary(str(tmp_path / 'library.sqlite3'))
+    lib.add_root(str(folder))
+    return lib
+
+def names(result):
+    return sorted(row['name'] for row in result['rows'])
+
+def test_ingest_indexes_every_format_and_reports_broken_files(lib, folder):
+    stats = lib.ingest()
+    assert stats.scanned == 4 and stats.indexed == 4 and stats.params == 4
+    assert [os.path.basename(path) for path, _ in stats.failed] == ['broken.json']
+    assert lib.stats()['files'] == 4 and lib.stats()['failedFiles'] == 1
+
+def test_search_by_text_units_and_file(lib):
+    lib.ingest()
+    assert names(lib.search('wheel')) == ['hull', 'wheel_count', 'wheel_size']
+    assert names(lib.search('WHEELS')) == ['wheel_size']
+    assert names(lib.search('wh', path='sub')) == ['hull', 'wheel_count']
+    assert lib.search('wheel', units='in')['total'] == 0
+    assert names(lib.search('100%_')) == []
+
+def test_records_are_returned_for_import(lib):
+    lib.ingest()
+    rows = lib.search('wheel_')['rows']
+    records = lib.records([row['id'] for row in reversed(rows)])
+    assert [p['name'] for p in records] == ['wheel_size', 'wheel_count']
+    assert records[0] == {'name': 'wheel_size', 'value': 1.0, 'expression': '20 mm', 'units': 'mm', 'comment': 'Front #wheels'}
+
+def test_reindexing_reads_only_changed_files(lib, folder):
+    lib.ingest()
+    write_parameter_file(str(folder / 'car.json'), [record('width', '5 mm')])
+    os.remove(folder / 'sub' / 'bike.json.gz')
+    stats = lib.ingest()
+    assert stats.indexed == 1 and stats.removed == 1 and stats.unchanged == 2
+    assert names(lib.search('wheel')) == ['hull']
+    assert lib.search('width')['rows'][0]['expression'] == '5 mm'
+
+def test_file_deleted_while_indexing_does_not_stop_the_ingest(lib, folder, monkeypatch):
+    read = library.read_library_file
+    def read_after_delete(path, known_hash=None):
+        if path.endswith('car.json'):
+            os.remove(path)
+        return read(path, known_hash)
+    monkeypatch.setattr(library, 'read_library_file', read_after_delete)
+    stats = lib.ingest()
+    assert stats.indexed == 4
+    assert sorted(os.path.basename(path) for path, _ in stats.failed) == ['broken.json', 'car.json']
+    assert names(lib.search('wheel')) == ['hull', 'wheel_count']
+
+def test_missing_file_reads_as_an_error_row(tmp_path):
+    path, mtime, size, digest, rows, error = library.read_library_file(str(tmp_path / 'gone.json'))
+    assert (mtime, size, digest, rows) == (None, None, None, [])
+    assert error
+
+def test_connections_are_closed(lib, monkeypatch):
+    opened = weakref.WeakSet()
+    closed = []
+
+    class Connection(sqlite3.Connection):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    connect = sqlite3.connect
+    def tracked_connect(*args, **kwargs):
+        db = connect(*args, factory=Connection, **kwargs)
+        opened.add(db)
+        return db
+    monkeypatch.setattr(library.sqlite3, 'connect', tracked_connect)
+
+    lib.ingest()
+    lib.search('wheel')
+    lib.records([1, 2])
+    lib.stats()
+    lib.remove_root(lib.roots()[0])
+    assert closed and all(db in closed for db in opened)
+    assert lib.stats()['files'] == 0
@@ -0,0 +1,63 @@
+import pytest
+
+from paramlib import merge_records
+from paramlib.merge import LAST, PROMPT, MergeError
+
+def record(name, expression, comment=''):
+    return {'name': name, 'expression': expression, 'units': 'mm', 'comment': comment}
+
+SOURCES = [
+    ('a.json', [record('width', '10 mm'), record('height', '5 mm'), record('same', '1 mm')]),
+    ('b.json', [record('width', '20 mm'), record('depth', '3 mm'), record('same', '1 mm')]),
+    ('c.json', [record('width', '30 mm'), record('height', '5 mm', 'note')]),
+]
+
+def expressions(result):
+    return {p.name: p.expression for p in result.table}
+
+def test_first_policy_keeps_the_earliest_definition():
+    result = merge_records(SOURCES)
+    assert list(expressions(result)) == ['width', 'height', 'same', 'depth']
+    assert expressions(result)['width'] == '10 mm'
+    assert [c.name for c in result.conflicts] == ['width', 'height']
+    assert not result.unresolved and result.counts == [3, 3, 2]
+
+def test_last_policy_keeps_the_latest_definition():
+    result = merge_records(SOURCES, LAST)
+    assert expressions(result)['width'] == '30 mm'
+    assert result.table.get('height').comment == 'note'
+
+def test_prompt_leaves_conflicts_open_until_resolved():
+    result = merge_records(SOURCES, PROMPT)
+    assert [c.name for c in result.unresolved] == ['width', 'height']
+    result.resolve({'width': 1, 'height': 2})
+    assert not result.unresolved
+    assert expressions(result)['width'] == '20 mm'
+    with pytest.raises(MergeError):
+        result.resolve({'depth': 0})
+    with pytest.raises(MergeError):
+        result.resolve({'height': 1})
+    result.apply_policy(PROMPT)
+    assert len(result.unresolved) == 2 and expressions(result)['width'] == '10 mm'
+    with pytest.raises(MergeError):
+        result.apply_policy('newest')
+
+def test_duplicates_within_one_file_are_not_conflicts():
+    result = merge_records([
+        ('a.json', [record('width', '10 mm'), record('x', '1 mm'), record('width', '11 mm'), record('width', '12 mm')]),
+        ('b.json', [record('width', '10 mm'), record('x', '2 mm')]),
+    ], PROMPT)
+    assert [c.name for c in result.conflicts] == ['x']
+    assert [[source for source, _ in c.candidates] for c in result.conflicts] == [[0, 1]]
+    assert result.duplicates == [(0, 'width', [0, 2, 3])]
+    assert expressions(result) == {'width': '10 mm', 'x': '1 mm'}
+    assert result.to_dict()['duplicates'] == [{'source': 0, 'file': 'a.json', 'name': 'width', 'records': [0, 2, 3]}]
+    assert 'width in a.json, records 1, 3, 4' in result.summary()
+
+def test_duplicate_in_one_file_differing_from_another_is_one_conflict():
+    result = merge_records([
+        ('a.json', [record('width', '10 mm'), record('width', '11 mm')]),
+        ('b.json', [record('width', '20 mm')]),
+    ], PROMPT)
+    [conflict] = result.conflicts
+    assert [(source, p.expression) for source, p in conflict.candidates] == [(0, '10 mm'), (1, '20 mm')]
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from paramlib.messages import MESSAGE_VERSION, MessageError, MessageRouter, decode_message, validate_message
+
+def test_decode_accepts_double_encoded_messages():
+    msg = {'action': 'getPage', 'offset': 10}
+    assert decode_message(json.dumps(msg)) == msg
+    assert decode_message(json.dumps(json.dumps(msg))) == msg
+    assert decode_message('[1, 2]') is None
+    assert decode_message('{"no": "action"}') is None
+    with pytest.raises(MessageError):
+        decode_message('"just text"')
+    with pytest.raises(MessageError):
+        decode_message('{"action": ')
+
+@pytest.mark.parametrize('msg, error', [
+    ({'action': 'nothing'}, 'Unknown action'),
+    ({'action': 'getPage', 'offset': '10'}, 'must be int'),
+    ({'action': 'getPage', 'offset': True}, 'must be int'),
+    ({'action': 'getPage', 'sort': 3}, 'must be str or null'),
+    ({'action': 'saveSelection', 'name': 'a'}, 'missing "rules"'),
+    ({'action': 'cancelImport', 'v': MESSAGE_VERSION + 1}, 'Unsupported message version'),
+])
+def test_invalid_messages_are_rejected(msg, error):
+    with pytest.raises(MessageError, match=error):
+        validate_message(msg)
+
+def test_valid_messages_pass():
+    for msg in ({'action': 'getPage', 'sort': None, 'requestId': [1]},
+                {'action': 'import', 'selected': ['a'], 'transaction': False, 'v': 1},
+                {'action': 'setTracing', 'enabled': True}):
+        assert validate_message(msg) is msg
+
+def test_router_dispatches_messages_and_batches():
+    handled = []
+    router = MessageRouter('import')
+    router.register('getPage', lambda msg: handled.append(('page', msg.get('offset'))))
+    router.register('cancelImport', lambda msg: handled.append(('cancel', None)))
+    router.dispatch(json.dumps({'action': 'getPage', 'offset': 5}))
+    router.dispatch(json.dumps({'action': 'batch', 'messages': [{'action': 'cancelImport'}, {'action': 'getPage'}]}))
+    router.dispatch('[1, 2]')
+    assert handled == [('page', 5), ('cancel', None), ('page', None)]
+
+def test_bad_batch_entry_runs_nothing():
+    handled = []
+    router = MessageRouter('import')
+    router.register('getPage', handled.append)
+    for messages in ([{'action': 'getPage'}, {'action': 'getPage', 'limit': 'all'}],
+                     [{'action': 'getPage'}, {'action': 'batch', 'messages': []}]):
+        with pytest.raises(MessageError):
+            router.dispatch(json.dumps({'action': 'batch', 'messages': messages}))
+    assert handled == []
+
+def test_unhandled_and_unknown_actions():
+    router = MessageRouter('export')
+    with pytest.raises(MessageError, match='export palette does not handle'):
+        router.dispatch(json.dumps({'action': 'cancelImport'}))
+    with pytest.raises(MessageError):
+        router.register('nothing', print)
@@ -0,0 +1,34 @@
+from paramlib import order_parameters_for_import, parse_expression_references
+
+def record(name, expression, units='mm'):
+    return {'name': name, 'expression': expression, 'units': units}
+
+def names(records):
+    return [p['name'] for p in records]
+
+def test_references_skip_units_functions_and_text():
+    assert parse_expression_references("max(width, 2 mm) + PI * d1 + 'in'") == ['width', 'd1']
+
+def test_dependents_come_after_what_they_reference():
+    records = [record('c', 'b * 2'), record('b', 'a + 1 mm'), record('a', '10 mm'), record('x', '1 mm')]
+    ordered, unresolved, cycles = order_parameters_for_import(records, set())
+    assert names(ordered) == ['a', 'x', 'b', 'c']
+    assert unresolved == {} and cycles == []
+
+def test_known_names_resolve_references():
+    ordered, unresolved, _ = order_parameters_for_import([record('b', 'd1 * 2')], {'d1'})
+    assert names(ordered) == ['b'] and unresolved == {}
+
+def test_unknown_references_are_reported():
+    _, unresolved, _ = order_parameters_for_import([record('b', 'missing + other')], set())
+    assert unresolved == {'b': ['missing', 'other']}
+
+def test_cycles_are_reported_and_left_out():
+    records = [record('a', 'b'), record('b', 'c'), record('c', 'a'), record('d', 'a'), record('e', '1 mm')]
+    ordered, _, cycles = order_parameters_for_import(records, set())
+    assert names(ordered) == ['e']
+    assert cycles == [['a', 'b', 'c', 'a']]
+
+def test_first_of_duplicate_names_wins():
+    ordered, _, _ = order_parameters_for_import([record('a', '1 mm'), record('a', '2 mm')], set())
+    assert [p['expression'] for p in ordered] == ['1 mm']
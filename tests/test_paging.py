@@ -0,0 +1,66 @@
+from paramlib import ParameterPager, ParamTable, ScopedParameters, scope_parameters
+from paramlib.fakefusion import FakeDesign
+
+def record(name, expression, value, comment=''):
+    return {'name': name, 'value': value, 'expression': expression, 'units': 'mm', 'comment': comment}
+
+def pager_over(records):
+    pager = ParameterPager()
+    pager.reset(ParamTable(records))
+    return pager
+
+def names(page):
+    return [row['name'] for row in page['rows']]
+
+RECORDS = [record(f'p{i:03}', f'{i} mm', float(i % 7), '#even' if i % 2 == 0 else '') for i in range(250)]
+
+def test_pages_cover_the_records_in_order():
+    pager = pager_over(RECORDS)
+    first = pager.page()
+    assert first['total'] == first['count'] == 250 and len(first['rows']) == 200
+    last = pager.page(offset=200, limit=100)
+    assert names(last) == [f'p{i:03}' for i in range(200, 250)]
+    assert last['rows'][0] == record('p200', '200 mm', 4.0, '#even')
+
+def test_limits_are_clamped():
+    pager = pager_over(RECORDS)
+    assert len(pager.page(limit=-5)['rows']) == 1
+    assert len(pager.page(limit=0)['rows']) == 200
+    assert len(pager.page(limit=5000)['rows']) == 250
+    assert pager.page(offset=-10, limit=1)['offset'] == 0
+
+def test_sort_and_filter():
+    pager = pager_over(RECORDS + [record('text', 'text', 'abc')])
+    page = pager.page(limit=3, sort='value', descending=True)
+    assert [row['value'] for row in page['rows']] == [6.0, 6.0, 6.0]
+    # Values that are not numbers sort first
+    assert names(pager.page(limit=1, sort='value')) == ['text']
+    page = pager.page(filter_text='EVEN', sort='name', descending=True, limit=2)
+    assert page['total'] == 125 and names(page) == ['p248', 'p246']
+    assert pager.page(filter_text='212 mm')['total'] == 1
+
+def test_view_is_rebuilt_only_when_it_changes():
+    pager = pager_over(RECORDS)
+    builds = []
+    build_view = pager.build_view
+    pager.build_view = lambda *args: builds.append(args) or build_view(*args)
+    for offset in range(0, 250, 50):
+        pager.page(offset, 50, 'value')
+    assert len(builds) == 1
+    pager.records.append(record('new', '1 mm', 1.0))
+    pager.page(0, 50, 'value')
+    pager.page(0, 50, 'value', filter_text='p1')
+    assert len(builds) == 3
+
+def test_scoped_records_are_read_for_shown_rows_only():
+    design = FakeDesign.from_records([], components={'Body': RECORDS})
+    pager = ParameterPager()
+    pager.reset(ScopedParameters(scope_parameters(design, 'model')))
+    design.fusion.reset()
+    page = pager.page(limit=10)
+    assert page['rows'][0]['comment'] == '#even'
+    assert design.fusion.calls['ModelParameter.comment'] == 10
+    pager.page(limit=10, sort='comment')
+    assert design.fusion.calls['ModelParameter.comment'] == 250
+    # The first ten by comment are odd rows, five of them were shown before
+    assert design.fusion.calls['ModelParameter.value'] == 15
@@ -0,0 +1,58 @@
+import pytest
+
+from paramlib import ScopedParameters, scope_parameters
+from paramlib.fakefusion import FakeDesign
+from paramlib.scope import ScopeError
+from paramlib.selection import SelectionIndex
+
+def record(name, expression, comment=''):
+    return {'name': name, 'expression': expression, 'units': 'mm', 'comment': comment}
+
+@pytest.fixture
+def design():
+    return FakeDesign.from_records([record('width', '10 mm')], components={
+        'Body': [record('d1', '5 mm', '#wheels'), record('d2', '6 mm')],
+        'Lid': [record('d3', '7 mm', '#lid')]
+    })
+
+def names(params):
+    return [p.name for p in params]
+
+def test_scopes(design):
+    assert names(scope_parameters(design, 'user')) == ['width']
+    assert names(scope_parameters(design, 'model')) == ['d1', 'd2', 'd3']
+    assert names(scope_parameters(design, 'components', ['Lid'])) == ['d3']
+    assert names(scope_parameters(design, 'all')) == ['width', 'd1', 'd2', 'd3']
+    with pytest.raises(ScopeError):
+        scope_parameters(design, 'components', ['Missing'])
+    with pytest.raises(ScopeError):
+        scope_parameters(design, 'everything')
+
+def test_lazy_fields_are_read_for_the_rows_asked_for(design):
+    table = ScopedParameters(scope_parameters(design, 'model'))
+    design.fusion.reset()
+    assert table.get('d1').comment == ''
+    table.fetch([0])
+    table.fetch([0])
+    assert table.get('d1').comment == '#wheels' and table.get('d1').value == pytest.approx(0.5)
+    assert design.fusion.calls['ModelParameter.comment'] == 1
+    assert design.fusion.calls['ModelParameter.value'] == 1
+
+def test_projection_keeps_only_the_fields_asked_for(design):
+    table = ScopedParameters(scope_parameters(design, 'model'), ['expression', 'comment'])
+    design.fusion.reset()
+    assert table.projected(table.select(['d3'])) == [{'name': 'd3', 'expression': '7 mm', 'comment': '#lid'}]
+    assert set(design.fusion.calls) == {'ModelParameter.comment'}
+
+def test_only_tag_rules_read_comments(design):
+    table = ScopedParameters(scope_parameters(design, 'model'))
+    design.fusion.reset()
+    index = SelectionIndex(table)
+    assert index.select({'include': [{'glob': 'd*'}], 'exclude': [{'units': 'in'}]}) == {'d1', 'd2', 'd3'}
+    assert design.fusion.calls['ModelParameter.comment'] == 0
+    assert index.select({'include': [{'tag': 'wheels'}]}) == {'d1'}
+    assert design.fusion.calls['ModelParameter.comment'] == 3
+    # Reading the comments for its own tag index does not make the index stale
+    assert index.is_current(table)
+    table.fetch([0], ['value'])
+    assert not index.is_current(table)
@@ -0,0 +1,75 @@
+import pytest
+
+from paramlib import ParamTable, merge_records
+from paramlib.selection import SelectionError, SelectionIndex, SelectionStore
+
+def record(name, expression, units='mm', comment=''):
+    return {'name': name, 'expression': expression, 'units': units, 'comment': comment}
+
+@pytest.fixture
+def index():
+    return SelectionIndex(ParamTable([
+        record('width', '100 mm', comment='#chassis'),
+        record('wheel_1', '20 mm', comment='#Wheels'),
+        record('Wheel_2', 'wheel_1'),
+        record('front_wheel_1', 'wheel_1 * 2'),
+        record('tilt', '5 deg', 'deg', comment='#chassis #angles'),
+        record('gap', 'width - front_wheel_1'),
+    ]))
+
+def test_glob_matches_whole_names(index):
+    assert index.select({'include': [{'glob': 'wheel_*'}]}) == {'wheel_1'}
+    assert index.select({'include': [{'glob': 'wheel_*', 'ignoreCase': True}]}) == {'wheel_1', 'Wheel_2'}
+    assert index.select({'include': [{'glob': '*wheel_?'}]}) == {'wheel_1', 'front_wheel_1'}
+
+def test_regex_is_searched(index):
+    assert index.select({'include': [{'regex': 'wheel'}]}) == {'wheel_1', 'front_wheel_1'}
+    assert index.select({'include': [{'regex': '^w'}]}) == {'width', 'wheel_1'}
+
+def test_tags_and_units(index):
+    assert index.select({'include': [{'tag': '#chassis'}]}) == {'width', 'tilt'}
+    assert index.select({'include': [{'tag': 'wheels'}]}) == {'wheel_1'}
+    assert index.select({'include': [{'units': ['deg']}]}) == {'tilt'}
+
+def test_depends_on(index):
+    assert index.select({'include': [{'dependsOn': 'wheel_1'}]}) == {'Wheel_2', 'front_wheel_1', 'gap'}
+    assert index.select({'include': [{'dependsOn': 'wheel_1', 'direct': True}]}) == {'Wheel_2', 'front_wheel_1'}
+
+def test_exclude_without_include_starts_from_everything(index):
+    selected = index.select({'exclude': [{'tag': 'chassis'}, {'names': ['gap', 'missing']}]})
+    assert selected == {'wheel_1', 'Wheel_2', 'front_wheel_1'}
+
+def test_invalid_rules_are_rejected(index):
+    with pytest.raises(SelectionError):
+        index.select({'include': [{'glob': 'a', 'regex': 'b'}]})
+    with pytest.raises(SelectionError):
+        index.select({'include': [{'regex': '('}]})
+    with pytest.raises(SelectionError):
+        index.select({'pick': []})
+
+def test_saved_selections(tmp_path, index):
+    store = SelectionStore(str(tmp_path / 'selections.json'))
+    store.save('wheels', {'include': [{'glob': '*wheel*', 'ignoreCase': True}]})
+    rules = SelectionStore(str(tmp_path / 'selections.json')).get('wheels')
+    assert index.select(rules) == {'wheel_1', 'Wheel_2', 'front_wheel_1'}
+
+def test_index_goes_stale_when_records_change_in_place(index):
+    table = index.table
+    assert index.is_current(table)
+    table.replace(record('width', '100 mm', 'in', '#wheels'))
+    assert len(table) == 6 and not index.is_current(table)
+
+    fresh = SelectionIndex(table)
+    assert fresh.select({'include': [{'tag': 'wheels'}]}) == {'wheel_1', 'width'}
+    assert fresh.select({'include': [{'units': 'in'}]}) == {'width'}
+
+def test_merge_policy_change_makes_the_index_stale():
+    merged = merge_records([
+        ('a.json', [record('width', '1 mm', comment='#old')]),
+        ('b.json', [record('width', '2 mm', comment='#new')])
+    ])
+    index = SelectionIndex(merged.table)
+    assert index.select({'include': [{'tag': 'old'}]}) == {'width'}
+    merged.apply_policy('last')
+    assert not index.is_current(merged.table)
+    assert SelectionIndex(merged.table).select({'include': [{'tag': 'new'}]}) == {'width'}
@@ -0,0 +1,58 @@
+from paramlib import ParameterSnapshotCache
+from paramlib.fakefusion import FakeDesign
+
+def record(name, expression, units='mm'):
+    return {'name': name, 'expression': expression, 'units': units, 'comment': ''}
+
+def design_with(count):
+    return FakeDesign.from_records([record(f'p{i}', f'{i} mm') for i in range(count)])
+
+def test_unchanged_design_is_read_once():
+    design = design_with(5)
+    cache = ParameterSnapshotCache()
+    first = cache.get('doc', design.userParameters)
+    assert [p.name for p in first] == [f'p{i}' for i in range(5)]
+    design.fusion.reset()
+    assert cache.get('doc', design.userParameters) is first
+    # Only the count is read to check the snapshot
+    assert dict(design.fusion.calls) == {'UserParameters.count': 1}
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_count_change_and_dirty_entries_are_reread():
+    design = design_with(2)
+    cache = ParameterSnapshotCache()
+    cache.get('doc', design.userParameters)
+    design.userParameters.add('extra', design.fusion.createByString('1 mm'), 'mm', '')
+    assert 'extra' in cache.get('doc', design.userParameters)
+
+    design.userParameters.itemByName('p0').expression = '7 mm'
+    assert cache.get('doc', design.userParameters).get('p0').expression == '0 mm'
+    cache.mark_dirty('other')
+    assert cache.get('doc', design.userParameters).get('p0').expression == '0 mm'
+    cache.mark_dirty('doc')
+    assert cache.get('doc', design.userParameters).get('p0').expression == '7 mm'
+    assert cache.stats()['invalidations'] == 1
+
+def test_parameters_the_add_in_writes_keep_the_snapshot():
+    design = design_with(2)
+    cache = ParameterSnapshotCache()
+    before = cache.get('doc', design.userParameters)
+    added = design.userParameters.add('extra', design.fusion.createByString('1 mm'), 'mm', '')
+    changed = design.userParameters.itemByName('p1')
+    changed.expression = '9 mm'
+    cache.add_parameters('doc', [added])
+    cache.replace_parameters('doc', [changed])
+
+    after = cache.get('doc', design.userParameters)
+    assert after is not before and len(before) == 2
+    assert [p.name for p in after] == ['p0', 'p1', 'extra']
+    assert after.get('p1').expression == '9 mm'
+    assert cache.stats()['misses'] == 1
+
+def test_discarded_design_is_reread():
+    design = design_with(1)
+    cache = ParameterSnapshotCache()
+    first = cache.get('doc', design.userParameters)
+    cache.discard('doc')
+    assert cache.get('doc', design.userParameters) is not first
+    assert cache.stats()['designs'] == 1
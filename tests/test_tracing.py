@@ -0,0 +1,59 @@
+import json
+
+from paramlib import import_parameters
+from paramlib.fakefusion import FakeDesign
+from paramlib.tracing import TracedObject, Tracer, unwrap
+
+def record(name, expression):
+    return {'name': name, 'expression': expression, 'units': 'mm', 'comment': ''}
+
+def test_disabled_tracer_hands_objects_back():
+    tracer = Tracer()
+    design = FakeDesign()
+    assert tracer.wrap(design) is design
+    assert tracer.wrap_function(len, 'len') is len
+    with tracer.span('phase'), tracer.operation('import'):
+        pass
+    assert tracer.stats == {} and tracer.last_summary is None
+
+def test_api_calls_are_counted_through_proxies():
+    tracer = Tracer(enabled=True)
+    design = FakeDesign.from_records([record('a', '1 mm')])
+    traced = tracer.wrap(design, 'Design')
+    create = tracer.wrap_function(design.fusion.createByString, 'ValueInput.createByString')
+    result = import_parameters(traced, [record('b', 'a * 2')], create)
+    assert result.ok
+    assert isinstance(result.added[0], TracedObject)
+    # The API gets its own objects back, never the proxies
+    assert not isinstance(unwrap(result.added[0]), TracedObject)
+    result.added[0].comment = 'set through the proxy'
+    assert design.userParameters.itemByName('b').comment == 'set through the proxy'
+
+    # Objects returned by calls are named by their type, UserParameters.add inside Fusion
+    counts = {name: count for name, (count, _, _) in tracer.stats.items()}
+    assert counts == {
+        'Design.userParameters': 1,
+        'FakeUserParameters.next': 2,  # One parameter and the end
+        'FakeUserParameter.name': 1,
+        'Design.allParameters': 1,
+        'ValueInput.createByString': 1,
+        'FakeUserParameters.add': 1,
+        'FakeUserParameter.comment=': 1
+    }
+
+def test_operation_summary_is_appended_to_the_trace_file(tmp_path):
+    tracer = Tracer(enabled=True)
+    tracer.trace_path = str(tmp_path / 'trace' / 'trace.jsonl')
+    design = tracer.wrap(FakeDesign(), 'Design')
+    for _ in range(2):
+        with tracer.operation('export'):
+            with tracer.span('write file'):
+                list(design.userParameters)
+    with open(tracer.trace_path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 2 and lines[-1] == tracer.last_summary
+    summary = tracer.last_summary
+    assert summary['operation'] == 'export'
+    # Phases are lower case, API calls are named after their objects
+    assert summary['apiCalls'] == 2
+    assert {entry['name'] for entry in summary['entries']} == {'export', 'write file', 'Design.userParameters', 'FakeUserParameters.next'}
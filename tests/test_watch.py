@@ -0,0 +1,63 @@
+import json
+
+from paramlib import FileChange, FileWatcher
+
+def write(path, records):
+    path.write_text(json.dumps(records))
+
+def record(name, expression):
+    return {'name': name, 'expression': expression, 'units': 'mm', 'comment': ''}
+
+def test_check_reports_only_changes(tmp_path):
+    path = tmp_path / 'params.json'
+    write(path, [record('a', '1 mm'), record('b', '2 mm')])
+    watcher = FileWatcher(str(path), lambda: None)
+    change = watcher.check()
+    assert [p['name'] for p in change.records] == ['a', 'b']
+    assert watcher.check() is None
+
+    write(path, [record('a', '1 mm'), record('b', '3 mm')])
+    change = watcher.check()
+    assert [p['name'] for p in change.records] == ['b'] and change.removed == []
+
+    write(path, [record('b', '3 mm')])
+    change = watcher.check()
+    assert change.records == [] and change.removed == ['a']
+
+def test_forgotten_change_is_offered_again(tmp_path):
+    path = tmp_path / 'params.json'
+    write(path, [record('a', '1 mm'), record('b', '2 mm')])
+    watcher = FileWatcher(str(path), lambda: None)
+    watcher.check()
+
+    write(path, [record('a', '1 mm'), record('b', 'oops')])
+    rejected = watcher.check()
+    assert [p['name'] for p in rejected.records] == ['b']
+    watcher.forget(rejected)
+
+    # Saved again with the same content, the rejected record is offered again
+    write(path, [record('a', '1 mm'), record('b', 'oops')])
+    change = watcher.check()
+    assert [p['name'] for p in change.records] == ['b']
+    assert change.records[0]['expression'] == 'oops'
+
+def test_put_back_merges_later_changes(tmp_path):
+    path = tmp_path / 'params.json'
+    write(path, [record('a', '1 mm')])
+    watcher = FileWatcher(str(path), lambda: None)
+    watcher.put_back(watcher.check())
+    taken = watcher.take()
+    write(path, [record('b', '2 mm')])
+    watcher.put_back(watcher.check())
+    watcher.put_back(taken)
+    merged = watcher.take()
+    # a was added by the first change and removed by the second, the removal is kept
+    assert [p['name'] for p in merged.records] == ['b'] and merged.removed == ['a']
+    assert watcher.take() is None
+
+def test_merge_keeps_the_latest_of_each_name():
+    first = FileChange([record('a', '1 mm'), record('b', '1 mm')], ['c'])
+    later = FileChange([record('a', '2 mm'), record('c', '3 mm')], ['b', 'd'])
+    merged = first.merge(later)
+    assert {p['name']: p['expression'] for p in merged.records} == {'a': '2 mm', 'c': '3 mm'}
+    assert merged.removed == ['b', 'd']